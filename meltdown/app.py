@@ -133,12 +133,16 @@ class App:
 
     def run(self) -> None:
         from .args import args
+        from .pump import pump
+        from .jobs import jobs
 
         if not args.console:
             signal.signal(signal.SIGINT, self.sigint_handler)
 
         self.autorun()
         self.start_checks()
+        jobs.start()
+        pump.start()
         self.root.mainloop()
 
     def exit(self, seconds: int | None = None, force: bool = False) -> None:
@@ -181,8 +185,22 @@ class App:
 
     def destroy(self) -> None:
         self.running = False
+        self.flush()
         self.root.destroy()
 
+    def flush(self) -> None:
+        from .session import session
+        from .config import config
+        from .writer import writer
+
+        if session.save_after:
+            session.do_save()
+
+        if config.save_after:
+            config.do_save()
+
+        writer.flush()
+
     def cancel_exit(self, feedback: bool = False) -> None:
         from .args import args
         from .display import display
@@ -843,6 +861,9 @@ class App:
             self.update()
             widgets.model.move_to_end()
 
+        if model.model_loading:
+            model.update_icon()
+
         if model.streaming:
             if not self.streaming:
                 self.streaming = True
@@ -852,7 +873,6 @@ class App:
             self.streaming = False
             self.stop_requested = False
             widgets.disable_stop_button()
-            display.stream_ended()
             commands.after_stream()
             self.check_response_file()
             self.check_response_program()
@@ -979,7 +999,7 @@ class App:
 
     def check_response_file(self) -> None:
         from .args import args
-        from .model import model
+        from .streams import streams
         from .files import files
 
         if not args.response_file:
@@ -991,7 +1011,7 @@ class App:
         if not path.exists():
             return
 
-        text = model.last_response
+        text = streams.get_response()
 
         if not text:
             return
@@ -1000,12 +1020,12 @@ class App:
 
     def check_response_program(self) -> None:
         from .args import args
-        from .model import model
+        from .streams import streams
 
         if not args.response_program:
             return
 
-        text = model.last_response
+        text = streams.get_response()
 
         if not text:
             return
@@ -347,6 +347,32 @@ class Args:
         self.tooltip_count = True
         self.upload_title = ""
         self.auto_scroll = True
+        self.journal = True
+        self.journal_limit = 100
+        self.lazy_session = True
+        self.session_format = "json"
+        self.token_budget = True
+        self.max_streams = 4
+        self.provider_streams = 2
+        self.local_cache = "none"
+        self.local_cache_size = 2048
+        self.model_pool = 1
+        self.model_pool_ram = 16384
+        self.model_preload = True
+        self.mmap = True
+        self.response_cache = False
+        self.response_cache_ttl = 1440
+        self.response_cache_size = 500
+        self.tool_workers = 4
+        self.tool_timeout = 30
+        self.tool_depth = 3
+        self.search_race = False
+        self.max_retries = 3
+        self.fallback_model = ""
+        self.breaker_threshold = 5
+        self.breaker_cooldown = 60
+        self.queue_depth = 10
+        self.markdown_live = "ai"
 
     def parse(self) -> None:
         ap = ArgParser(app.manifest["title"], argspec.arguments, self)
@@ -443,6 +469,11 @@ class Args:
             ("no_log_references", "log_references"),
             ("no_tooltip_count", "tooltip_count"),
             ("no_auto_scroll", "auto_scroll"),
+            ("no_journal", "journal"),
+            ("no_lazy_session", "lazy_session"),
+            ("no_token_budget", "token_budget"),
+            ("no_model_preload", "model_preload"),
+            ("no_mmap", "mmap"),
         ]
 
         for r_item in other_name:
@@ -685,6 +716,27 @@ class Args:
             "case_insensitive_highlights",
             "bound_highlights",
             "input_placeholder",
+            "journal_limit",
+            "session_format",
+            "max_streams",
+            "provider_streams",
+            "local_cache",
+            "local_cache_size",
+            "model_pool",
+            "model_pool_ram",
+            "response_cache",
+            "response_cache_ttl",
+            "response_cache_size",
+            "tool_workers",
+            "tool_timeout",
+            "tool_depth",
+            "search_race",
+            "max_retries",
+            "fallback_model",
+            "breaker_threshold",
+            "breaker_cooldown",
+            "queue_depth",
+            "markdown_live",
         ]
 
         for n_item in normals:
@@ -2059,5 +2059,164 @@ class ArgSpec:
             info="Don't show the number of items on the tab tooltips",
         )
 
+        self.add_argument(
+            "no_journal",
+            action="store_false",
+            info="Rewrite the whole session file on every message instead of appending to a journal",
+        )
+
+        self.add_argument(
+            "journal_limit",
+            type=int,
+            info=f"Compact the session journal into the session file after this many records. {self.zero}",
+        )
+
+        self.add_argument(
+            "no_lazy_session",
+            action="store_false",
+            info="Load every conversation at startup instead of when its tab is first opened",
+        )
+
+        self.add_argument(
+            "session_format",
+            type=str,
+            choices=["json", "records", "gzip"],
+            info="Format of the session file. 'records' and 'gzip' use session.mlt with length-prefixed columnar records",
+        )
+
+        self.add_argument(
+            "no_token_budget",
+            action="store_false",
+            info="Don't drop old history items that would overflow the context of local models",
+        )
+
+        self.add_argument(
+            "max_streams",
+            type=int,
+            info="Max number of tabs that can stream at the same time",
+        )
+
+        self.add_argument(
+            "provider_streams",
+            type=int,
+            info="Max number of tabs that can stream from the same remote provider at the same time",
+        )
+
+        self.add_argument(
+            "local_cache",
+            type=str,
+            choices=["none", "ram", "disk"],
+            info="Cache the prompt state of local models in RAM or on disk so follow-up turns only evaluate the new tokens",
+        )
+
+        self.add_argument(
+            "local_cache_size",
+            type=int,
+            info="Max size in MB of the local prompt cache. The least recently used states are evicted first",
+        )
+
+        self.add_argument(
+            "model_pool",
+            type=int,
+            info="Number of local models to keep loaded so switching between them is instant. 1 to disable",
+        )
+
+        self.add_argument(
+            "model_pool_ram",
+            type=int,
+            info="Max size in MB of the local models kept loaded. The least recently used are unloaded first. 0 for no limit",
+        )
+
+        self.add_argument(
+            "no_model_preload",
+            action="store_false",
+            info="Don't load the next model from the models list in the background when the model pool is enabled",
+        )
+
+        self.add_argument(
+            "no_mmap",
+            action="store_false",
+            info="Read local models fully into memory instead of memory-mapping the file",
+        )
+
+        self.add_argument(
+            "response_cache",
+            action="store_true",
+            info="Reuse the saved answer of a prompt when the request is deterministic (temperature 0 and a fixed seed)",
+        )
+
+        self.add_argument(
+            "response_cache_ttl",
+            type=int,
+            info="Minutes a cached response stays valid",
+        )
+
+        self.add_argument(
+            "response_cache_size",
+            type=int,
+            info="Max number of cached responses. The oldest are removed first",
+        )
+
+        self.add_argument(
+            "tool_workers",
+            type=int,
+            info="Max number of tool calls that run at the same time",
+        )
+
+        self.add_argument(
+            "tool_timeout",
+            type=int,
+            info="Seconds to wait for the result of a tool call",
+        )
+
+        self.add_argument(
+            "tool_depth",
+            type=int,
+            info="Max number of rounds of tool calls the model can chain in one answer",
+        )
+
+        self.add_argument(
+            "search_race",
+            action="store_true",
+            info="Query every web search provider at the same time and use the first good result, including the Google scrape",
+        )
+
+        self.add_argument(
+            "max_retries",
+            type=int,
+            info="Times to retry a remote request that hit a rate limit, timeout or server error",
+        )
+
+        self.add_argument(
+            "fallback_model",
+            type=str,
+            info="Remote model to use when the current one keeps failing. For example gpt-4o-mini",
+        )
+
+        self.add_argument(
+            "breaker_threshold",
+            type=int,
+            info="Failed requests in a row after which a provider is skipped for a while",
+        )
+
+        self.add_argument(
+            "breaker_cooldown",
+            type=int,
+            info="Seconds to skip a failing provider before trying it again",
+        )
+
+        self.add_argument(
+            "queue_depth",
+            type=int,
+            info="How many prompts of each kind can wait for the model at once",
+        )
+
+        self.add_argument(
+            "markdown_live",
+            type=str,
+            choices=self.markdown_choices,
+            info="Markdown mode for styling answers while they stream",
+        )
+
 
 argspec = ArgSpec()
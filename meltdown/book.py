@@ -837,11 +837,16 @@ class Book(tk.Frame):
             self.on_reorder()
 
     def highlight(self, id_: str) -> None:
-        for page in self.pages:
-            if page.id_ == id_:
-                page.tab.label.configure(font=app.theme.font("tab_highlight"))
-            else:
-                page.tab.label.configure(font=app.theme.font("tab"))
+        page = self.get_page_by_id(id_)
+
+        if page:
+            page.tab.label.configure(font=app.theme.font("tab_highlight"))
+
+    def unhighlight(self, id_: str) -> None:
+        page = self.get_page_by_id(id_)
+
+        if page:
+            page.tab.label.configure(font=app.theme.font("tab"))
 
     def remove_highlights(self) -> None:
         for page in self.pages:
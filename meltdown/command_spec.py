@@ -37,6 +37,10 @@ from .run import run
 from .tasks import tasks
 from .lockets import lockets
 from .next import next_fns
+from .metrics import metrics
+from .loadreport import loadreports
+from .responsecache import responsecache
+from .jobs import jobs
 
 
 class DuplicateCommandError(Exception):
@@ -703,6 +707,42 @@ class CommandSpec:
             "stats", "Show some internal information", lambda a=None: app.stats()
         )
 
+        self.add_cmd(
+            "streamstats",
+            "Show the stream metrics of the current tab",
+            lambda a=None: metrics.show(),
+        )
+
+        self.add_cmd(
+            "exportstats",
+            "Export the stream metrics of all tabs as JSONL",
+            lambda a=None: metrics.export(),
+        )
+
+        self.add_cmd(
+            "loadreport",
+            "Show how long each step of the last local model load took",
+            lambda a=None: loadreports.show(),
+        )
+
+        self.add_cmd(
+            "cachestats",
+            "Show the hits and misses of the response cache",
+            lambda a=None: responsecache.show(),
+        )
+
+        self.add_cmd(
+            "clearcache",
+            "Remove every cached response",
+            lambda a=None: responsecache.clear(),
+        )
+
+        self.add_cmd(
+            "clearqueue",
+            "Drop the prompts that are waiting for the model",
+            lambda a=None: jobs.clear(),
+        )
+
         self.add_cmd(
             "memory",
             "Show how much memory the program is using",
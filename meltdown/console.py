@@ -17,6 +17,7 @@ from .args import args
 from .app import app
 from .commands import commands
 from .inputcontrol import inputcontrol
+from .jobs import jobs
 from .utils import utils
 
 
@@ -86,6 +87,8 @@ class Console:
             key_bindings=kb,
         )
 
+        from .pump import pump
+
         while True:
             try:
                 if self.session:
@@ -101,7 +104,10 @@ class Console:
             if not text:
                 continue
 
-            inputcontrol.submit(text=text)
+            # Hop to the main loop, the prompt itself is queued at listener priority
+            pump.call(
+                lambda t=text: inputcontrol.submit(text=t, priority=jobs.listener),
+            )
 
 
 console = Console()
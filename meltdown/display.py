@@ -21,6 +21,7 @@ from .itemops import itemops
 
 if TYPE_CHECKING:
     from .session import Conversation
+    from .item import Item
 
 
 class Tab:
@@ -212,8 +213,8 @@ class Display:
         convo = session.get_conversation(conversation_id)
         tooltip = ""
 
-        if convo and convo.items:
-            tooltip = self.make_tooltip(convo.items[0].ai, len(convo.items))
+        if convo and (not convo.is_empty()):
+            tooltip = self.make_tooltip(convo.get_preview(), convo.count())
 
         if convo:
             pin = convo.pin
@@ -655,9 +656,12 @@ class Display:
         if not tab:
             return
 
+        from .liveformat import liveformat
+
         text = utils.clean_lines(text)
         tab.get_output().insert_text(text, to_bottom=to_bottom)
         tab.modified = True
+        liveformat.feed(tab_id)
 
     def get_tab_name(self, tab_id: str | None = None) -> str:
         if not tab_id:
@@ -673,6 +677,7 @@ class Display:
 
     def remove_tab(self, tab_id: str) -> None:
         from .session import session
+        from .streams import streams
 
         tab = self.get_tab(tab_id)
 
@@ -682,6 +687,7 @@ class Display:
         if tab.mode != "ignore":
             session.remove(tab.conversation_id)
 
+        streams.remove(tab_id)
         del self.tabs[tab_id]
 
     def check_scroll_buttons(self, tab_id: str | None = None) -> None:
@@ -878,7 +884,10 @@ class Display:
         to_bottom: bool = True,
         original: str | None = None,
         file: str | None = None,
+        item: Item | None = None,
     ) -> None:
+        from .render import render
+
         if not tab_id:
             tab_id = self.current_tab
 
@@ -902,7 +911,14 @@ class Display:
                     text = text[: args.crop_user].strip()
 
             text = utils.clean_lines(text)
-            tab.get_output().insert_text(text)
+
+            # Items render from their own text and are cached between prints
+            if item and render.active(who):
+                parts = render.get(who, text, file or "")
+                tab.get_output().insert_render(parts, who)
+                file = None
+            else:
+                tab.get_output().insert_text(text)
 
         if file:
             file_text = f"File:\u00a0{file}"
@@ -945,7 +961,7 @@ class Display:
         if not tabconvo:
             return False
 
-        return bool(tabconvo.convo.items)
+        return not tabconvo.convo.is_empty()
 
     def tab_is_empty(self, tab_id: str) -> bool:
         tabconvo = self.get_tab_convo(tab_id)
@@ -953,7 +969,7 @@ class Display:
         if not tabconvo:
             return True
 
-        return not bool(tabconvo.convo.items)
+        return tabconvo.convo.is_empty()
 
     def format_text(
         self,
@@ -1020,29 +1036,42 @@ class Display:
         self.set_tab_streaming(tab_id)
         self.tab_streaming = tab_id
 
-    def stream_ended(self) -> None:
+    def stream_ended(self, tab_id: str | None = None) -> None:
+        from .liveformat import liveformat
+
+        if not tab_id:
+            tab_id = self.tab_streaming
+
+        liveformat.stop(tab_id)
+
         if not args.tab_highlight:
             return
 
-        app.border_effect_off()
-        self.book.remove_highlights()
-        self.clear_tab_streaming()
-        self.format_text(self.tab_streaming, to_bottom=args.auto_scroll)
-        self.update_tooltip(self.tab_streaming)
+        self.book.unhighlight(tab_id)
+        self.clear_tab_streaming(tab_id)
+
+        if not self.any_tab_streaming():
+            app.border_effect_off()
+
+        self.format_text(tab_id, to_bottom=args.auto_scroll)
+        self.update_tooltip(tab_id)
 
         if args.auto_program:
             itemops.run_program(auto=True)
 
     def set_tab_streaming(self, tab_id: str) -> None:
-        for key, values in self.tabs.items():
-            if values.tab_id == tab_id:
-                self.tabs[key].streaming = True
-            else:
-                self.tabs[key].streaming = False
+        tab = self.get_tab(tab_id)
 
-    def clear_tab_streaming(self) -> None:
+        if tab:
+            tab.streaming = True
+
+    def clear_tab_streaming(self, tab_id: str | None = None) -> None:
         for key in self.tabs:
-            self.tabs[key].streaming = False
+            if (not tab_id) or (key == tab_id):
+                self.tabs[key].streaming = False
+
+    def any_tab_streaming(self) -> bool:
+        return any(tab.streaming for tab in self.tabs.values())
 
     def toggle_scroll(self) -> None:
         tab = self.get_current_tab()
@@ -1177,7 +1206,7 @@ class Display:
         if not tabconvo:
             return 0
 
-        return len(tabconvo.convo.items)
+        return tabconvo.convo.count()
 
     def get_text(self, tab_id: str | None = None) -> str:
         tabconvo = self.get_tab_convo(tab_id)
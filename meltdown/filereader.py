@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+# Standard
+import codecs
+import hashlib
+import threading
+from typing import Any
+from pathlib import Path
+from dataclasses import dataclass
+from collections import OrderedDict
+from collections.abc import Callable, Iterable
+
+# Libraries
+import requests  # type: ignore
+
+# Modules
+from .utils import utils
+
+
+@dataclass
+class ReadItem:
+    text: str
+    truncated: bool
+    nbytes: int
+    digest: str
+    size: int = 0
+    mtime: int = 0
+    etag: str = ""
+    modified: str = ""
+
+
+class FileReader:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.cache: OrderedDict[tuple[str, str, int], ReadItem] = OrderedDict()
+        self.cache_size = 32
+        self.cache_chars = 4_000_000
+        self.max_chars = 1_000_000
+        self.chars = 0
+        self.chunk_size = 16 * 1024
+        self.timeout = 10
+        self.session = requests.Session()
+
+    def read(
+        self,
+        path: str,
+        name: str = "",
+        max_tokens: int = 0,
+        count: Callable[[str], int] | None = None,
+        limit: Callable[[str], str] | None = None,
+    ) -> str:
+        # Reading stops once the text is past the token budget
+        # so only the part of the file that fits gets loaded
+        key = (path, name, max_tokens)
+
+        try:
+            if utils.is_url(path):
+                item = self.read_url(path, key, count, limit)
+            else:
+                item = self.read_local(Path(path), key, count, limit)
+        except BaseException as e:
+            utils.error(e)
+            return ""
+
+        if not item:
+            return ""
+
+        self.add_cached(key, item)
+        return item.text
+
+    def read_local(
+        self,
+        path: Path,
+        key: tuple[str, str, int],
+        count: Callable[[str], int] | None,
+        limit: Callable[[str], str] | None,
+    ) -> ReadItem:
+        stat = path.stat()
+        cached = self.get_cached(key)
+
+        if cached:
+            if (cached.size == stat.st_size) and (cached.mtime == stat.st_mtime_ns):
+                return cached
+
+            # Growing files like logs keep the same beginning
+            if cached.truncated and self.same_prefix(path, cached):
+                cached.size = stat.st_size
+                cached.mtime = stat.st_mtime_ns
+                return cached
+
+        with path.open("rb") as file:
+            chunks = iter(lambda: file.read(self.chunk_size), b"")
+            item = self.consume(chunks, "utf-8", key[2], count, limit)
+
+        item.size = stat.st_size
+        item.mtime = stat.st_mtime_ns
+        return item
+
+    def read_url(
+        self,
+        url: str,
+        key: tuple[str, str, int],
+        count: Callable[[str], int] | None,
+        limit: Callable[[str], str] | None,
+    ) -> ReadItem | None:
+        cached = self.get_cached(key)
+        headers = {}
+
+        if cached:
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+
+            if cached.modified:
+                headers["If-Modified-Since"] = cached.modified
+
+        with self.session.get(
+            url, headers=headers, stream=True, timeout=self.timeout
+        ) as response:
+            if cached and (response.status_code == 304):
+                return cached
+
+            if response.status_code != 200:
+                return None
+
+            encoding = response.encoding or "utf-8"
+            chunks = response.iter_content(self.chunk_size)
+            item = self.consume(chunks, encoding, key[2], count, limit)
+            item.etag = response.headers.get("ETag", "")
+            item.modified = response.headers.get("Last-Modified", "")
+
+        return item
+
+    def consume(
+        self,
+        chunks: Iterable[bytes],
+        encoding: str,
+        max_tokens: int,
+        count: Callable[[str], int] | None,
+        limit: Callable[[str], str] | None,
+    ) -> ReadItem:
+        decoder = self.get_decoder(encoding)
+        hasher = hashlib.sha256()
+        parts: list[str] = []
+        truncated = False
+        nbytes = 0
+        tokens = 0
+
+        for chunk in chunks:
+            hasher.update(chunk)
+            nbytes += len(chunk)
+            text = decoder.decode(chunk)
+            parts.append(text)
+
+            if (max_tokens > 0) and count:
+                tokens += count(text)
+
+                if tokens > max_tokens:
+                    truncated = True
+                    break
+
+        if not truncated:
+            parts.append(decoder.decode(b"", final=True))
+
+        text = "".join(parts).strip()
+
+        # The exact cut only has to tokenize what was read
+        if (max_tokens > 0) and limit:
+            text = limit(text)
+
+        return ReadItem(text, truncated, nbytes, hasher.hexdigest())
+
+    def get_decoder(self, encoding: str) -> Any:
+        try:
+            return codecs.getincrementaldecoder(encoding)(errors="replace")
+        except LookupError:
+            return codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+    def same_prefix(self, path: Path, item: ReadItem) -> bool:
+        hasher = hashlib.sha256()
+        left = item.nbytes
+
+        with path.open("rb") as file:
+            while left > 0:
+                chunk = file.read(min(self.chunk_size, left))
+
+                if not chunk:
+                    return False
+
+                hasher.update(chunk)
+                left -= len(chunk)
+
+        return hasher.hexdigest() == item.digest
+
+    def get_cached(self, key: tuple[str, str, int]) -> ReadItem | None:
+        with self.lock:
+            item = self.cache.get(key)
+
+            if item:
+                self.cache.move_to_end(key)
+
+            return item
+
+    def add_cached(self, key: tuple[str, str, int], item: ReadItem) -> None:
+        with self.lock:
+            old = self.cache.pop(key, None)
+
+            if old:
+                self.chars -= len(old.text)
+
+            # Reads without a budget can be whole files, those aren't kept
+            if (not item.truncated) and (len(item.text) > self.max_chars):
+                return
+
+            self.cache[key] = item
+            self.chars += len(item.text)
+
+            while (len(self.cache) > self.cache_size) or (
+                self.chars > self.cache_chars
+            ):
+                _, old = self.cache.popitem(last=False)
+                self.chars -= len(old.text)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.cache.clear()
+            self.chars = 0
+
+
+filereader = FileReader()
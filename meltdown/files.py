@@ -10,6 +10,7 @@ from .app import app
 from .paths import paths
 from .config import config
 from .args import args
+from .writer import writer
 
 
 class Files:
@@ -25,8 +26,7 @@ class Files:
         self.files_loaded = False
 
     def save(self, path: Path, dictionary: Any) -> None:
-        with path.open("w", encoding="utf-8") as file:
-            json.dump(dictionary, file, indent=4)
+        writer.save(path, dictionary)
 
     def load_list(self, key: str) -> None:
         path: Path = getattr(paths, key)
@@ -49,6 +49,7 @@ class Files:
                     items.append(item)
 
         setattr(self, name, items)
+        setattr(self, f"{key}_loaded", True)
 
     def add_model(self, text: str) -> None:
         self.add_to_list("models", text)
@@ -122,6 +123,9 @@ class Files:
             app.open_generic(file)
 
     def load(self, path: Path) -> Any:
+        if writer.is_pending(path):
+            writer.flush(path)
+
         with path.open("r", encoding="utf-8") as file:
             return json.load(file)
 
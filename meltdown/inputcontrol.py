@@ -18,6 +18,7 @@ from .files import files
 from .menus import Menu
 from .widgetutils import widgetutils
 from .variables import variables
+from .jobs import jobs
 
 
 class InputControl:
@@ -189,6 +190,7 @@ class InputControl:
         file: str | None = None,
         no_history: bool = False,
         mode: str = "normal",
+        priority: int | None = None,
     ) -> None:
         from .model import model
         from .display import display
@@ -251,9 +253,6 @@ class InputControl:
 
             display.to_bottom()
 
-            if model.model_loading:
-                return
-
             prompt = {"text": text, "file": file, "no_history": no_history}
 
             files.add_system(config.system)
@@ -263,7 +262,16 @@ class InputControl:
                 files.add_file(file)
 
             widgets.show_model()
-            model.stream(prompt, tab.tab_id)
+
+            if priority is None:
+                priority = jobs.interactive
+
+            # Waits in the queue while the model or the tab is busy
+            jobs.add(
+                lambda: model.stream(prompt, tab.tab_id),
+                priority,
+                tab_id=tab.tab_id,
+            )
         elif scroll:
             display.toggle_scroll()
 
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+# Standard
+import sys
+from typing import Any
+
+# This module only uses the standard library
+# So the scripts can import it without the rest of the program
+
+
+class Item:
+    __slots__ = (
+        "ai",
+        "date",
+        "duration",
+        "file",
+        "format",
+        "history",
+        "internal",
+        "max_tokens",
+        "metrics",
+        "model",
+        "prepared",
+        "seed",
+        "temperature",
+        "tokens",
+        "tokens_per_second",
+        "user",
+    )
+
+    @staticmethod
+    def intern(value: str | None) -> Any:
+        # Model names, formats and files repeat across every item
+        if value:
+            return sys.intern(value)
+
+        return value
+
+    @staticmethod
+    def from_dict(data: dict[str, Any]) -> Item:
+        get = data.get
+
+        return Item(
+            model=get("model", ""),
+            user=get("user", ""),
+            ai=get("ai", ""),
+            file=get("file", ""),
+            date=get("date", None),
+            duration=get("duration", None),
+            seed=get("seed", None),
+            history=get("history", None),
+            max_tokens=get("max_tokens", None),
+            temperature=get("temperature", None),
+            format_=get("format", None),
+            internal=get("internal", None),
+            tokens_per_second=get("tokens_per_second", None),
+            metrics=get("metrics", None),
+        )
+
+    def __init__(
+        self,
+        model: str,
+        user: str,
+        ai: str,
+        file: str,
+        date: float | None,
+        duration: float | None,
+        seed: int | None,
+        history: int | None,
+        max_tokens: int | None,
+        temperature: float | None,
+        format_: str | None,
+        internal: str | None,
+        tokens_per_second: float | None,
+        metrics: dict[str, Any] | None = None,
+    ) -> None:
+        self.date = date
+        self.duration = duration
+        self.user = user
+        self.ai = ai
+        self.file = Item.intern(file)
+        self.model = Item.intern(model)
+        self.seed = seed
+        self.history = history
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.format = Item.intern(format_)
+        self.internal = internal
+        self.tokens_per_second = tokens_per_second
+        self.metrics = metrics
+        self.prepared: tuple[tuple[Any, ...], list[dict[str, Any]]] | None = None
+        self.tokens: tuple[Any, int] | None = None
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "date": self.date,
+            "duration": self.duration,
+            "user": self.user,
+            "ai": self.ai,
+            "file": self.file,
+            "model": self.model,
+            "seed": self.seed,
+            "history": self.history,
+            "max_tokens": self.max_tokens,
+            "temperature": self.temperature,
+            "format": self.format,
+            "internal": self.internal,
+            "tokens_per_second": self.tokens_per_second,
+            "metrics": self.metrics,
+        }
@@ -12,7 +12,7 @@ from .memory import memory
 
 
 if TYPE_CHECKING:
-    from .session import Item
+    from .item import Item
 
 
 class ItemOps:
@@ -253,6 +253,13 @@ class ItemOps:
         if item.tokens_per_second is not None:
             text += f"\nTPS: {item.tokens_per_second}"
 
+        if item.metrics:
+            text += f"\n\nTTFT: {item.metrics['ttft']} ms"
+            text += f"\nChunks: {item.metrics['chunks']}"
+            text += f"\np50: {item.metrics['p50']} ms"
+            text += f"\np95: {item.metrics['p95']} ms"
+            text += f"\np99: {item.metrics['p99']} ms"
+
         Dialog.show_msgbox("Information", text)
 
     def last_item(self) -> Item | None:
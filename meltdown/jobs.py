@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+# Standard
+import itertools
+import threading
+from dataclasses import dataclass
+from collections.abc import Callable
+
+# Modules
+from .args import args
+from .utils import utils
+
+
+@dataclass
+class Job:
+    action: Callable[[], None]
+    priority: int
+    seq: int
+    tab_id: str | None = None
+    key: str = ""
+
+
+class Jobs:
+    interactive = 0
+    listener = 1
+    task = 2
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.items: list[Job] = []
+        self.counter = itertools.count()
+        self.names = {0: "interactive", 1: "listener", 2: "task"}
+        self.delay = 100
+
+    def add(
+        self,
+        action: Callable[[], None],
+        priority: int,
+        tab_id: str | None = None,
+        key: str = "",
+    ) -> bool:
+        with self.lock:
+            if key and any(job.key == key for job in self.items):
+                return True
+
+            num = sum(1 for job in self.items if job.priority == priority)
+
+            if num >= max(1, args.queue_depth):
+                name = self.names.get(priority, "")
+                utils.msg(f"Queue: Too many {name} jobs waiting")
+                return False
+
+            job = Job(action, priority, next(self.counter), tab_id, key)
+            self.items.append(job)
+            self.items.sort(key=lambda j: (j.priority, j.seq))
+
+        # Tk can only be used from the main thread
+        # Jobs from other threads run on the next tick
+        if threading.current_thread() is threading.main_thread():
+            self.dispatch()
+
+        return True
+
+    def is_ready(self, job: Job) -> bool:
+        from .model import model
+        from .streams import streams
+
+        if model.model_loading:
+            return False
+
+        if job.priority == self.task:
+            if not args.task_debounce:
+                return True
+
+            if model.streaming:
+                return False
+
+            idle = utils.now() - model.last_used()
+            return idle >= args.task_debounce_delay
+
+        tab_id = self.get_tab(job)
+
+        # Interactive prompts replace the tab's stream once it got a response
+        if job.priority == self.interactive:
+            return not streams.is_loading(tab_id)
+
+        return not streams.is_active(tab_id)
+
+    def get_tab(self, job: Job) -> str:
+        from .display import display
+
+        return job.tab_id or display.current_tab
+
+    def next_ready(self, done: set[str]) -> Job | None:
+        with self.lock:
+            for job in self.items:
+                if self.get_tab(job) in done:
+                    continue
+
+                if self.is_ready(job):
+                    self.items.remove(job)
+                    return job
+
+        return None
+
+    def start(self) -> None:
+        from .app import app
+
+        # Waiting jobs are dispatched on the main loop only
+        self.dispatch()
+        app.root.after(self.delay, self.start)
+
+    def dispatch(self) -> None:
+        # At most one job per tab per tick
+        # The next one waits until the tab shows as busy or free again
+        done: set[str] = set()
+
+        while True:
+            job = self.next_ready(done)
+
+            if not job:
+                return
+
+            done.add(self.get_tab(job))
+
+            try:
+                job.action()
+            except BaseException as e:
+                utils.error(e)
+
+    def count(self) -> int:
+        with self.lock:
+            return len(self.items)
+
+    def clear(self, priority: int | None = None) -> None:
+        with self.lock:
+            if priority is None:
+                self.items.clear()
+            else:
+                self.items = [j for j in self.items if j.priority != priority]
+
+
+jobs = Jobs()
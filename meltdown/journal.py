@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+# Standard
+import json
+import threading
+from typing import Any
+from pathlib import Path
+
+# Modules
+from .args import args
+from .config import config
+from .paths import paths
+from .utils import utils
+
+
+class Journal:
+    def __init__(self) -> None:
+        self.lock = threading.RLock()
+        self.records = 0
+        self.generation = 0
+
+    def get_path(self) -> Path:
+        return paths.session.with_suffix(".journal")
+
+    def get_old_path(self) -> Path:
+        path = self.get_path()
+        return path.with_name(f"{path.name}.old")
+
+    def enabled(self) -> bool:
+        return args.journal and (not args.temporary)
+
+    def append(self, record: dict[str, Any]) -> bool:
+        if not self.enabled():
+            return False
+
+        if record["id"].startswith("ignore"):
+            return True
+
+        try:
+            self.write_record(record)
+        except BaseException as e:
+            utils.error(e)
+            return False
+
+        if args.journal_limit > 0:
+            if self.records >= args.journal_limit:
+                self.compact()
+
+        return True
+
+    def write_record(self, record: dict[str, Any]) -> None:
+        line = json.dumps(record) + "\n"
+        path = self.get_path()
+
+        with self.lock:
+            if not path.parent.exists():
+                path.parent.mkdir(parents=True, exist_ok=True)
+
+            with path.open("a", encoding="utf-8") as file:
+                file.write(line)
+                file.flush()
+
+            self.records += 1
+
+    def add(self, convo_id: str, header: dict[str, Any], item: dict[str, Any]) -> bool:
+        return self.append({"op": "add", "id": convo_id, **header, "item": item})
+
+    def update(self, convo_id: str, last_modified: float, item: dict[str, Any]) -> bool:
+        return self.append(
+            {
+                "op": "update",
+                "id": convo_id,
+                "last_modified": last_modified,
+                "item": item,
+            }
+        )
+
+    def read(self) -> list[dict[str, Any]]:
+        # Records of a snapshot that didn't reach the disk come first
+        return self.read_path(self.get_old_path()) + self.read_path(self.get_path())
+
+    def read_path(self, path: Path) -> list[dict[str, Any]]:
+        if not path.exists():
+            return []
+
+        records = []
+
+        with path.open("r", encoding="utf-8") as file:
+            for line in file:
+                text = line.strip()
+
+                if not text:
+                    continue
+
+                try:
+                    records.append(json.loads(text))
+                except json.JSONDecodeError:
+                    # A crash mid-write leaves a partial last line
+                    break
+
+        return records
+
+    def replay(self, conversations: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        try:
+            records = self.read()
+        except BaseException as e:
+            utils.error(e)
+            return conversations
+
+        if not records:
+            return conversations
+
+        convos = {convo["id"]: convo for convo in conversations}
+
+        for record in records:
+            convo_id = record.get("id")
+            item = record.get("item")
+
+            if (not convo_id) or (not item):
+                continue
+
+            convo = convos.get(convo_id)
+
+            if record.get("op") == "add":
+                if not convo:
+                    convo = {
+                        "id": convo_id,
+                        "name": record.get("name", ""),
+                        "created": record.get("created", 0.0),
+                        "last_modified": 0.0,
+                        "pin": record.get("pin", False),
+                        "items": [],
+                    }
+
+                    convos[convo_id] = convo
+                    conversations.append(convo)
+
+                # Records are matched by date so replay is idempotent
+                if self.find(convo, item) < 0:
+                    convo["items"].append(item)
+                    convo["items"] = convo["items"][-config.max_log :]
+            elif record.get("op") == "update":
+                if not convo:
+                    continue
+
+                index = self.find(convo, item)
+
+                if index < 0:
+                    continue
+
+                convo["items"][index] = item
+            else:
+                continue
+
+            convo["last_modified"] = record.get(
+                "last_modified", convo.get("last_modified", 0.0)
+            )
+
+        self.records = len(records)
+        return conversations
+
+    def find(self, convo: dict[str, Any], item: dict[str, Any]) -> int:
+        date = item.get("date")
+
+        if date is None:
+            return -1
+
+        for i, it in enumerate(convo["items"]):
+            if it.get("date") == date:
+                return i
+
+        return -1
+
+    def rotate(self) -> int:
+        # Called with the snapshot so new records go to a fresh journal
+        # The old records are kept until the snapshot is on disk
+        path = self.get_path()
+        old = self.get_old_path()
+
+        with self.lock:
+            self.records = 0
+            self.generation += 1
+
+            if not path.exists():
+                return self.generation
+
+            if not old.exists():
+                path.replace(old)
+                return self.generation
+
+            data = path.read_bytes()
+
+            # Drop a partial last line so the next records stay readable
+            data = data[: data.rfind(b"\n") + 1]
+
+            with old.open("ab") as file:
+                file.write(data)
+                file.flush()
+
+            path.unlink()
+            return self.generation
+
+    def clear(self, generation: int) -> None:
+        # A newer snapshot still needs the old records until it is written
+        with self.lock:
+            if generation != self.generation:
+                return
+
+            old = self.get_old_path()
+
+            if old.exists():
+                old.unlink()
+
+    def has_records(self) -> bool:
+        for path in (self.get_old_path(), self.get_path()):
+            if path.exists() and (path.stat().st_size > 0):
+                return True
+
+        return False
+
+    def compact(self) -> None:
+        from .session import session
+
+        session.do_save()
+
+
+journal = Journal()
@@ -15,6 +15,14 @@ from .app import app
 from .utils import utils
 from .files import files
 from .inputcontrol import inputcontrol
+from .jobs import jobs
+
+
+def submit(text: str) -> None:
+    from .pump import pump
+
+    # Hop to the main loop, the prompt itself is queued at listener priority
+    pump.call(lambda: inputcontrol.submit(text=text, priority=jobs.listener))
 
 
 class FileChangeHandler(FileSystemEventHandler):
@@ -28,7 +36,7 @@ class FileChangeHandler(FileSystemEventHandler):
 
                 if text:
                     files.write(self.path, "")
-                    inputcontrol.submit(text=text)
+                    submit(text)
             except Exception as e:
                 utils.msg(f"Listener error: {e!s}")
 
@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+# Standard
+import re
+from dataclasses import dataclass, field
+
+# Modules
+from .args import args
+from .markdown import Markdown
+from .spans import spans, Rule
+from .display import display
+from .output import Output
+
+
+@dataclass
+class LiveState:
+    line: int = 0
+    col: int = 0
+    fence: bool = False
+    in_list: bool = False
+    blank: bool = True
+    rules: list[Rule] = field(default_factory=list)
+
+
+class LiveFormat:
+    # Styles the lines of a streaming answer as they complete
+    # The markup stays in place, the normal format runs when the stream ends
+    def __init__(self) -> None:
+        self.states: dict[str, LiveState] = {}
+        self.pattern_list = re.compile(r"^\s*(?:\d+[.)]|[*-])(?= )")
+
+    def start(self, tab_id: str) -> None:
+        if args.markdown not in ("ai", "both"):
+            return
+
+        if not Markdown.enabled("ai", "live"):
+            return
+
+        # Rules that replace text would shift the columns of the raw line
+        rules = [rule for rule in Markdown.get_rules("ai") if not rule.replace]
+        self.states[tab_id] = LiveState(rules=rules)
+
+    def stop(self, tab_id: str | None = None) -> None:
+        if tab_id:
+            self.states.pop(tab_id, None)
+        else:
+            self.states.clear()
+
+    def feed(self, tab_id: str) -> None:
+        state = self.states.get(tab_id)
+
+        if not state:
+            return
+
+        tab = display.get_tab(tab_id)
+
+        if not tab:
+            return
+
+        output = tab.get_output()
+
+        if not state.line:
+            start = output.index("prompt_ai")
+            state.line, state.col = map(int, start.split("."))
+
+        # Only the last line can still change
+        last = int(output.index("end - 1c").split(".")[0])
+
+        if last <= state.line:
+            return
+
+        text = output.get(f"{state.line}.{state.col}", f"{last}.0")
+
+        for i, line in enumerate(text.split("\n")[:-1]):
+            col = state.col if (i == 0) else 0
+            self.format_line(output, state, state.line + i, col, line)
+
+        state.line = last
+        state.col = 0
+
+    def format_line(
+        self, output: Output, state: LiveState, ln: int, col: int, line: str
+    ) -> None:
+        stripped = line.strip()
+
+        if stripped.startswith("```"):
+            # Fences that open and close on the same line don't change the state
+            if state.fence or (stripped.count("```") < 2):
+                state.fence = not state.fence
+
+            return
+
+        if state.fence:
+            return
+
+        if not stripped:
+            state.blank = True
+            return
+
+        match = self.pattern_list.match(line)
+
+        if match and (state.in_list or state.blank):
+            state.in_list = True
+            output.tag_add("list", f"{ln}.{col}", f"{ln}.{col + match.end()}")
+        else:
+            state.in_list = False
+
+        state.blank = False
+
+        for tag, start, end in spans.marks(line, state.rules):
+            output.tag_add(tag, f"{ln}.{col + start}", f"{ln}.{col + end}")
+
+
+liveformat = LiveFormat()
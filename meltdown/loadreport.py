@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+# Standard
+import sys
+import json
+import time
+from typing import Any
+from pathlib import Path
+
+# Modules
+from .paths import paths
+from .utils import utils
+from .writer import writer
+
+
+class LoadReport:
+    def __init__(self, llama_args: dict[str, Any]) -> None:
+        self.model = llama_args.get("model_path", "")
+        self.n_ctx = llama_args.get("n_ctx")
+        self.n_batch = llama_args.get("n_batch")
+        self.n_threads = llama_args.get("n_threads")
+        self.n_gpu_layers = llama_args.get("n_gpu_layers")
+        self.use_mmap = llama_args.get("use_mmap")
+        self.use_mlock = llama_args.get("use_mlock")
+        self.date = utils.now()
+        self.started = time.perf_counter()
+        self.first_progress = 0.0
+        self.last_progress = 0.0
+        self.ended = 0.0
+        self.progress = 0.0
+        self.hooked = False
+
+    def on_progress(self, value: float) -> None:
+        # llama.cpp reports 0 to 1 while it maps and loads the tensors
+        now = time.perf_counter()
+
+        if not self.first_progress:
+            self.first_progress = now
+
+        self.last_progress = now
+        self.progress = value
+
+    def done(self) -> None:
+        self.ended = time.perf_counter()
+        self.progress = 1.0
+
+    def to_dict(self) -> dict[str, Any]:
+        def ms(value: float) -> float:
+            return round(value * 1000, 2)
+
+        ended = self.ended or time.perf_counter()
+
+        # Without progress callbacks only the total is known
+        if self.hooked and self.first_progress:
+            opened = self.first_progress - self.started
+            tensors = self.last_progress - self.first_progress
+            context = ended - self.last_progress
+        else:
+            opened = tensors = context = 0.0
+
+        return {
+            "model": Path(self.model).name,
+            "date": self.date,
+            "n_ctx": self.n_ctx,
+            "n_batch": self.n_batch,
+            "n_threads": self.n_threads,
+            "n_gpu_layers": self.n_gpu_layers,
+            "use_mmap": self.use_mmap,
+            "use_mlock": self.use_mlock,
+            "open": ms(opened),
+            "tensors": ms(tensors),
+            "context": ms(context),
+            "total": ms(ended - self.started),
+        }
+
+
+class LoadReports:
+    def __init__(self) -> None:
+        self.last: LoadReport | None = None
+        self.classes: dict[Any, Any] = {}
+        self.warned = False
+
+    def get_class(self, base: Any) -> Any:
+        # Llama() doesn't take a progress callback
+        # The subclass sets it on its own model params when they are made
+        if base in self.classes:
+            return self.classes[base]
+
+        low = sys.modules.get("llama_cpp.llama_cpp")
+        ctype = getattr(low, "llama_progress_callback", None)
+
+        class ReportedLlama(base):  # type: ignore
+            def __init__(self, *args: Any, report: LoadReport, **kwargs: Any) -> None:
+                def progress(value: float, data: Any) -> bool:
+                    report.on_progress(value)
+                    return True
+
+                # Kept on the instance so ctypes doesn't free it mid-load
+                self.progress_callback = ctype(progress) if ctype else None
+                self.hooked = False
+                super().__init__(*args, **kwargs)
+
+                # This relies on how Llama() builds its params
+                # If that changes the phases would be wrong so only the total is kept
+                report.hooked = self.hooked and bool(report.first_progress)
+
+                if not report.hooked:
+                    loadreports.not_hooked()
+
+            @property
+            def model_params(self) -> Any:
+                return self.__dict__["model_params"]
+
+            @model_params.setter
+            def model_params(self, params: Any) -> None:
+                if self.progress_callback:
+                    params.progress_callback = self.progress_callback
+                    self.hooked = True
+
+                self.__dict__["model_params"] = params
+
+        self.classes[base] = ReportedLlama
+        return ReportedLlama
+
+    def not_hooked(self) -> None:
+        if self.warned:
+            return
+
+        self.warned = True
+        utils.msg("Load report: No progress from llama.cpp, only the total is kept")
+
+    def record(self, report: LoadReport) -> None:
+        self.last = report
+        line = json.dumps(report.to_dict()) + "\n"
+
+        # Keyed per report so the writer doesn't coalesce the appends
+        writer.submit(f"{paths.loads}:{report.date}", lambda: self.append(line))
+
+    def append(self, line: str) -> None:
+        paths.loads.parent.mkdir(parents=True, exist_ok=True)
+
+        with paths.loads.open("a", encoding="utf-8") as file:
+            file.write(line)
+
+    def get_text(self, report: LoadReport) -> str:
+        data = report.to_dict()
+        lines = [data["model"]]
+        lines.append(f"Open: {data['open']} ms")
+        lines.append(f"Tensors: {data['tensors']} ms")
+        lines.append(f"Context: {data['context']} ms")
+        lines.append(f"Total: {data['total']} ms")
+        lines.append("")
+        lines.append(f"n_ctx: {data['n_ctx']} | n_batch: {data['n_batch']}")
+        lines.append(f"n_threads: {data['n_threads']} | gpu: {data['n_gpu_layers']}")
+        lines.append(f"mmap: {data['use_mmap']} | mlock: {data['use_mlock']}")
+        return "\n".join(lines)
+
+    def show(self) -> None:
+        from .dialogs import Dialog
+
+        if not self.last:
+            Dialog.show_message("No model has been loaded yet.")
+            return
+
+        Dialog.show_message(self.get_text(self.last))
+
+
+loadreports = LoadReports()
@@ -26,6 +26,7 @@ from .autoscroll import autoscroll
 from .variables import variables
 from .run import run
 from .lockets import lockets
+from .writer import writer
 
 
 def main() -> None:
@@ -91,6 +92,11 @@ def main() -> None:
     except BaseException as e:
         utils.error(e)
 
+    try:
+        writer.flush()
+    except BaseException as e:
+        utils.error(e)
+
     try:
         model.unload()
     except KeyboardInterrupt:
@@ -5,6 +5,8 @@ import re
 from bisect import bisect_left
 from typing import Any, ClassVar
 from dataclasses import dataclass
+from collections import OrderedDict
+from collections.abc import Callable
 
 # Modules
 from .args import args
@@ -12,15 +14,7 @@ from .config import config
 from .output import Output
 from .utils import utils
 from .widgets import widgets
-
-
-@dataclass
-class SnippetMatch:
-    start_line: str
-    end_line: str
-    language: str
-    line_num: int
-    content: str = ""
+from .spans import spans, Span, Rule
 
 
 @dataclass
@@ -30,37 +24,40 @@ class MatchItem:
         self.items = items
 
 
-@dataclass
-class IndexItem:
-    def __init__(self, start: str, end: str, content: str) -> None:
-        self.start = start
-        self.end = end
-        self.content = content
-
-
 class Markdown:
     separator = "───────────────────"
     marker_indent_ordered = "\u200b\u200c\u200b"
     marker_indent_unordered = "\u200c\u200b\u200c"
     urls: ClassVar[dict[str, str]] = {}
-
-    pattern_snippets: str
-    pattern_bold_aster: str
-    pattern_bold_under: str
-    pattern_italic_aster: str
-    pattern_italic_under: str
-    pattern_highlight: str
-    pattern_uselink: str
-    pattern_quote: str
-    pattern_url: str
-    pattern_link: str
-    pattern_path: str
-    pattern_header_1: str
-    pattern_header_2: str
-    pattern_header_3: str
-    pattern_separator: str
-    pattern_list_ordered: str
-    pattern_list_unordered: str
+    not_nobody: ClassVar[list[str]] = ["clean", "join", "ordered", "unordered"]
+
+    pattern_snippets: re.Pattern[str]
+    pattern_bold_aster: re.Pattern[str]
+    pattern_bold_under: re.Pattern[str]
+    pattern_italic_aster: re.Pattern[str]
+    pattern_italic_under: re.Pattern[str]
+    pattern_highlight: re.Pattern[str]
+    pattern_uselink: re.Pattern[str]
+    pattern_quote: re.Pattern[str]
+    pattern_url: re.Pattern[str]
+    pattern_link: re.Pattern[str]
+    pattern_path: re.Pattern[str]
+    pattern_header_1: re.Pattern[str]
+    pattern_header_2: re.Pattern[str]
+    pattern_header_3: re.Pattern[str]
+    pattern_separator: re.Pattern[str]
+    pattern_list_ordered: re.Pattern[str]
+    pattern_list_unordered: re.Pattern[str]
+    pattern_fence: re.Pattern[str]
+    pattern_item_ordered: re.Pattern[str]
+    pattern_item_unordered: re.Pattern[str]
+
+    # Compiled highlight_text patterns, the least recently used go first
+    highlights: ClassVar[OrderedDict[tuple[str, bool, bool], re.Pattern[str]]] = (
+        OrderedDict()
+    )
+
+    highlights_size = 64
 
     @staticmethod
     def build_patterns() -> None:
@@ -100,11 +97,14 @@ class Markdown:
 
         # _this thing_ but not_this_thing
         # Chars have to be at the edges
+        # The content stops at the next opening so unclosed
+        # openings don't each scan to the end of the line
         def char_regex_2(char: str, n: int = 1) -> str:
             c = utils.escape_regex(char)
             u = get_u(c, n)
             t = get_t(c, n)
-            return rf"\b(?P<all>{u}(?P<content>{t}.*?{t}|{t}){u})\b"
+            o = rf"(?<!\w){u}(?!{u}|\s)"
+            return rf"\b(?P<all>{u}(?P<content>{t}(?:(?!{o}).)*?{t}|{t}){u})\b"
 
         # `this thing` or ` this thing `
         # There can be spaces between the chars
@@ -115,22 +115,22 @@ class Markdown:
             return rf"(?P<all>{u}(?P<content>{t2}+){u})"
 
         # Italic with one asterisk
-        Markdown.pattern_italic_aster = char_regex_1("*")
+        Markdown.pattern_italic_aster = re.compile(char_regex_1("*"))
 
         # Bold with two asterisks
-        Markdown.pattern_bold_aster = char_regex_1("*", 2)
+        Markdown.pattern_bold_aster = re.compile(char_regex_1("*", 2))
 
         # Italic with one underscore
-        Markdown.pattern_italic_under = char_regex_2("_")
+        Markdown.pattern_italic_under = re.compile(char_regex_2("_"))
 
         # Bold with two underscores
-        Markdown.pattern_bold_under = char_regex_2("_", 2)
+        Markdown.pattern_bold_under = re.compile(char_regex_2("_", 2))
 
         # Highlight with one backtick
-        Markdown.pattern_highlight = char_regex_3("`")
+        Markdown.pattern_highlight = re.compile(char_regex_3("`"))
 
         # Highlight with one double-quote
-        Markdown.pattern_quote = char_regex_1('"')
+        Markdown.pattern_quote = re.compile(char_regex_1('"'))
 
         # Code snippets / fences
         # Capture stuff that could repeat BUT that has the slim
@@ -143,13 +143,19 @@ class Markdown:
         # (when immediately followed by the closing fence). Restrict only backticks
         # and newlines here to avoid breaking fence detection.
         # Allow optional leading whitespace before closing backticks to support indented fences.
-        Markdown.pattern_snippets = rf"^\s*{tick}{{3}}([^`\n]*)(?:\n|{tick}{{3}})(?=((?:(?![ \t]*{tick}{{3}})[^{tick}\n]+|\n|(?!^\s*{tick}{{3}}){tick}{{1,2}}|(?!{tick}{{3}}[^{tick}]){tick}{{3}})*))\2\s*(?:{tick}{{3}}|$)\s*$"
+        Markdown.pattern_snippets = re.compile(
+            rf"^\s*{tick}{{3}}([^`\n]*)(?:\n|{tick}{{3}})(?=((?:(?![ \t]*{tick}{{3}})[^{tick}\n]+|\n|(?!^\s*{tick}{{3}}){tick}{{1,2}}|(?!{tick}{{3}}[^{tick}]){tick}{{3}})*))\2\s*(?:{tick}{{3}}|$)\s*$",
+            flags=re.MULTILINE | re.DOTALL,
+        )
+
+        # Opening and closing fences
+        Markdown.pattern_fence = re.compile(r"^\s*```", flags=re.MULTILINE)
 
         # Uselink with the special chars
-        Markdown.pattern_uselink = char_regex_1(uselink)
+        Markdown.pattern_uselink = re.compile(char_regex_1(uselink))
 
         # URLs with http:// | https:// | ftp:// | www.
-        Markdown.pattern_url = (
+        Markdown.pattern_url = re.compile(
             rf"(?:(?<=\s)|^)(?P<all>(?P<content>({protocols})([^\s]+?)))(?=\s|$)"
         )
 
@@ -165,34 +171,48 @@ class Markdown:
         # Disallow a space immediately after any path separator so patterns like
         # "/ stuff" (from phrases such as "asdf / stuff") are NOT treated as paths.
         # Still allow single spaces inside components (e.g., "/My App/file.txt").
-        Markdown.pattern_path = r"(?:(?<=\s)|^)(?!\/[A-Za-z]{1,4}\/(?=\s|$))(?!\/[A-Za-z]+(?=\s|$))(?P<all>(?P<content>(?:\/|~\/)[^\s\/](?:[^\s\/]| (?![\s\/]))*(?:\/[^\s\/](?:[^\s\/]| (?![\s\/]))*)*))(?=\s|$)"
+        Markdown.pattern_path = re.compile(
+            r"(?:(?<=\s)|^)(?!\/[A-Za-z]{1,4}\/(?=\s|$))(?!\/[A-Za-z]+(?=\s|$))(?P<all>(?P<content>(?:\/|~\/)[^\s\/](?:[^\s\/]| (?![\s\/]))*(?:\/[^\s\/](?:[^\s\/]| (?![\s\/]))*)*))(?=\s|$)"
+        )
 
         # Header with one hash
-        Markdown.pattern_header_1 = rf"^(?P<all>{hash_}{{1}}\s+(?P<content>.*))$"
+        Markdown.pattern_header_1 = re.compile(
+            rf"^(?P<all>{hash_}{{1}}\s+(?P<content>.*))$"
+        )
 
         # Header with two hashes
-        Markdown.pattern_header_2 = rf"^(?P<all>{hash_}{{2}}\s+(?P<content>.*))$"
+        Markdown.pattern_header_2 = re.compile(
+            rf"^(?P<all>{hash_}{{2}}\s+(?P<content>.*))$"
+        )
 
         # Header with three hashes
-        Markdown.pattern_header_3 = rf"^(?P<all>{hash_}{{3}}\s+(?P<content>.*))$"
+        Markdown.pattern_header_3 = re.compile(
+            rf"^(?P<all>{hash_}{{3}}\s+(?P<content>.*))$"
+        )
 
         # Separator line
-        Markdown.pattern_separator = r"^-{3,}$"
+        Markdown.pattern_separator = re.compile(r"^-{3,}$")
 
         # Bullet list (ordered)
-        Markdown.pattern_list_ordered = (
+        Markdown.pattern_list_ordered = re.compile(
             r"(^|(?<=\n\n))[ \t]*\d+[.)] [^\n]+"
-            r"(?:\n{1,2}(?:[ \t]*\d+[.)] [^\n]+|[ \t]*[*-] [^\n]+))*"
+            r"(?:\n{1,2}(?:[ \t]*\d+[.)] [^\n]+|[ \t]*[*-] [^\n]+))*",
+            flags=re.MULTILINE | re.DOTALL,
         )
 
         # Bullet list (unordered)
-        Markdown.pattern_list_unordered = (
+        Markdown.pattern_list_unordered = re.compile(
             r"(^|(?<=\n\n))[ \t]*[*-] [^\n]+"
-            r"(?:\n{1,2}(?:[ \t]*[*-] [^\n]+|[ \t]*\d+[.)] [^\n]+))*"
+            r"(?:\n{1,2}(?:[ \t]*[*-] [^\n]+|[ \t]*\d+[.)] [^\n]+))*",
+            flags=re.MULTILINE | re.DOTALL,
         )
 
+        # Marker of a single list item
+        Markdown.pattern_item_ordered = re.compile(r"^\d+[.)]\s*")
+        Markdown.pattern_item_unordered = re.compile(r"^[*-]\s*")
+
         # Word URL like [Click here](https://example.com)
-        Markdown.pattern_link = (
+        Markdown.pattern_link = re.compile(
             r"(?:^|\s)(?P<all>\[(?P<content>[^\]]+)\]\((?P<url>[^\)]+)\))(?:$|\s)"
         )
 
@@ -209,6 +229,17 @@ class Markdown:
 
         return None
 
+    @staticmethod
+    def get_link_tag(match: re.Match[Any]) -> str:
+        url = match.group("url")
+        url_id = Markdown.get_url_id(url)
+
+        if not url_id:
+            url_id = f"url_{len(Markdown.urls)}"
+            Markdown.urls[url_id] = url
+
+        return f"link_{url_id}"
+
     @staticmethod
     def get_url(url_id: str) -> str | None:
         url_id = url_id.replace("link_", "")
@@ -217,13 +248,6 @@ class Markdown:
     def __init__(self, widget: Output) -> None:
         self.widget = widget
 
-        self.not_nobody = [
-            "clean",
-            "join",
-            "ordered",
-            "unordered",
-        ]
-
     def format_all(self) -> None:
         start_ln = 1
         end_ln = self.last_line()
@@ -240,11 +264,13 @@ class Markdown:
         if args.markdown == "none":
             return
 
+        # Text above the first marker only needs a look the first time
+        first = not (self.widget.checked_markers_user or self.widget.checked_markers_ai)
         markers = self.widget.get_markers()
         ranges: list[tuple[str, int, int]] = []
 
         def add(who: str, start_ln: int, end_ln: int) -> None:
-            if (not ranges) and (start_ln > 1):
+            if first and (not ranges) and (start_ln > 1):
                 ranges.append(("nobody", 1, start_ln - 1))
 
             ranges.append((who, start_ln, end_ln))
@@ -274,9 +300,10 @@ class Markdown:
 
         self.indent_lines()
 
-    def enabled(self, who: str, what: str) -> bool:
+    @staticmethod
+    def enabled(who: str, what: str) -> bool:
         if who == "nobody":
-            return what not in self.not_nobody
+            return what not in Markdown.not_nobody
 
         name = f"markdown_{what}"
 
@@ -300,226 +327,268 @@ class Markdown:
         return False
 
     def format_section(self, who: str, start_ln: int, end_ln: int) -> None:
-        if self.enabled(who, "think"):
-            if self.replace_think(start_ln, end_ln, who):
-                end_ln = self.next_marker(start_ln)
-
-        if self.enabled(who, "roles"):
-            if self.replace_roles(start_ln, end_ln, who):
-                end_ln = self.next_marker(start_ln)
+        for what, get_text in Markdown.get_text_steps():
+            if self.enabled(who, what):
+                if self.replace_text(start_ln, end_ln, who, get_text):
+                    end_ln = self.next_marker(start_ln)
 
-        if self.enabled(who, "clean"):
-            if self.clean_lines(start_ln, end_ln, who):
-                end_ln = self.next_marker(start_ln)
+        # Snippets and lists
+        if self.format_layout(start_ln, end_ln, who):
+            end_ln = self.next_marker(start_ln)
 
-        if self.enabled(who, "join"):
-            if self.join_lines(start_ln, end_ln, who):
-                end_ln = self.next_marker(start_ln)
+        self.format_inline(start_ln, end_ln, who)
 
-        if self.enabled(who, "snippets"):
-            snip_done, _ = self.format_snippets(start_ln, end_ln, who)
+    @staticmethod
+    def get_rules(who: str) -> list[Rule]:
+        rules: list[Rule] = []
 
-            if snip_done:
-                end_ln = self.next_marker(start_ln) - 1
+        def add(what: str, pattern: re.Pattern[str], tag: str, **kwargs: Any) -> None:
+            if (not what) or Markdown.enabled(who, what):
+                rules.append(Rule(pattern, tag, **kwargs))
 
-        # Lists
+        # Bold (two chars)
+        add("bold_asterisk", Markdown.pattern_bold_aster, "bold")
+        add("bold_underscore", Markdown.pattern_bold_under, "bold")
 
-        if self.enabled(who, "ordered"):
-            if self.format_lists(start_ln, end_ln, who, "ordered"):
-                end_ln = self.next_marker(start_ln)
+        # Italic (one char)
+        add("italic_asterisk", Markdown.pattern_italic_aster, "italic")
+        add("italic_underscore", Markdown.pattern_italic_under, "italic")
 
-        if self.enabled(who, "unordered"):
-            if self.format_lists(start_ln, end_ln, who, "unordered"):
-                end_ln = self.next_marker(start_ln)
+        # ---
+        add("quote", Markdown.pattern_quote, "quote", no_replace=True)
+        add("highlight", Markdown.pattern_highlight, "highlight")
+        add("", Markdown.pattern_uselink, "uselink")
+        add("link", Markdown.pattern_link, "link", get_tag=Markdown.get_link_tag)
+        add("url", Markdown.pattern_url, "url")
+        add("path", Markdown.pattern_path, "path")
+        add("header", Markdown.pattern_header_1, "header_1")
+        add("header", Markdown.pattern_header_2, "header_2")
+        add("header", Markdown.pattern_header_3, "header_3")
+
+        add(
+            "separator",
+            Markdown.pattern_separator,
+            "separator",
+            replace=Markdown.separator,
+        )
 
-        # Bold (two chars)
+        return rules
 
-        if self.enabled(who, "bold_asterisk"):
-            self.do_format(start_ln, end_ln, who, Markdown.pattern_bold_aster, "bold")
+    def format_inline(self, start_ln: int, end_ln: int, who: str) -> None:
+        # All the inline rules run over the text at once
+        # and the widget only gets the resulting edits
+        lines, first_col = self.get_section(start_ln, end_ln, who)
+        items = spans.tokenize(lines, self.get_rules(who))
+        self.apply_spans(items, start_ln, first_col)
 
-        if self.enabled(who, "bold_underscore"):
-            self.do_format(start_ln, end_ln, who, Markdown.pattern_bold_under, "bold")
+    def apply_spans(self, items: list[Span], start_ln: int, first_col: int) -> None:
+        # Reverse order keeps the indices of the pending spans valid
+        for span in reversed(items):
+            ln = start_ln + span.line
+            col = span.col
 
-        # Italic (one char)
+            if span.line == 0:
+                col += first_col
 
-        if self.enabled(who, "italic_asterisk"):
-            self.do_format(
-                start_ln, end_ln, who, Markdown.pattern_italic_aster, "italic"
-            )
+            start = f"{ln}.{col}"
 
-        if self.enabled(who, "italic_underscore"):
-            self.do_format(
-                start_ln, end_ln, who, Markdown.pattern_italic_under, "italic"
-            )
+            if span.changed:
+                self.widget_delete("spans", start, f"{ln}.{col + span.length}")
 
-        # ---
+                if span.replacement:
+                    self.widget_insert("spans", start, span.replacement, span.tags)
 
-        if self.enabled(who, "quote"):
-            self.do_format(start_ln, end_ln, who, Markdown.pattern_quote, "quote", True)
+                continue
 
-        if self.enabled(who, "highlight"):
-            self.do_format(
-                start_ln, end_ln, who, Markdown.pattern_highlight, "highlight"
-            )
+            end = f"{ln}.{col + span.length}"
 
-        self.do_format(start_ln, end_ln, who, Markdown.pattern_uselink, "uselink")
+            for tag in span.tags:
+                self.widget.tag_add(tag, start, end)
 
-        if self.enabled(who, "link"):
-            self.do_format(start_ln, end_ln, who, Markdown.pattern_link, "link")
+    def highlight_text(self, text: str) -> None:
+        pattern = Markdown.get_highlight_pattern(
+            text, args.case_insensitive_highlights, args.bound_highlights
+        )
 
-        if self.enabled(who, "url"):
-            self.do_format(start_ln, end_ln, who, Markdown.pattern_url, "url")
+        start_ln = 1
+        end_ln = self.last_line()
 
-        if self.enabled(who, "path"):
-            self.do_format(start_ln, end_ln, who, Markdown.pattern_path, "path")
+        self.do_format(
+            start_ln, end_ln, "nobody", pattern, "highlight_2", no_replace=True
+        )
 
-        if self.enabled(who, "header"):
-            self.do_format(start_ln, end_ln, who, Markdown.pattern_header_1, "header_1")
-            self.do_format(start_ln, end_ln, who, Markdown.pattern_header_2, "header_2")
-            self.do_format(start_ln, end_ln, who, Markdown.pattern_header_3, "header_3")
+    @staticmethod
+    def get_highlight_pattern(
+        text: str, insensitive: bool, bounded: bool
+    ) -> re.Pattern[str]:
+        key = (text, insensitive, bounded)
+        pattern = Markdown.highlights.get(key)
 
-        if self.enabled(who, "separator"):
-            self.format_separators(start_ln, end_ln, who)
+        if pattern:
+            Markdown.highlights.move_to_end(key)
+            return pattern
 
-    def highlight_text(self, text: str) -> None:
-        if args.case_insensitive_highlights:
+        if insensitive:
             flag = "(?i)"
         else:
             flag = ""
 
-        if args.bound_highlights:
+        if bounded:
             bound = r"(?:\s|^|$)"
         else:
             bound = ""
 
-        pattern = rf"{flag}(?P<all>{bound}(?P<content>{re.escape(text)}){bound})"
-        start_ln = 1
-        end_ln = self.last_line()
-
-        self.do_format(
-            start_ln, end_ln, "nobody", pattern, "highlight_2", no_replace=True
+        pattern = re.compile(
+            rf"{flag}(?P<all>{bound}(?P<content>{re.escape(text)}){bound})"
         )
 
+        Markdown.highlights[key] = pattern
+
+        while len(Markdown.highlights) > Markdown.highlights_size:
+            Markdown.highlights.popitem(last=False)
+
+        return pattern
+
     def do_format(
         self,
         start_ln: int,
         end_ln: int,
         who: str,
-        pattern: str,
+        pattern: re.Pattern[str],
         tag: str,
         no_replace: bool = False,
     ) -> None:
         matches: list[MatchItem] = []
-        lines = self.get_lines(start_ln, end_ln, who)
+        lines, first_col = self.get_section(start_ln, end_ln, who)
 
         for i, line in enumerate(lines):
             if not line.strip():
                 continue
 
-            match_ = MatchItem(start_ln + i, list(re.finditer(pattern, line)))
+            match_ = MatchItem(start_ln + i, list(pattern.finditer(line)))
 
             if match_.items:
                 matches.append(match_)
 
         for mtch in reversed(matches):
-            items = mtch.items
-            indices: list[IndexItem] = []
-            url = ""
+            # The match offsets are the columns, the first line starts after the prompt
+            col = first_col if (mtch.line == start_ln) else 0
 
-            for item in reversed(items):
-                all_ = item.group("all")
+            # Going backwards keeps the columns on the left valid
+            for item in reversed(mtch.items):
+                start_col, end_col = item.span("all")
+                start = f"{mtch.line}.{col + start_col}"
+                tags = [tag]
+
+                if tag == "link":
+                    tags.append(Markdown.get_link_tag(item))
 
                 if no_replace:
-                    content = all_
+                    content = item.group("all")
                 else:
                     content = item.group("content")
+                    self.widget_delete(
+                        "do_format", start, f"{mtch.line}.{col + end_col}"
+                    )
+                    self.widget_insert("do_format", start, content)
 
-                if tag == "link":
-                    url = item.group("url")
+                end = f"{mtch.line}.{col + start_col + len(content)}"
 
-                search_col = 0
+                for name in tags:
+                    self.widget.tag_add(name, start, end)
 
-                for _ in range(999):
-                    start = self.widget.search(
-                        all_,
-                        f"{mtch.line}.{search_col}",
-                        stopindex=f"{mtch.line}.end",
-                    )
+    def format_layout(self, start_ln: int, end_ln: int, who: str) -> bool:
+        from .snippet import Snippet
 
-                    if not start:
-                        break
+        lines = self.get_lines(start_ln, end_ln, who)
+        layout = Markdown.get_layout(who, "\n".join(lines))
+        snippets = [
+            (i, line) for i, line in enumerate(layout) if isinstance(line, tuple)
+        ]
+        text = "\n".join("" if isinstance(line, tuple) else line for line in layout)
 
-                    repeated = False
+        if (not snippets) and (text == "\n".join(lines)):
+            return False
 
-                    for index in indices:
-                        if (index.start == start) and (index.content == content):
-                            search_col = int(start.split(".")[1]) + len(all_)
-                            repeated = True
+        self.insert_first(start_ln, end_ln, text)
 
-                    if repeated:
-                        continue
+        # Each snippet has an empty line of its own to go in
+        for i, (content, language) in snippets:
+            snippet = Snippet(self.widget, content, language)
+            widgets.window(self.widget, start_ln + i, snippet)
+            self.widget.snippets.append(snippet)
 
-                    end = self.widget.index(f"{start} + {len(all_)}c")
+        return True
+
+    @staticmethod
+    def get_layout(who: str, text: str) -> list[str | tuple[str, str]]:
+        # The lines of a section with its snippets and lists in place
+        # A snippet is a (content, language) line of its own
+        # The widget pass and the item renderer both lay sections out with this
+        if Markdown.enabled(who, "snippets"):
+            blocks = Markdown.split_snippets(text)
+        else:
+            blocks = [text.strip()]
 
-                    if not end:
-                        break
+        layout: list[str | tuple[str, str]] = []
 
-                    indices.append(IndexItem(start, end, content))
+        for i, block in enumerate(blocks):
+            # Blocks are kept apart by an empty line
+            if i > 0:
+                layout.append("")
 
-            sorted_indices = sorted(
-                indices, key=lambda x: int(x.start.split(".")[1]), reverse=True
-            )
+            if isinstance(block, tuple):
+                # A snippet right after the prompt goes below it
+                if i == 0:
+                    layout.extend(["", ""])
 
-            tag2 = ""
+                layout.append(block)
+                continue
 
-            if tag == "link":
-                url_id = Markdown.get_url_id(url)
+            listed = block
 
-                if not url_id:
-                    url_id = f"url_{len(Markdown.urls)}"
-                    Markdown.urls[url_id] = url
+            for mode in ["ordered", "unordered"]:
+                if Markdown.enabled(who, mode):
+                    listed = Markdown.get_lists(listed, mode, i == 0)
 
-                tag2 = f"{tag}_{url_id}"
+            layout.extend(listed.split("\n"))
 
-            for index_item in sorted_indices:
-                self.widget_delete(
-                    "do_format",
-                    index_item.start,
-                    index_item.end,
-                )
+        return layout
 
-                self.widget_insert(
-                    "do_format",
-                    index_item.start,
-                    index_item.content,
-                )
+    @staticmethod
+    def split_snippets(text: str) -> list[str | tuple[str, str]]:
+        blocks: list[str | tuple[str, str]] = []
+        last = 0
 
-                self.widget.tag_add(
-                    tag,
-                    index_item.start,
-                    f"{index_item.start} + {len(index_item.content)}c",
-                )
+        # Sections in the widget always end with a newline
+        text += "\n"
 
-                if tag2:
-                    self.widget.tag_add(
-                        tag2,
-                        index_item.start,
-                        f"{index_item.start} + {len(index_item.content)}c",
-                    )
+        for start, end, language, content in Markdown.find_snippets(text):
+            before = text[last:start].strip()
 
-    def format_snippets(self, start_ln: int, end_ln: int, who: str) -> tuple[bool, int]:
-        from .snippet import Snippet
+            if before:
+                blocks.append(before)
 
-        clines = self.get_lines(start_ln, end_ln, who)
-        ctext = "\n".join(clines)
-        num_lines = end_ln - start_ln
+            blocks.append((content, language))
+            last = end
+
+        after = text[last:].strip()
+
+        if after or (not blocks):
+            blocks.append(after)
+
+        return blocks
+
+    @staticmethod
+    def find_snippets(ctext: str) -> list[tuple[int, int, str, str]]:
+        # Returns the start, end, language and content of each fenced block
         matches = []
 
         # Find all fence positions (both opening and closing)
         # We need to track complete fence blocks to properly detect nesting
         fence_ranges = []
 
-        for fence_match in re.finditer(r"^\s*```", ctext, flags=re.MULTILINE):
+        for fence_match in Markdown.pattern_fence.finditer(ctext):
             fence_pos = fence_match.start()
             fence_ranges.append(fence_pos)
 
@@ -530,9 +599,7 @@ class Markdown:
             # then we're inside a fence pair (between opening and closing)
             return (idx % 2) == 1
 
-        for match_ in re.finditer(
-            Markdown.pattern_snippets, ctext, flags=re.MULTILINE | re.DOTALL
-        ):
+        for match_ in Markdown.pattern_snippets.finditer(ctext):
             if inside_outer_fence(match_.start(0)):
                 continue
 
@@ -563,292 +630,113 @@ class Markdown:
                 if not language:
                     language = "text"
 
-            full_match_start_idx = match_.start(0)
-            full_match_end_idx = match_.end(0)
+            matches.append((match_.start(0), match_.end(0), language, content))
 
-            # Determine the real start and end line numbers in the widget
-            start_line_num_in_ctext = self.get_line_number(ctext, full_match_start_idx)
-            real_start_line = start_ln + start_line_num_in_ctext
+        return matches
 
-            end_line_num_in_ctext = self.get_line_number(ctext, full_match_end_idx)
-            real_end_line = start_ln + end_line_num_in_ctext
-
-            # Determine the character indices for deletion
-            # For multi-line, we delete whole lines. For single-line, we use char indices.
-            if real_start_line != real_end_line:
-                # Multi-line block
-                start_index = f"{real_start_line}.0"
-                end_index = f"{real_end_line}.end"
-            else:
-                # Single-line block
-                start_char_index = (
-                    full_match_start_idx
-                    - ctext.rfind("\n", 0, full_match_start_idx)
-                    - 1
-                )
-
-                end_char_index = (
-                    full_match_end_idx - ctext.rfind("\n", 0, full_match_end_idx) - 1
-                )
+    @staticmethod
+    def get_lists(text: str, mode: str, first: bool) -> str:
+        if mode == "ordered":
+            pattern = Markdown.pattern_list_ordered
+        else:
+            pattern = Markdown.pattern_list_unordered
 
-                start_index = f"{real_start_line}.{start_char_index}"
-                end_index = f"{real_end_line}.{end_char_index}"
+        matches = list(pattern.finditer(text))
 
-            match = SnippetMatch(
-                start_index, end_index, language, real_start_line, content
-            )
+        if not matches:
+            return text
 
-            matches.append(match)
+        lines = text.split("\n")
 
         for match in reversed(matches):
-            # --- 1. SAFE START INDEX CALCULATION ---
-            # Instead of trusting ctext indices, find the actual backticks in the widget line.
-            # This protects "ai: " or other prefixes from being deleted.
-            line_content = self.widget.get(
-                f"{match.start_line.split('.')[0]}.0",
-                f"{match.start_line.split('.')[0]}.end",
-            )
-
-            tick_index = line_content.find("```")
-
-            if tick_index != -1:
-                # Use the actual position of backticks in the widget
-                actual_start_index = f"{match.start_line.split('.')[0]}.{tick_index}"
-            else:
-                # Fallback (unlikely)
-                actual_start_index = match.start_line
-
-            # --- 2. CHECK FOR INLINE CONTENT ---
-            # Check if there is text before the backticks on this specific line
-            text_before = line_content[:tick_index].strip() if tick_index != -1 else ""
-
-            # It is inline if there is text before the backticks (like "ai: ")
-            is_inline_start = bool(text_before)
-
-            # --- 3. CAPTURE TRAILING TEXT (Universal) ---
-            end_line_num = int(match.end_line.split(".")[0])
-            trailing_text = self.widget.get(match.end_line, f"{end_line_num}.end")
-
-            if trailing_text:
-                self.widget_delete("snippets", match.end_line, f"{end_line_num}.end")
+            line_1 = text.count("\n", 0, match.start(0))
+            line_2 = line_1 + match.group(0).count("\n") + 1
+            txt = Markdown.get_list_text(lines[line_1:line_2], mode)
 
-            # --- 4. DELETE THE SNIPPET ---
-            # Delete from the SAFE start index (after "ai: ") to the end of the block
-            self.widget_delete("snippets", actual_start_index, match.end_line)
-
-            # --- 5. INSERT WIDGET WITH PROPER SPACING ---
-            insertion_line = match.line_num
-
-            if is_inline_start:
-                # Case: "ai: ```python..."
-                # We want:
-                # 1. ai:        (preserved line)
-                # 2.            (blank line)
-                # 3. [Widget]
+            if not txt:
+                continue
 
-                # Insert TWO newlines at the end of the preserved prompt line
-                self.widget_insert("snippets", f"{insertion_line}.end", "\n\n")
-                insertion_line += 2
-            else:
-                # Case: Code block starts on its own line
-                # Ensure exactly one empty line ABOVE the widget
-                above_idx = insertion_line - 1
-                if above_idx >= 1:
-                    above_line = self.widget.get(f"{above_idx}.0", f"{above_idx}.end")
-                    if above_line.strip() != "":
-                        self.widget_insert("snippets", f"{above_idx}.end", "\n")
-                        insertion_line += 1
-
-            # Create and insert the snippet widget
-            snippet = Snippet(self.widget, match.content, match.language)
-            widgets.window(self.widget, insertion_line, snippet)
-            self.widget.snippets.append(snippet)
+            new_lines = txt.split("\n")
 
-            # Ensure exactly one empty line AFTER the widget
-            after_idx = insertion_line + 1
-            after_line = self.widget.get(f"{after_idx}.0", f"{after_idx}.end")
+            # Lists are kept apart from the text around them by an empty line
+            if (line_2 < len(lines)) and lines[line_2].strip():
+                new_lines.append("")
 
-            if after_line.strip() != "":
-                self.widget_insert("snippets", f"{after_idx}.0", "\n")
+            if line_1 > 0:
+                if lines[line_1 - 1].strip():
+                    new_lines.insert(0, "")
+            elif first:
+                # A list right after the prompt goes below it
+                new_lines = ["", "", *new_lines]
 
-            # Re-insert trailing text if any
-            if trailing_text:
-                self.widget_insert("snippets", f"{insertion_line + 2}.0", trailing_text)
+            lines[line_1:line_2] = new_lines
 
-        return len(matches) > 0, num_lines
+        return "\n".join(lines)
 
-    def format_lists(self, start_ln: int, end_ln: int, who: str, mode: str) -> bool:
-        lines = self.get_lines(start_ln, end_ln, who)
-        text = "\n".join(lines)
-        matches = []
+    @staticmethod
+    def get_list_text(lines: list[str], mode: str) -> str:
+        lines = [line.strip() for line in lines]
+        spacing_mode = getattr(args, f"{mode}_spacing")
 
-        if mode == "ordered":
-            pattern = Markdown.pattern_list_ordered
+        if spacing_mode == "never":
+            spaced = False
+        elif spacing_mode == "always":
+            spaced = True
         else:
-            pattern = Markdown.pattern_list_unordered
-
-        for match_ in re.finditer(pattern, text, flags=re.MULTILINE | re.DOTALL):
-            content_start = match_.start(0)
-            line_1 = self.get_line_number(text, content_start)
-            start_line = f"{start_ln + line_1}.0"
-
-            content_end = match_.end(0)
-            line_2 = self.get_line_number(text, content_end)
-            end_line = f"{start_ln + line_2}.0"
-
-            matches.append((start_line, end_line, content_start, match_.group(0)))
-
-        len_matches = len(matches)
-
-        for start_line, end_line, content_start, mtch in reversed(matches):
-            line_1 = text[:content_start].count("\n")
-            line_2 = len(mtch.split("\n"))
-            line_end = line_1 + line_2
-            sliced = lines[line_1:line_end]
-            sliced = [line.strip() for line in sliced]
-            spacing_mode = getattr(args, f"{mode}_spacing")
-            if spacing_mode == "never":
-                spaced = False
-            elif spacing_mode == "always":
-                spaced = True
-            else:
-                spaced = not all(line.strip() for line in sliced)
-
-            space_1 = ""
+            spaced = not all(line.strip() for line in lines)
 
-            if config.font_family == "monospace":
-                space_2 = " "
-            else:
-                space_2 = "  "
-
-            ord_char = args.ordered_char.rstrip()
-            un_char = args.unordered_char.rstrip()
-            items = []
-            n = 1
-
-            for line in sliced:
-                if re.match(r"^\d+[.)]", line):
-                    left = f"{space_1}{n}{ord_char}{space_2}"
-                    c_line = re.sub(r"^\d+[.)]\s*", "", line).strip()
-                    items.append(f"{self.marker_indent_ordered}{left}{c_line}")
-                    n += 1
-                elif line.startswith(("*", "-")):
-                    left = f"{space_1}{un_char}{space_2}"
-                    c_line = re.sub(r"^[*-]\s*", "", line).strip()
-                    items.append(f"{self.marker_indent_unordered}{left}{c_line}")
-
-            if len(items) == 0:
-                len_matches -= 1
-                continue
-
-            if spaced:
-                txt = "\n\n".join(items)
-            else:
-                txt = "\n".join(items)
-
-            content_below = self.widget.get(
-                f"{end_line} +1 lines linestart", f"{end_line} +1 lines lineend"
-            ).strip()
-
-            if content_start == 0:
-                end_of_line_above = f"{start_line} lineend"
-                chars = len(lines[0])
-                right_bit = f"{end_of_line_above} -{chars} chars"
-
-                self.widget_delete(
-                    "lists",
-                    right_bit,
-                    end_of_line_above,
-                )
-
-                self.widget_insert(
-                    "lists",
-                    end_of_line_above,
-                    "\n\n\n",
-                )
-
-                self.widget_delete(
-                    "lists",
-                    f"{start_line} +1 lines",
-                    f"{end_line} +3 lines lineend",
-                )
-
-                txt = f"\n{txt}"
-
-                if content_below:
-                    txt += "\n"
-
-                self.widget_insert(
-                    "lists",
-                    f"{start_line} +1 lines",
-                    txt,
-                )
-            else:
-                content_above = self.widget.get(
-                    f"{start_line} - 1 lines linestart",
-                    f"{start_line} - 1 lines lineend",
-                ).strip()
+        space_1 = ""
 
-                if content_above:
-                    txt = f"\n{txt}"
+        if config.font_family == "monospace":
+            space_2 = " "
+        else:
+            space_2 = "  "
 
-                if content_below:
-                    txt += "\n"
+        ord_char = args.ordered_char.rstrip()
+        un_char = args.unordered_char.rstrip()
+        items = []
+        n = 1
 
-                self.widget_delete(
-                    "lists",
-                    f"{start_line} linestart",
-                    f"{end_line} lineend",
-                )
+        for line in lines:
+            match_ = Markdown.pattern_item_ordered.match(line)
 
-                self.widget_insert(
-                    "lists",
-                    start_line,
-                    txt,
-                )
+            if match_:
+                left = f"{space_1}{n}{ord_char}{space_2}"
+                c_line = line[match_.end() :].strip()
+                items.append(f"{Markdown.marker_indent_ordered}{left}{c_line}")
+                n += 1
+            elif line.startswith(("*", "-")):
+                left = f"{space_1}{un_char}{space_2}"
+                c_line = Markdown.pattern_item_unordered.sub("", line).strip()
+                items.append(f"{Markdown.marker_indent_unordered}{left}{c_line}")
 
-        return len_matches > 0
+        if not items:
+            return ""
 
-    def format_separators(self, start_ln: int, end_ln: int, who: str) -> None:
-        matches = []
-        lines = self.get_lines(start_ln, end_ln, who)
+        if spaced:
+            return "\n\n".join(items)
 
-        for i, line in enumerate(lines):
-            if re.match(Markdown.pattern_separator, line):
-                matches.append(i)
-
-        for i in reversed(matches):
-            self.widget_delete(
-                "separators",
-                f"{start_ln + i}.0",
-                f"{start_ln + i}.end",
-            )
-
-            self.widget_insert(
-                "separators",
-                f"{start_ln + i}.0",
-                Markdown.separator,
-            )
-
-            self.widget.tag_add(
-                "separator",
-                f"{start_ln + i}.0",
-                f"{start_ln + i}.0 + {len(Markdown.separator)}c",
-            )
+        return "\n".join(items)
 
     def get_lines(self, start_ln: int, end_ln: int, who: str) -> list[str]:
+        lines, _ = self.get_section(start_ln, end_ln, who)
+        return lines
+
+    def get_section(
+        self, start_ln: int, end_ln: int, who: str
+    ) -> tuple[list[str], int]:
+        # Also returns the column where the first line starts after the prompt
         text = self.widget.get(f"{start_ln}.0", f"{end_ln}.end")
         lines = text.split("\n")
-        _, end_col = self.prompt_cols(start_ln)
+        first_col = 0
 
         if who in ("user", "ai"):
+            _, end_col = self.prompt_cols(start_ln)
             line = lines[0][end_col - 1 :].lstrip()
+            first_col = len(lines[0]) - len(line)
             lines[0] = line
 
-        return lines
-
-    def get_line_number(self, text: str, index: int) -> int:
-        return text.count("\n", 0, index)
+        return lines, first_col
 
     def next_marker(self, start_ln: int) -> int:
         markers = self.widget.get_markers(True, append=False)
@@ -894,30 +782,60 @@ class Markdown:
     def indent_lines(self) -> None:
         lines = self.widget.get("1.0", "end").split("\n")
 
-        def get_lns(marker: str) -> list[int]:
-            return [i + 1 for i, line in enumerate(lines) if line.startswith(marker)]
+        for i, line in enumerate(lines):
+            indent = Markdown.get_indent(line)
+
+            if not indent:
+                continue
+
+            name, space = indent
+            ln = f"{i + 1}.0"
+            self.widget.tag_add(name, ln, f"{ln} lineend")
 
-        def add_tags(lns: list[int], name: str) -> None:
-            for line in lns:
-                ln = f"{line}.0"
-                self.widget.tag_add(name, ln, f"{ln} lineend")
+            if space >= 0:
+                self.widget.tag_add("list", ln, f"{i + 1}.{space}")
 
-                try:
-                    space = lines[line - 1].index(" ")
-                    ln = f"{line}.0"
-                    ln_end = f"{line}.{space}"
-                    self.widget.tag_add("list", ln, ln_end)
-                except BaseException:
-                    pass
+    @staticmethod
+    def get_indent(line: str) -> tuple[str, int] | None:
+        # The indent tag of a list item and where its list marker ends
+        if line.startswith(Markdown.marker_indent_ordered):
+            name = "indent_ordered"
+        elif line.startswith(Markdown.marker_indent_unordered):
+            name = "indent_unordered"
+        else:
+            return None
 
-        or_lines = get_lns(Markdown.marker_indent_ordered)
-        add_tags(or_lines, "indent_ordered")
+        return name, line.find(" ")
 
-        un_lines = get_lns(Markdown.marker_indent_unordered)
-        add_tags(un_lines, "indent_unordered")
+    @staticmethod
+    def get_text_steps() -> list[tuple[str, Callable[[list[str]], str | None]]]:
+        # The line cleanups that run before the rest of the formatting
+        # Both the widget and the item renderer run them in this order
+        return [
+            ("think", Markdown.get_think_text),
+            ("roles", Markdown.get_roles_text),
+            ("clean", Markdown.get_clean_text),
+            ("join", Markdown.get_joined_text),
+        ]
 
-    def join_lines(self, start_ln: int, end_ln: int, who: str) -> bool:
+    def replace_text(
+        self,
+        start_ln: int,
+        end_ln: int,
+        who: str,
+        get_text: Callable[[list[str]], str | None],
+    ) -> bool:
         lines = self.get_lines(start_ln, end_ln, who)
+        text = get_text(lines)
+
+        if text is None:
+            return False
+
+        self.insert_first(start_ln, end_ln, text)
+        return True
+
+    @staticmethod
+    def get_joined_text(lines: list[str]) -> str:
         lines = [line.strip() for line in lines]
         joined_lines = []
         current: list[str] = []
@@ -960,13 +878,10 @@ class Markdown:
         else:
             do_join()
 
-        text = "\n".join(joined_lines).strip() + "\n"
-        self.insert_first(start_ln, end_ln, text)
-        return True
+        return "\n".join(joined_lines).strip() + "\n"
 
-    def clean_lines(self, start_ln: int, end_ln: int, who: str) -> bool:
-        lines = self.get_lines(start_ln, end_ln, who)
-        lines = [line.strip() for line in lines]
+    @staticmethod
+    def get_clean_text(lines: list[str]) -> str:
         cleaned = []
         empty = False
 
@@ -981,12 +896,10 @@ class Markdown:
                 cleaned.append(stripped)
                 empty = False
 
-        text = "\n".join(cleaned).strip() + "\n"
-        self.insert_first(start_ln, end_ln, text)
-        return True
+        return "\n".join(cleaned).strip() + "\n"
 
-    def replace_think(self, start_ln: int, end_ln: int, who: str) -> bool:
-        lines = self.get_lines(start_ln, end_ln, who)
+    @staticmethod
+    def get_think_text(lines: list[str]) -> str | None:
         new_lines = []
         started = False
         ended = False
@@ -1016,7 +929,7 @@ class Markdown:
                 new_lines.append(line)
 
         if (not started) or (not ended):
-            return False
+            return None
 
         if no_think:
             new_lines = [
@@ -1027,14 +940,12 @@ class Markdown:
 
         if new_lines:
             text = "\n".join(new_lines)
-            text = text.strip() + "\n"
-            self.insert_first(start_ln, end_ln, text)
-            return True
+            return text.strip() + "\n"
 
-        return False
+        return None
 
-    def replace_roles(self, start_ln: int, end_ln: int, who: str) -> bool:
-        lines = self.get_lines(start_ln, end_ln, who)
+    @staticmethod
+    def get_roles_text(lines: list[str]) -> str | None:
         new_lines = []
         user_text = args.role_user_text
         assistant_text = args.role_assistant_text
@@ -1055,11 +966,9 @@ class Markdown:
                 new_lines.append(line)
 
         if changed and new_lines:
-            text = "\n".join(new_lines).strip() + "\n"
-            self.insert_first(start_ln, end_ln, text)
-            return True
+            return "\n".join(new_lines).strip() + "\n"
 
-        return False
+        return None
 
     def widget_insert(self, where: str, *all_args: Any) -> None:
         self.widget.insert(*all_args)
@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+# Standard
+import json
+import time
+from typing import Any
+
+# Modules
+from .args import args
+from .paths import paths
+from .utils import utils
+
+
+class StreamMetrics:
+    def __init__(self) -> None:
+        self.waited = 0.0
+        self.started = 0.0
+        self.first_chunk = 0.0
+        self.last_chunk = 0.0
+        self.lock_wait = 0.0
+        self.chunks = 0
+        self.bytes = 0
+        self.gaps: list[float] = []
+        self.attempts: list[float] = []
+        self.retries = 0
+        self.fallback = ""
+        self.failed = False
+
+    def wait(self) -> None:
+        # Called right before waiting for the model lock
+        self.waited = time.perf_counter()
+
+    def start(self) -> None:
+        # Called once the model lock is acquired and the request goes out
+        self.started = time.perf_counter()
+
+        if self.waited:
+            self.lock_wait = self.started - self.waited
+
+    def chunk(self, text: str) -> None:
+        now = time.perf_counter()
+
+        if self.chunks == 0:
+            self.first_chunk = now
+        else:
+            self.gaps.append(now - self.last_chunk)
+
+        self.last_chunk = now
+        self.chunks += 1
+        self.bytes += len(text.encode("utf-8"))
+
+    def percentile(self, values: list[float], pct: int) -> float:
+        if not values:
+            return 0.0
+
+        index = round((pct / 100) * (len(values) - 1))
+        return values[index]
+
+    def to_dict(self) -> dict[str, Any]:
+        gaps = sorted(self.gaps)
+        ttft = (self.first_chunk - self.started) if self.chunks else 0.0
+
+        def ms(value: float) -> float:
+            return round(value * 1000, 2)
+
+        return {
+            "ttft": ms(ttft),
+            "lock_wait": ms(self.lock_wait),
+            "chunks": self.chunks,
+            "bytes": self.bytes,
+            "p50": ms(self.percentile(gaps, 50)),
+            "p95": ms(self.percentile(gaps, 95)),
+            "p99": ms(self.percentile(gaps, 99)),
+            "retries": self.retries,
+            "attempts": [ms(value) for value in self.attempts],
+            "fallback": self.fallback,
+            "failed": self.failed,
+        }
+
+
+class Metrics:
+    def __init__(self) -> None:
+        self.keys = ["ttft", "lock_wait", "p50", "p95", "p99"]
+
+    def get_items(self, tab_id: str | None = None) -> list[Any]:
+        from .display import display
+
+        tabconvo = display.get_tab_convo(tab_id)
+
+        if not tabconvo:
+            return []
+
+        return [item for item in tabconvo.convo.items if item.metrics]
+
+    def show(self, tab_id: str | None = None) -> None:
+        from .dialogs import Dialog
+
+        items = self.get_items(tab_id)
+
+        if not items:
+            Dialog.show_message("No stream metrics yet.")
+            return
+
+        lines = [f"Streams: {len(items)}"]
+        failed = [item for item in items if item.metrics.get("failed")]
+
+        if failed:
+            lines.append(f"Failed: {len(failed)}")
+
+        # Failed streams have no chunks so they would skew the latencies
+        items = [item for item in items if not item.metrics.get("failed")]
+
+        if not items:
+            Dialog.show_message("\n".join(lines))
+            return
+
+        num = len(items)
+
+        for key in self.keys:
+            values = sorted(item.metrics[key] for item in items)
+            mid = values[num // 2]
+            lines.append(f"{key}: {mid} ms (median) | {values[-1]} ms (max)")
+
+        chunks = sum(item.metrics["chunks"] for item in items)
+        size = sum(item.metrics["bytes"] for item in items)
+        lines.append(f"Chunks: {chunks}")
+        lines.append(f"Bytes: {size}")
+
+        last = items[-1].metrics
+        lines.append("")
+        lines.append(f"Last: TTFT {last['ttft']} ms | p50 {last['p50']} ms")
+        lines.append(f"p95 {last['p95']} ms | p99 {last['p99']} ms")
+
+        Dialog.show_message("\n".join(lines))
+
+    def export(self) -> None:
+        from .session import session
+        from .display import display
+        from .writer import writer
+        from .pump import pump
+
+        lines = []
+
+        for convo in session.conversations.values():
+            source = convo.source
+
+            # Unloaded conversations are read from disk without attaching them
+            if convo.loaded or (not source):
+                items = convo.item_list
+            else:
+                items = convo.read_items(source)
+
+            for item in items:
+                if not item.metrics:
+                    continue
+
+                data = {
+                    "conversation": convo.id,
+                    "date": item.date,
+                    "model": item.model,
+                    "duration": item.duration,
+                    "tokens_per_second": item.tokens_per_second,
+                    **item.metrics,
+                }
+
+                lines.append(json.dumps(data))
+
+        if not lines:
+            if not args.quiet:
+                display.print("No stream metrics to export.")
+
+            return
+
+        path = paths.metrics
+        text = "\n".join(lines) + "\n"
+
+        def write() -> None:
+            writer.write_atomic(path, text)
+
+            if not args.quiet:
+                pump.call(lambda: utils.saved_path(path))
+
+        writer.submit(str(path), write)
+
+
+metrics = Metrics()
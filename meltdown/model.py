@@ -3,15 +3,17 @@ from __future__ import annotations
 # Standard
 import os
 import json
+import time
 import base64
+import hashlib
 import threading
+from concurrent import futures
 from pathlib import Path
 from typing import Any, Callable
+from dataclasses import dataclass, field
 
 # Libraries
-import requests  # type: ignore
 import litellm
-import tiktoken
 from litellm import completion
 from litellm import image_generation
 from litellm.exceptions import Timeout
@@ -25,12 +27,21 @@ from litellm.litellm_core_utils.streaming_handler import CustomStreamWrapper
 from .app import app
 from .args import args
 from .config import config
-from .display import display
+from .display import display, TabConvo
 from .tips import tips
 from .utils import utils
 from .search import search
 from .files import files
-from .session import Item
+from .paths import paths
+from .item import Item
+from .tokenizer import tokenizer
+from .streams import streams, Stream
+from .pump import pump
+from .modelpool import modelpool
+from .loadreport import loadreports, LoadReport
+from .responsecache import responsecache
+from .retries import retries, CircuitOpenError
+from .filereader import filereader
 from .variables import variables
 
 litellm.drop_params = True
@@ -50,27 +61,32 @@ PromptArg = dict[str, Any]
 ToolCallsBuffer = dict[str, dict[str, Any]]
 
 
+@dataclass
+class ToolRun:
+    # Set once the tool starts running or its job ends
+    started: threading.Event = field(default_factory=threading.Event)
+    start: float = 0.0
+
+
 class Model:
     def __init__(self) -> None:
         self.mode = None
         self.lock = threading.Lock()
-        self.stop_stream_thread = threading.Event()
-        self.stream_thread = threading.Thread()
-        self.streaming = False
-        self.stream_loading = False
         self.model: LlamaCPP | None = None  # type: ignore
         self.model_loading = False
+        self.load_report: LoadReport | None = None
         self.loaded_model = ""
         self.loaded_format = ""
         self.loaded_provider = ""
         self.loaded_type = ""
         self.load_thread = threading.Thread()
-        self.stream_date = 0.0
-        self.last_response = ""
+        self.load_date = 0.0
         self.icon_text = ""
         self.stream_timeout = 180
         self.tools_timeout = 60
-        self.read_file_timeout = 10
+        self.message_tokens = 4
+        self.tool_executor: futures.ThreadPoolExecutor | None = None
+        self.tool_lock = threading.Lock()
         self.stop_stream_timeout = 5
 
         kerr = "Use the model menu to set it."
@@ -166,6 +182,9 @@ class Model:
             "memory_20250818": self.handle_memory_tool,
         }
 
+        # Tools that change files run in order instead of in parallel
+        self.serial_tools = ["memory_20250818"]
+
     def setup(self) -> None:
         from .paths import paths
 
@@ -181,6 +200,10 @@ class Model:
 
         self.stop_stream()
 
+        # An explicit unload also frees the resident models
+        if announce:
+            modelpool.clear()
+
         if self.loaded_model and announce:
             msg = "Model unloaded"
             display.print(utils.emoji_text(msg, "unloaded"))
@@ -219,6 +242,11 @@ class Model:
             utils.msg("(Load) Slow down!")
             return
 
+        # Resident local models only hold memory once a remote one is used
+        if self.is_remote_model():
+            self.unload()
+            modelpool.clear()
+
         if self.model_is_gpt(self.get_model()):
             self.unload()
             self.load_openai(tab_id, prompt)
@@ -248,7 +276,7 @@ class Model:
                 self.stream(prompt, tab_id)
 
         self.unload()
-        self.stream_date = utils.now()
+        self.load_date = utils.now()
         self.load_thread = threading.Thread(target=lambda: wrapper())
         self.load_thread.daemon = True
         self.load_thread.start()
@@ -260,7 +288,7 @@ class Model:
         self.model_loading = False
         self.loaded_format = ""
         self.loaded_provider = ""
-        self.stream_date = 0.0
+        self.load_date = 0.0
         self.update_icon()
 
     def read_openai_key(self) -> None:
@@ -384,15 +412,19 @@ class Model:
         self.model_loading = True
         now = utils.now()
         chat_format = config.format
+        llama_args = self.get_llama_args(model)
+        key = modelpool.get_key(model, llama_args)
+        pooled = modelpool.get(key)
+
+        if pooled:
+            self.lock.acquire()
+            self.model = pooled
+            self.after_load_local(model, chat_format, now, quiet)
+            return True
 
         try:
             chat_handler = None
 
-            if config.logits == "all":
-                logits_all = True
-            else:
-                logits_all = False
-
             if config.mode == "image":
                 mmproj = Path(Path(model).parent / "mmproj.gguf")
 
@@ -415,9 +447,7 @@ class Model:
                 self.model_loading = False
                 return False
 
-            fmt = config.format if (chat_format != "auto") else None
             name = Path(model).name
-            mlock = config.mlock == "yes"
             display.to_bottom(tab_id)
 
             if args.model_feedback and (not args.quiet):
@@ -426,22 +456,8 @@ class Model:
 
             app.update()
             self.lock.acquire()
-
-            self.model = LlamaCPP(
-                model_path=model,
-                n_ctx=config.context,
-                n_batch=config.batch_size,
-                n_ubatch=config.ubatch_size,
-                n_threads=config.threads,
-                n_gpu_layers=config.gpu_layers,
-                main_gpu=config.main_gpu,
-                tensor_split=self.tensor_split(),
-                use_mlock=mlock,
-                chat_format=fmt,
-                chat_handler=chat_handler,
-                logits_all=logits_all,
-                verbose=args.verbose,
-            )
+            self.load_report = LoadReport(llama_args)
+            self.model = self.create_llama(llama_args, chat_handler, self.load_report)
         except BaseException as e:
             utils.error(e)
             display.print("Error: Model failed to load.")
@@ -449,14 +465,57 @@ class Model:
             self.release_lock()
             return False
 
+        modelpool.add(key, self.model)
+        self.after_load_local(model, chat_format, now, quiet)
+        modelpool.preload(model, self.get_llama_args, self.create_llama)
+        return True
+
+    def after_load_local(
+        self, model: str, chat_format: str, start_date: float, quiet: bool
+    ) -> None:
         self.model_loading = False
         self.loaded_model = model
         self.loaded_format = chat_format
         self.loaded_provider = "local"
         self.loaded_type = "local"
-        self.after_load(now, quiet=quiet)
+        self.after_load(start_date, quiet=quiet)
         self.release_lock()
-        return True
+
+    def get_llama_args(self, model: str) -> dict[str, Any]:
+        fmt = config.format if (config.format != "auto") else None
+
+        return {
+            "model_path": model,
+            "n_ctx": config.context,
+            "n_batch": config.batch_size,
+            "n_ubatch": config.ubatch_size,
+            "n_threads": config.threads,
+            "n_gpu_layers": config.gpu_layers,
+            "main_gpu": config.main_gpu,
+            "tensor_split": self.tensor_split(),
+            "use_mmap": args.mmap,
+            "use_mlock": config.mlock == "yes",
+            "chat_format": fmt,
+            "logits_all": config.logits == "all",
+            "verbose": args.verbose,
+        }
+
+    def create_llama(
+        self,
+        llama_args: dict[str, Any],
+        chat_handler: Any = None,
+        report: LoadReport | None = None,
+    ) -> Any:
+        if not report:
+            report = LoadReport(llama_args)
+
+        llama_class = loadreports.get_class(LlamaCPP)
+        llama = llama_class(**llama_args, chat_handler=chat_handler, report=report)
+
+        report.done()
+        loadreports.record(report)
+        self.set_cache(llama_args["model_path"], llama)
+        return llama
 
     def after_load(self, start_date: float, quiet: bool = False) -> None:
         from .system import system
@@ -475,30 +534,48 @@ class Model:
         if args.system_auto_hide:
             system.check_auto_hide()
 
-    def is_loading(self) -> bool:
-        return self.model_loading or self.stream_loading
+    @property
+    def streaming(self) -> bool:
+        return streams.is_running()
 
-    def stop_stream(self) -> None:
-        if self.stop_stream_thread.is_set():
-            return
+    def last_used(self) -> float:
+        # When the model was loaded or any of its streams last started or ended
+        if not self.load_date:
+            return 0.0
 
-        if self.stream_thread and self.stream_thread.is_alive():
-            self.stop_stream_thread.set()
-            self.stream_thread.join(timeout=self.stop_stream_timeout)
+        return max(self.load_date, streams.get_date())
 
-            if args.model_feedback and (not args.quiet):
-                display.print("< Interrupted >")
+    def is_loading(self, tab_id: str | None = None) -> bool:
+        return self.model_loading or streams.is_loading(tab_id)
+
+    def stop_stream(self, tab_id: str | None = None) -> None:
+        if not streams.stop(tab_id, self.stop_stream_timeout):
+            return
+
+        if args.model_feedback and (not args.quiet):
+            display.print("< Interrupted >", tab_id=tab_id)
 
+        if not streams.is_running():
             app.on_stop_requested()
 
-    def stream(self, prompt: PromptArg, tab_id: str | None = None) -> None:
-        if self.is_loading():
-            utils.msg("(Stream) Slow down!")
-            return
+    def start_stream(self, tab_id: str, target: Callable[[Stream], None]) -> None:
+        # Remote streams run in parallel across tabs
+        # The local model is shared so it stops every other stream
+        if self.is_remote_model():
+            self.stop_stream(tab_id)
+        else:
+            self.stop_stream()
+
+        streams.start(tab_id, self.loaded_provider, target)
 
+    def stream(self, prompt: PromptArg, tab_id: str | None = None) -> None:
         if not tab_id:
             tab_id = display.current_tab
 
+        if self.is_loading(tab_id):
+            utils.msg("(Stream) Slow down!")
+            return
+
         tabconvo = display.get_tab_convo(tab_id)
 
         if not tabconvo:
@@ -521,17 +598,11 @@ class Model:
             self.load(prompt, tab_id)
             return
 
-        def wrapper(prompt: PromptArg, tab_id: str) -> None:
-            self.stop_stream_thread.clear()
-            self.streaming = True
-            app.do_checks()
-            self.do_stream(prompt, tab_id)
-            self.streaming = False
+        def wrapper(stream: Stream) -> None:
+            pump.call(app.do_checks)
+            self.do_stream(prompt, tab_id, stream)
 
-        self.stop_stream()
-        self.stream_thread = threading.Thread(target=lambda: wrapper(prompt, tab_id))
-        self.stream_thread.daemon = True
-        self.stream_thread.start()
+        self.start_stream(tab_id, wrapper)
 
     def prepare_stream(
         self,
@@ -549,7 +620,7 @@ class Model:
             prompt_file = files.clean_path(prompt_file)
 
             if (not utils.is_url(prompt_file)) and (not Path(prompt_file).exists()):
-                display.print("Error: File not found.")
+                self.show_text("Error: File not found.", tab_id)
                 return None
 
         prompt_text = self.limit_tokens(prompt_text)
@@ -614,39 +685,7 @@ class Model:
             except Exception:
                 pass
 
-        if tabconvo.convo.items and config.history and (not no_history):
-            history_items = tabconvo.convo.items
-
-            if history_cutoff >= 0:
-                history_items = history_items[:history_cutoff]
-
-            for item in history_items[-abs(config.history) :]:
-                user_value = getattr(item, "user", "")
-                ai_value = getattr(item, "ai", "")
-
-                if (not user_value) or (not ai_value):
-                    continue
-
-                if self.long_url(user_value) or self.long_url(ai_value):
-                    continue
-
-                for key in ["user", "ai"]:
-                    if key == "user":
-                        content = user_value
-                    elif key == "ai":
-                        content = ai_value
-                    else:
-                        continue
-
-                    if key == "user":
-                        content = utils.replace_keywords(content)
-                        role = "user"
-                    elif key == "ai":
-                        role = "assistant"
-                    else:
-                        continue
-
-                    messages.append({"role": role, "content": content})
+        history_index = len(messages)
 
         prompt_text = utils.replace_keywords(prompt_text)
 
@@ -657,7 +696,6 @@ class Model:
 
         if prompt_file and (config.mode == "text"):
             file_text = self.read_file(prompt_file)
-            file_text = self.limit_tokens(file_text)
 
             if file_text:
                 messages.append({"role": "user", "content": file_text})
@@ -687,30 +725,44 @@ class Model:
 
             messages.append({"role": "user", "content": ptext})
 
+        if tabconvo.convo.items and config.history and (not no_history):
+            history_items = tabconvo.convo.items
+
+            if history_cutoff >= 0:
+                history_items = history_items[:history_cutoff]
+
+            budget = self.get_token_budget(messages)
+            history_items = history_items[-abs(config.history) :]
+            history = self.get_history(history_items, budget, tab_id)
+            messages[history_index:history_index] = history
+
         o_text = prompt_user if prompt_user else original_text
 
         if not prompt_user:
             prompt_user = prompt_text
 
-        display.prompt(
-            "user",
-            text=prompt_user,
-            tab_id=tab_id,
-            original=o_text,
-            file=original_file,
-        )
+        def show_prompt() -> None:
+            display.prompt(
+                "user",
+                text=prompt_user,
+                tab_id=tab_id,
+                original=o_text,
+                file=original_file,
+            )
 
-        display.prompt(
-            "ai",
-            text=args.thinking_text,
-            tab_id=tab_id,
-        )
+            display.prompt(
+                "ai",
+                text=args.thinking_text,
+                tab_id=tab_id,
+            )
 
+            display.stream_started(tab_id)
+
+        pump.call(show_prompt, tab_id)
         convo_item = tabconvo.convo.add(log_dict)
-        display.stream_started(tab_id)
         return messages, convo_item
 
-    def do_stream(self, prompt: PromptArg, tab_id: str) -> None:
+    def do_stream(self, prompt: PromptArg, tab_id: str, stream: Stream) -> None:
         prepared = self.prepare_stream(prompt, tab_id)
 
         if not prepared:
@@ -722,108 +774,217 @@ class Model:
             return
 
         now = utils.now()
-        self.stream_date = now
+        stream.date = now
         messages, convo_item = prepared
-        self.stream_loading = True
-        self.lock.acquire()
+        stream.loading = True
+        stream_metrics = stream.metrics
+        stream_metrics.wait()
+
+        if not self.is_remote_model():
+            self.lock.acquire()
+            stream.locked = True
+
+        stream_metrics.start()
         gen_config = self.get_gen_config(messages)
+        cached = responsecache.get(gen_config)
+
+        if cached is not None:
+            response = self.replay_response(cached, tab_id, stream)
+        else:
+            response = self.get_response(gen_config, tab_id, stream)
+
+        if not response:
+            self.save_failed(tabconvo, convo_item, stream)
+            self.release_stream(stream)
+            return
+
+        ans, start_gen, num_tokens = response
+        res = ans.strip()
+        now_2 = utils.now()
+
+        if res and (not stream_metrics.chunks):
+            stream_metrics.chunk(res)
+
+        if res:
+            duration = now_2 - now
+            convo_item.ai = res
+            convo_item.duration = duration
+            tps_duration = duration
+
+            if start_gen > 0:
+                stream_duration = now_2 - start_gen
+
+                # Avoid huge TPS numbers from buffered chunks
+                if stream_duration > 0.2:
+                    tps_duration = stream_duration
+
+            tokens_per_second = self.calculate_tokens_per_second(
+                res, tps_duration, num_tokens
+            )
+
+            if tokens_per_second is not None:
+                try:
+                    convo_item.tokens_per_second = tokens_per_second
+                except Exception:
+                    pass
+
+            convo_item.metrics = stream_metrics.to_dict()
+
+            tabconvo.convo.update([convo_item])
+            stream.response = res
+
+            if (cached is None) and (not stream.stop_event.is_set()):
+                responsecache.add(stream.gen_config or gen_config, res)
+
+            if args.durations:
+                word = utils.singular_or_plural(duration, "second", "seconds")
+                self.show_text(f"Duration: {duration:.2f} {word}", tab_id)
+        else:
+            self.save_failed(tabconvo, convo_item, stream)
+
+        stream.date = now_2
+        self.release_stream(stream)
+
+    def save_failed(self, tabconvo: TabConvo, item: Item, stream: Stream) -> None:
+        # Streams without an answer are kept in the metrics too
+        stream.metrics.failed = True
+        item.metrics = stream.metrics.to_dict()
+        tabconvo.convo.update([item])
+
+    def get_response(
+        self, gen_config: dict[str, Any], tab_id: str, stream: Stream
+    ) -> tuple[str, float, int | None] | None:
         output: ModelResponse | CustomStreamWrapper | Any | None = None
 
         if self.is_remote_model():
+            configs = [gen_config]
+            fallback = self.get_fallback_config(gen_config)
+
+            if fallback:
+                configs.append(fallback)
+
+            def call(config: dict[str, Any]) -> Any:
+                return completion(**config, timeout=self.stream_timeout)
+
             try:
-                output = completion(**gen_config, timeout=self.stream_timeout)
+                # The response cache keys the answer on the config that gave it
+                output, stream.gen_config = retries.run(call, configs, stream)
+            except CircuitOpenError as e:
+                self.show_text(f"Error: {e}. The provider keeps failing.", tab_id)
+                return None
             except BaseException as e:
                 utils.error(e)
 
-                display.print(
+                self.show_text(
                     "Error: Remote model failed to stream."
                     " You might not have access to this particular model,"
                     " not enough credits, invalid API key,"
-                    " or there is no internet connection."
+                    " or there is no internet connection.",
+                    tab_id,
                 )
 
-                self.stream_loading = False
-                self.release_lock()
-                return
+                return None
         else:
             if not self.model:
-                self.stream_loading = False
-                self.release_lock()
-                return
+                return None
 
             try:
                 output = self.model.create_chat_completion_openai_v1(**gen_config)  # type: ignore[attr-defined]
             except BaseException as e:
                 utils.error(e)
-                self.stream_loading = False
-                self.release_lock()
-                return
-
-        self.stream_loading = False
+                return None
 
-        if self.stream_date != now:
-            self.release_lock()
-            return
+        stream.loading = False
 
-        if self.stop_stream_thread.is_set():
-            self.release_lock()
-            return
+        if stream.stop_event.is_set():
+            return None
 
         if not output:
-            self.release_lock()
-            return
+            return None
 
         try:
             if config.stream == "yes":
-                ans, start_gen = self.process_stream(output, tab_id)
-            else:
-                ans, start_gen = self.process_instant(output, tab_id)
+                return self.process_stream(output, tab_id, stream)
+
+            return self.process_instant(output, tab_id, stream)
         except BaseException as e:
             utils.error(e)
-            self.release_lock()
-            return
+            return None
 
-        res = ans.strip()
-        now_2 = utils.now()
+    def get_provider(self, name: str) -> str:
+        if self.model_is_gpt(name):
+            return "openai"
 
-        if res:
-            duration = now_2 - now
-            convo_item.ai = res
-            convo_item.duration = duration
-            tps_duration = duration
+        if self.model_is_gemini(name):
+            return "gemini"
 
-            if start_gen > 0:
-                stream_duration = now_2 - start_gen
+        if self.model_is_claude(name):
+            return "anthropic"
 
-                # Avoid huge TPS numbers from buffered chunks
-                if stream_duration > 0.2:
-                    tps_duration = stream_duration
+        return ""
 
-            tokens_per_second = self.calculate_tokens_per_second(res, tps_duration)
+    def get_provider_key(self, provider: str) -> str:
+        if provider == "openai":
+            self.read_openai_key()
+            return self.openai_key
 
-            if tokens_per_second is not None:
-                try:
-                    convo_item.tokens_per_second = tokens_per_second
-                except Exception:
-                    pass
+        if provider == "gemini":
+            self.read_google_key()
+            return self.google_key
 
-            tabconvo.convo.update()
-            self.last_response = res
+        if provider == "anthropic":
+            self.read_anthropic_key()
+            return self.anthropic_key
 
-            if args.durations:
-                word = utils.singular_or_plural(duration, "second", "seconds")
-                display.print(f"Duration: {duration:.2f} {word}", tab_id=tab_id)
+        return ""
 
-        self.stream_date = now_2
-        self.release_lock()
+    def get_fallback_config(self, gen_config: dict[str, Any]) -> dict[str, Any] | None:
+        name = args.fallback_model
+
+        if not name:
+            return None
+
+        provider = self.get_provider(name)
+        model = f"{provider}/{name}"
+
+        if (not provider) or (model == gen_config.get("model")):
+            return None
+
+        key = self.get_provider_key(provider)
+
+        if not key:
+            return None
+
+        # Built like the main config so it only gets what its provider takes
+        fallback = self.get_gen_config(gen_config["messages"], name=name)
+        return {**fallback, "api_key": key}
+
+    def replay_response(
+        self, text: str, tab_id: str, stream: Stream
+    ) -> tuple[str, float, int | None]:
+        stream.loading = False
+        stream.metrics.chunk(text)
+        self.new_answer(tab_id, live=True)
+
+        pump.push(
+            text,
+            tab_id=tab_id,
+            to_bottom=args.auto_scroll,
+            stop_event=stream.stop_event,
+        )
+
+        pump.wait(tab_id, stream.stop_event)
+        return text, 0.0, self.count_tokens(text)
 
     def process_stream(
         self,
         output: ModelResponse | CustomStreamWrapper,
         tab_id: str,
-    ) -> tuple[str, float]:
+        stream: Stream | None = None,
+    ) -> tuple[str, float, int | None]:
         broken = False
         first_content = False
+        num_tokens = 0
         first_token_time = 0.0
         token_printed = False
         last_token = " "
@@ -833,14 +994,18 @@ class Model:
         tool_calls_buffer: ToolCallsBuffer = {}
         has_tool_calls = False
 
+        stop_event = stream.stop_event if stream else None
+
         def print_buffer() -> None:
             if not len(buffer):
                 return
 
-            display.insert(
+            # The main loop inserts it, like everything else this thread shows
+            pump.push(
                 "".join(buffer),
                 tab_id=tab_id,
                 to_bottom=args.auto_scroll,
+                stop_event=stop_event,
             )
 
             buffer.clear()
@@ -861,7 +1026,7 @@ class Model:
 
         try:
             for chunk in output:
-                if self.stop_stream_thread.is_set():
+                if stop_event and stop_event.is_set():
                     broken = True
                     break
 
@@ -916,9 +1081,11 @@ class Model:
                     continue
 
                 if token:
+                    if stream:
+                        stream.metrics.chunk(token)
+
                     if not first_content:
-                        display.remove_last_ai(tab_id)
-                        display.prompt("ai", tab_id=tab_id)
+                        self.new_answer(tab_id, live=True)
                         first_content = True
                         first_token_time = utils.now()
 
@@ -937,6 +1104,7 @@ class Model:
 
                     add_token(token)
                     buffer.append(token)
+                    num_tokens += self.count_chunk_tokens(token)
                     now = utils.now()
 
                     if (now - buffer_date) >= args.delay:
@@ -947,94 +1115,91 @@ class Model:
                 if not broken:
                     print_buffer()
 
+                pump.wait(tab_id, stop_event)
+
                 if not first_content:
                     desc = self.describe_tool_calls_from_buffer(tool_calls_buffer)
 
                     if not desc:
                         desc = "Using tools..."
 
-                    display.remove_last_ai(tab_id)
-                    display.prompt("ai", text=desc, tab_id=tab_id)
+                    self.new_answer(tab_id, text=desc)
 
-                tool_response = self.handle_tool_calls(tool_calls_buffer, tab_id)
+                tool_response = self.handle_tool_calls(
+                    tool_calls_buffer, tab_id, stream
+                )
 
                 if tool_response:
                     if not first_content:
-                        display.remove_last_ai(tab_id)
-                        display.prompt("ai", tab_id=tab_id)
+                        self.new_answer(tab_id)
 
                     tokens.append(tool_response)
+                    num_tokens += self.count_tokens(tool_response) or 0
 
-                    display.insert(
+                    pump.push(
                         tool_response,
                         tab_id=tab_id,
                         to_bottom=args.auto_scroll,
+                        stop_event=stop_event,
                     )
                 elif not first_content:
-                    display.remove_last_ai(tab_id)
+                    pump.call(lambda: display.remove_last_ai(tab_id), tab_id)
         except InternalServerError as e:
             utils.error(e)
 
-            display.print(
-                "Error: The model is overloaded. Please try again later.",
-                tab_id=tab_id,
+            self.show_text(
+                "Error: The model is overloaded. Please try again later.", tab_id
             )
 
             broken = True
         except NotFoundError as e:
             utils.error(e)
 
-            display.print(
-                "Error: The model was not found. Check the path.",
-                tab_id=tab_id,
-            )
+            self.show_text("Error: The model was not found. Check the path.", tab_id)
 
             broken = True
         except RateLimitError as e:
             utils.error(e)
 
-            display.print(
-                "Error: Rate Limit or Quota exceeded.",
-                tab_id=tab_id,
-            )
+            self.show_text("Error: Rate Limit or Quota exceeded.", tab_id)
 
             broken = True
         except Timeout as e:
             utils.error(e)
 
-            display.print(
-                "Error: The request timed out.",
-                tab_id=tab_id,
-            )
+            self.show_text("Error: The request timed out.", tab_id)
 
             broken = True
         except BaseException as e:
             utils.error(e)
 
-            display.print(
-                "Error: Something happened that might interrupt the request.",
-                tab_id=tab_id,
+            self.show_text(
+                "Error: Something happened that might interrupt the request.", tab_id
             )
 
             broken = True
         if not broken:
             print_buffer()
 
-        return "".join(tokens), first_token_time
+        pump.wait(tab_id, stop_event)
+        return "".join(tokens), first_token_time, num_tokens or None
 
     def process_instant(
-        self, output: ModelResponse | Any | CustomStreamWrapper, tab_id: str
-    ) -> tuple[str, float]:
+        self,
+        output: ModelResponse | Any | CustomStreamWrapper,
+        tab_id: str,
+        stream: Stream,
+    ) -> tuple[str, float, int | None]:
         try:
             choices = getattr(output, "choices", None)
 
             if not choices or not choices[0]:
-                return "", 0.0
+                return "", 0.0, None
 
             message = choices[0].message
 
             if hasattr(message, "tool_calls") and message.tool_calls:
-                tool_messages = []
+                pending: list[tuple[str, str, dict[str, Any]]] = []
                 assistant_tool_calls = []
 
                 for tool_call in message.tool_calls:
@@ -1086,27 +1251,9 @@ class Model:
                     if not toolfunc:
                         continue
 
-                    try:
-                        # toolfunc is guaranteed to be callable here due to the check above
-                        result = toolfunc(**exec_args)
+                    pending.append((tool_call_id, fn_name, exec_args))
 
-                        tool_messages.append(
-                            {
-                                "tool_call_id": tool_call_id,
-                                "role": "tool",
-                                "name": fn_name,
-                                "content": str(result),
-                            }
-                        )
-                    except Exception as e:
-                        tool_messages.append(
-                            {
-                                "tool_call_id": tool_call_id,
-                                "role": "tool",
-                                "name": fn_name,
-                                "content": f"Error executing function: {e}",
-                            }
-                        )
+                tool_messages = self.run_tools(pending)
 
                 if tool_messages:
                     tabconvo = display.get_tab_convo(tab_id)
@@ -1149,9 +1296,7 @@ class Model:
                         gen_config = self.get_gen_config(messages)
 
                         if self.is_remote_model():
-                            follow_up = completion(
-                                **gen_config, timeout=self.tools_timeout
-                            )
+                            follow_up = self.tool_completion(gen_config, stream)
                         elif self.model:
                             local_gen_config = gen_config.copy()
 
@@ -1162,34 +1307,33 @@ class Model:
                                 **local_gen_config
                             )
                         else:
-                            return "", 0.0
+                            return "", 0.0, None
 
                         choices = getattr(follow_up, "choices", None)
 
                         if not choices or not choices[0]:
-                            return "", 0.0
+                            return "", 0.0, None
 
                         if choices and choices[0].message.content:
                             response = choices[0].message.content.strip()
-                            display.remove_last_ai(tab_id)
-                            display.prompt("ai", tab_id=tab_id)
-                            display.insert(response, tab_id=tab_id)
-                            return str(response), 0.0
+                            self.new_answer(tab_id)
+                            pump.push(response, tab_id=tab_id)
+                            num_tokens = self.get_usage_tokens(follow_up)
+                            return str(response), 0.0, num_tokens
 
-                return "", 0.0
+                return "", 0.0, None
 
             response = message.content.strip()
             response = utils.clean_lines(response)
 
             if response:
-                display.remove_last_ai(tab_id)
-                display.prompt("ai", tab_id=tab_id)
-                display.insert(response, tab_id=tab_id)
-                return str(response), 0.0
+                self.new_answer(tab_id)
+                pump.push(response, tab_id=tab_id)
+                return str(response), 0.0, self.get_usage_tokens(output)
         except BaseException as e:
             utils.error(e)
 
-        return "", 0.0
+        return "", 0.0, None
 
     def generate_image(self, prompt: str | None, tab_id: str | None = None) -> None:
         if not prompt:
@@ -1210,27 +1354,24 @@ class Model:
         elif not self.load_openai(tab_id, quiet=True):
             return
 
-        def wrapper(prompt: str, tab_id: str) -> None:
-            self.stop_stream_thread.clear()
-            self.streaming = True
-            app.do_checks()
+        def wrapper(stream: Stream) -> None:
+            pump.call(app.do_checks)
             self.do_generate_image(prompt, tab_id)
-            self.streaming = False
 
-        self.stop_stream()
-        self.stream_thread = threading.Thread(target=lambda: wrapper(prompt, tab_id))
-        self.stream_thread.daemon = True
-        self.stream_thread.start()
+        self.stop_stream(tab_id)
+        streams.start(tab_id, "image", wrapper)
 
     def do_generate_image(self, prompt: str, tab_id: str) -> None:
         prompt = prompt[: args.image_prompt_max].strip()
 
-        try:
+        def show_prompt() -> None:
             display.stream_started(tab_id)
             display.prompt("user", text=prompt, tab_id=tab_id, original=prompt)
             display.prompt("ai", text=args.generating_text, tab_id=tab_id)
+
+        try:
+            pump.call(show_prompt, tab_id)
             time_start = utils.now()
-            self.lock.acquire()
 
             response = image_generation(
                 n=1,
@@ -1263,8 +1404,7 @@ class Model:
             else:
                 link = f"![{link_text}](data:image/png;base64,{b64_json})"
 
-            display.remove_last_ai(tab_id)
-            display.prompt("ai", text=link, tab_id=tab_id)
+            self.new_answer(tab_id, text=link)
 
             log_dict: dict[str, Any] = {}
             log_dict["user"] = prompt
@@ -1280,13 +1420,10 @@ class Model:
             log_dict["file"] = ""
 
             tabconvo.convo.add(log_dict)
-            tabconvo.convo.update()
         except BaseException as e:
-            display.print("Error generating the image.")
+            self.show_text("Error generating the image.", tab_id)
             utils.error(e)
 
-        self.release_lock()
-
     def load_or_unload(self) -> None:
         if self.model_loading:
             return
@@ -1306,7 +1443,10 @@ class Model:
         tooltip = widgets.model_icon_tooltip
         text = ""
 
-        if not self.loaded_model:
+        if self.model_loading and self.load_report:
+            text = f"{int(self.load_report.progress * 100)}%"
+            self.icon_text = tips["model_loading"]
+        elif not self.loaded_model:
             if args.emojis:
                 text = utils.get_emoji("unloaded")
             else:
@@ -1430,30 +1570,79 @@ class Model:
         if self.lock.locked():
             self.lock.release()
 
-    def read_file(self, path: str) -> str:
-        text = ""
+    def set_cache(self, model: str, llama: Any) -> None:
+        # llama.cpp looks up the longest cached token prefix before evaluating
+        # So each conversation resumes from its own state, even across tabs
+        if args.local_cache == "none":
+            return
 
-        if utils.is_url(path):
-            try:
-                response = requests.get(path, timeout=self.read_file_timeout)
+        if args.local_cache_size <= 0:
+            return
 
-                if response.status_code == 200:
-                    text = str(response.text)
-            except BaseException as e:
-                utils.error(e)
-        else:
-            try:
-                text = files.read(Path(path))
-            except BaseException as e:
-                utils.error(e)
+        try:
+            llama.set_cache(self.make_cache(model))
+        except BaseException as e:
+            utils.error(e)
+
+    def make_cache(self, model: str) -> Any:
+        capacity = args.local_cache_size * 1024 * 1024
+
+        if args.local_cache == "disk":
+            # States are only valid for the model that produced them
+            # The path is hashed since different dirs can hold the same name
+            path = Path(model).resolve()
+            digest = hashlib.sha256(str(path).encode("utf-8")).hexdigest()[:16]
+            cache_dir = Path(paths.llama_cache, f"{path.stem}-{digest}")
+
+            return llama_cpp.LlamaDiskCache(
+                cache_dir=str(cache_dir), capacity_bytes=capacity
+            )
+
+        return llama_cpp.LlamaRAMCache(capacity_bytes=capacity)
+
+    def release_stream(self, stream: Stream) -> None:
+        stream.loading = False
+
+        if stream.locked:
+            stream.locked = False
+            self.release_lock()
+
+    def new_answer(self, tab_id: str, text: str = "", live: bool = False) -> None:
+        # Stream threads queue their changes to the tab on the pump
+        # so they reach Tk on the main loop and in order with the tokens
+        def action() -> None:
+            from .liveformat import liveformat
+
+            display.remove_last_ai(tab_id)
+            display.prompt("ai", text=text, tab_id=tab_id)
+
+            if live:
+                liveformat.start(tab_id)
+
+        pump.call(action, tab_id)
 
-        return text
+    def show_text(self, text: str, tab_id: str) -> None:
+        pump.call(lambda: display.print(text, tab_id=tab_id), tab_id)
 
-    def calculate_tokens_per_second(self, text: str, duration: float) -> float | None:
+    def read_file(self, path: str) -> str:
+        max_tokens = self.get_token_limit()
+
+        return filereader.read(
+            path,
+            name=self.loaded_model,
+            max_tokens=max_tokens,
+            count=lambda text: self.count_tokens(text) or 0,
+            limit=self.limit_tokens,
+        )
+
+    def calculate_tokens_per_second(
+        self, text: str, duration: float, tokens: int | None = None
+    ) -> float | None:
         if (not text) or (duration <= 0):
             return None
 
-        tokens = self.count_tokens(text)
+        if not tokens:
+            tokens = self.count_tokens(text)
 
         if not tokens:
             return None
@@ -1464,41 +1653,47 @@ class Model:
             return None
 
     def count_tokens(self, text: str) -> int | None:
-        if not text:
-            return None
+        # The window of a local model is counted with its own tokenizer
+        if self.model:
+            return tokenizer.count_llama(text, self.model)
+
+        return tokenizer.count(text, self.loaded_model)
 
+    def count_chunk_tokens(self, text: str) -> int:
+        # llama.cpp streams one token per chunk
         if self.model:
-            try:
-                token_ids = self.model.tokenize(text.encode("utf-8"))  # type: ignore[attr-defined]
+            return 1
 
-                return len(token_ids)
-            except BaseException:
-                pass
+        return tokenizer.count(text, self.loaded_model) or 0
 
-        try:
-            model_name = self.loaded_model if self.loaded_model else "gpt-3.5-turbo"
-            encoder = tiktoken.encoding_for_model(model_name)
-            return len(encoder.encode(text))
-        except BaseException:
-            pass
+    def get_usage_tokens(self, response: Any) -> int | None:
+        usage = getattr(response, "usage", None)
+        tokens = getattr(usage, "completion_tokens", None)
 
-        try:
-            return len(text.split())
-        except BaseException:
-            return None
+        if isinstance(tokens, int) and (tokens > 0):
+            return tokens
 
-    def limit_tokens(self, text: str) -> str:
+        return None
+
+    def get_token_limit(self) -> int:
         if not args.limit_tokens:
-            return text
+            return 0
 
         if not self.model:
-            return text
+            return 0
 
         if config.max_tokens <= 0:
+            return 0
+
+        return max(1, int(config.max_tokens * config.token_limit))
+
+    def limit_tokens(self, text: str) -> str:
+        max_tokens = self.get_token_limit()
+
+        if not max_tokens:
             return text
 
         try:
-            max_tokens = int(config.max_tokens * config.token_limit)
             encoded = text.encode("utf-8")
             tokens = self.model.tokenize(encoded)  # type: ignore[attr-defined]
             bytes = self.model.detokenize(tokens[:max_tokens])  # type: ignore[attr-defined]
@@ -1547,12 +1742,15 @@ class Model:
         utils.sleep(10)
 
         while True:
-            if self.loaded_model and self.stream_date:
-                seconds = utils.now() - self.stream_date
+            date = self.last_used()
+
+            if self.loaded_model and date:
+                seconds = utils.now() - date
                 minutes = seconds / 60
 
                 if minutes >= args.auto_unload:
                     self.unload()
+                    modelpool.clear()
 
             utils.sleep(10)
 
@@ -1560,6 +1758,96 @@ class Model:
         msg = "Error: llama.cpp support is not enabled. A library must be installed to use local models. Check the documentation."
         display.print(msg)
 
+    def get_history(
+        self, items: list[Item], budget: int | None, tab_id: str
+    ) -> list[dict[str, Any]]:
+        # Filled from newest to oldest until the token budget runs out
+        chunks = []
+
+        for item in reversed(items):
+            prepared = self.prepare_history_item(item)
+
+            if not prepared:
+                continue
+
+            if budget is not None:
+                tokens = self.get_item_tokens(item, prepared)
+
+                if tokens > budget:
+                    if not chunks:
+                        self.no_history(tab_id)
+
+                    break
+
+                budget -= tokens
+
+            chunks.append(prepared)
+
+        return [message for chunk in reversed(chunks) for message in chunk]
+
+    def no_history(self, tab_id: str) -> None:
+        if (not args.model_feedback) or args.quiet:
+            return
+
+        text = "History: No room left in the context, sending the prompt alone"
+        pump.call(lambda: display.print(text, tab_id=tab_id), tab_id)
+
+    def get_token_budget(self, messages: list[dict[str, Any]]) -> int | None:
+        # The context only maps to the real window on local models
+        if (not args.token_budget) or (not self.model):
+            return None
+
+        used = sum(self.count_message_tokens(message) for message in messages)
+        return config.context - config.max_tokens - used
+
+    def count_message_tokens(self, message: dict[str, Any]) -> int:
+        content = message.get("content", "")
+
+        if isinstance(content, list):
+            text = " ".join(c.get("text", "") for c in content)
+        else:
+            text = str(content)
+
+        return (self.count_tokens(text) or 0) + self.message_tokens
+
+    def get_item_tokens(self, item: Item, messages: list[dict[str, Any]]) -> int:
+        prepared_key = item.prepared[0] if item.prepared else None
+        key = (prepared_key, self.loaded_model)
+
+        if item.tokens and (item.tokens[0] == key):
+            return item.tokens[1]
+
+        tokens = sum(self.count_message_tokens(message) for message in messages)
+
+        # Expanded keywords can change between prompts
+        if "((" not in item.user:
+            item.tokens = (key, tokens)
+
+        return tokens
+
+    def prepare_history_item(self, item: Item) -> list[dict[str, Any]]:
+        # Cached on the item, edits replace the strings so the key changes
+        # Keywords like the date are expanded on every prompt like before
+        key = (item.user, item.ai)
+
+        if (not item.prepared) or (item.prepared[0] != key):
+            messages = []
+
+            if item.user and item.ai:
+                if not (self.long_url(item.user) or self.long_url(item.ai)):
+                    messages.append({"role": "user", "content": item.user})
+                    messages.append({"role": "assistant", "content": item.ai})
+
+            item.prepared = (key, messages)
+
+        prepared = [dict(message) for message in item.prepared[1]]
+
+        for message in prepared:
+            if message["role"] == "user":
+                message["content"] = utils.replace_keywords(message["content"])
+
+        return prepared
+
     def long_url(self, text: str) -> bool:
         if " " in text:
             return False
@@ -1850,56 +2138,187 @@ class Model:
 
         return self.format_tool_descriptions(descriptions)
 
-    def handle_tool_calls(self, tool_calls_buffer: ToolCallsBuffer, tab_id: str) -> str:
+    def get_tool_executor(self) -> futures.ThreadPoolExecutor:
+        if not self.tool_executor:
+            workers = max(1, args.tool_workers)
+            self.tool_executor = futures.ThreadPoolExecutor(max_workers=workers)
+
+        return self.tool_executor
+
+    def tool_call_to_dict(self, tool_call: Any) -> dict[str, Any]:
+        function = getattr(tool_call, "function", None)
+        fn_args = getattr(function, "arguments", None)
+
+        if isinstance(fn_args, dict):
+            fn_args = json.dumps(fn_args)
+
+        return {
+            "id": getattr(tool_call, "id", ""),
+            "type": "function",
+            "function": {
+                "name": getattr(function, "name", ""),
+                "arguments": fn_args or "",
+            },
+        }
+
+    def run_tool_calls(
+        self, tool_calls_data: list[dict[str, Any]]
+    ) -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
+        tool_calls = []
+        pending = []
+
+        for tool_call_data in tool_calls_data:
+            fn_name = tool_call_data["function"]["name"]
+            fn_args_str = tool_call_data["function"]["arguments"]
+
+            if not fn_name:
+                continue
+
+            if not self.toolfuncs.get(fn_name):
+                continue
+
+            fn_args = self.decode_tool_arguments(fn_args_str)
+
+            # Calls with broken arguments are skipped
+            if fn_args is None:
+                continue
+
+            pending.append((tool_call_data["id"], fn_name, fn_args))
+
+            tool_calls.append(
+                {
+                    "id": tool_call_data["id"],
+                    "type": "function",
+                    "function": {"name": fn_name, "arguments": fn_args_str},
+                }
+            )
+
+        return tool_calls, self.run_tools(pending)
+
+    def decode_tool_arguments(self, text: str) -> Any:
+        if not text:
+            return {}
+
         try:
-            tool_calls = []
-            tool_messages = []
+            return json.loads(text)
+        except json.JSONDecodeError:
+            return None
 
-            for tool_call_data in tool_calls_buffer.values():
-                if not tool_call_data["function"]["name"]:
-                    continue
+    def run_tools(
+        self, calls: list[tuple[str, str, dict[str, Any]]]
+    ) -> list[dict[str, Any]]:
+        # Independent calls run at the same time, the results keep their order
+        if not calls:
+            return []
 
-                fn_name = tool_call_data["function"]["name"]
-                fn_args_str = tool_call_data["function"]["arguments"]
-                tool_call_id = tool_call_data["id"]
-                toolfunc = self.toolfuncs.get(fn_name)
+        jobs: list[tuple[futures.Future[Any], ToolRun]] = []
+        previous: futures.Future[Any] | None = None
 
-                if not toolfunc:
-                    continue
+        with self.tool_lock:
+            executor = self.get_tool_executor()
 
-                try:
-                    fn_args = json.loads(fn_args_str) if fn_args_str else {}
+            for _, fn_name, fn_args in calls:
+                toolfunc = self.toolfuncs[fn_name]
+                serial = fn_name in self.serial_tools
+                after = previous if serial else None
+                job, run = self.submit_tool(executor, after, toolfunc, fn_args)
 
-                    # toolfunc is guaranteed to be callable here due to the check above
-                    result = toolfunc(**fn_args)
+                if serial:
+                    previous = job
 
-                    tool_messages.append(
-                        {
-                            "tool_call_id": tool_call_id,
-                            "role": "tool",
-                            "name": fn_name,
-                            "content": str(result),
-                        }
-                    )
+                jobs.append((job, run))
 
-                    tool_calls.append(
-                        {
-                            "id": tool_call_id,
-                            "type": "function",
-                            "function": {"name": fn_name, "arguments": fn_args_str},
-                        }
-                    )
-                except json.JSONDecodeError:
-                    continue
-                except Exception as e:
-                    tool_messages.append(
-                        {
-                            "tool_call_id": tool_call_id,
-                            "role": "tool",
-                            "name": fn_name,
-                            "content": f"Error executing function: {e}",
-                        }
-                    )
+        tool_messages = []
+        stuck = False
+
+        for (tool_call_id, fn_name, _), (job, run) in zip(calls, jobs):
+            content, timed_out = self.get_tool_result(job, run)
+            stuck = stuck or timed_out
+
+            tool_messages.append(
+                {
+                    "tool_call_id": tool_call_id,
+                    "role": "tool",
+                    "name": fn_name,
+                    "content": content,
+                }
+            )
+
+        if stuck:
+            self.reset_tool_executor(executor)
+
+        return tool_messages
+
+    def submit_tool(
+        self,
+        executor: futures.ThreadPoolExecutor,
+        previous: futures.Future[Any] | None,
+        toolfunc: Callable[..., Any],
+        fn_args: dict[str, Any],
+    ) -> tuple[futures.Future[Any], ToolRun]:
+        run = ToolRun()
+        job = executor.submit(self.run_tool, run, previous, toolfunc, fn_args)
+        job.add_done_callback(lambda _: run.started.set())
+        return job, run
+
+    def run_tool(
+        self,
+        run: ToolRun,
+        previous: futures.Future[Any] | None,
+        toolfunc: Callable[..., Any],
+        fn_args: dict[str, Any],
+    ) -> Any:
+        if previous:
+            futures.wait([previous], timeout=args.tool_timeout)
+
+        run.start = time.monotonic()
+        run.started.set()
+        return toolfunc(**fn_args)
+
+    def get_tool_result(
+        self, job: futures.Future[Any], run: ToolRun
+    ) -> tuple[str, bool]:
+        # Each tool gets the full timeout from when it starts
+        # Waiting for a worker or an earlier serial tool has the same limit
+        timeout = 0.0
+
+        if run.started.wait(timeout=args.tool_timeout):
+            timeout = args.tool_timeout
+
+            if run.start:
+                timeout = max(0.0, timeout - (time.monotonic() - run.start))
+
+        try:
+            return str(job.result(timeout=timeout)), False
+        except futures.TimeoutError:
+            job.cancel()
+            return "Error executing function: The tool timed out", True
+        except Exception as e:
+            return f"Error executing function: {e}", False
+
+    def reset_tool_executor(self, executor: futures.ThreadPoolExecutor) -> None:
+        # A timed out tool can't be stopped and may hold its worker forever
+        # So that pool is left to finish on its own and later calls get a new one
+        with self.tool_lock:
+            if self.tool_executor is executor:
+                self.tool_executor = None
+
+        executor.shutdown(wait=False)
+
+    def tool_completion(self, gen_config: dict[str, Any], stream: Stream) -> Any:
+        # Follow-ups get the same retries and breaker as the first request
+        def call(config: dict[str, Any]) -> Any:
+            return completion(**config, timeout=self.tools_timeout)
+
+        return retries.run(call, [gen_config], stream)[0]
+
+    def handle_tool_calls(
+        self, tool_calls_buffer: ToolCallsBuffer, tab_id: str, stream: Stream
+    ) -> str:
+        try:
+            tool_calls, tool_messages = self.run_tool_calls(
+                list(tool_calls_buffer.values())
+            )
 
             if not tool_messages:
                 return ""
@@ -1961,34 +2380,48 @@ class Model:
                 }
             )
 
-            gen_config = self.get_gen_config(messages)
-            gen_config["stream"] = False
+            depth = 1
 
-            if self.is_remote_model():
-                response = completion(**gen_config, timeout=self.tools_timeout)
-            elif self.model:
-                local_gen_config = gen_config.copy()
-                del local_gen_config["model"]
+            while True:
+                gen_config = self.get_gen_config(messages)
+                gen_config["stream"] = False
 
-                response = self.model.create_chat_completion_openai_v1(  # type: ignore[attr-defined]
-                    **local_gen_config
-                )
-            else:
-                return "\n\nError: No model available"
+                if self.is_remote_model():
+                    response = self.tool_completion(gen_config, stream)
+                elif self.model:
+                    local_gen_config = gen_config.copy()
+                    del local_gen_config["model"]
 
-            choices = getattr(response, "choices", None)
+                    response = self.model.create_chat_completion_openai_v1(  # type: ignore[attr-defined]
+                        **local_gen_config
+                    )
+                else:
+                    return "\n\nError: No model available"
 
-            if not choices or not choices[0]:
-                return "\n\nError: No choices in response"
+                choices = getattr(response, "choices", None)
 
-            message = choices[0].message
-            content = message.content
+                if not choices or not choices[0]:
+                    return "\n\nError: No choices in response"
 
-            # Check if the model is trying to chain another tool call
-            if hasattr(message, "tool_calls") and message.tool_calls:
-                # Recursive / chained tool calls logic could go here
-                # For now, we return a message indicating the tool ran, to prevent the error
-                return f"\n\n(Tool execution successful. The model attempted to run subsequent tools, which is not yet supported in this block. Tool attempted: {message.tool_calls[0].function.name})"
+                message = choices[0].message
+                content = message.content
+
+                # The model may chain more tool calls based on the results
+                if not (hasattr(message, "tool_calls") and message.tool_calls):
+                    break
+
+                if depth >= args.tool_depth:
+                    return f"\n\n(Tool execution successful. The model attempted to run more tools than the depth limit allows. Tool attempted: {message.tool_calls[0].function.name})"
+
+                chained = [self.tool_call_to_dict(tc) for tc in message.tool_calls]
+                tool_calls, tool_messages = self.run_tool_calls(chained)
+
+                if not tool_messages:
+                    break
+
+                messages.append({"role": "assistant", "tool_calls": tool_calls})
+                messages.extend(tool_messages)
+                depth += 1
 
             if choices and content:
                 return f"\n\n{content}"
@@ -2006,7 +2439,9 @@ class Model:
             or self.model_is_claude(self.get_model())
         )
 
-    def get_gen_config(self, messages: list[dict[str, Any]]) -> dict[str, Any]:
+    def get_gen_config(
+        self, messages: list[dict[str, Any]], name: str = ""
+    ) -> dict[str, Any]:
         gen_config = {
             "messages": messages,
             "stream": config.stream == "yes",
@@ -2016,7 +2451,7 @@ class Model:
             "stop": self.get_stop_list(),
         }
 
-        model = self.get_model()
+        model = name or self.get_model()
 
         if self.model_is_gpt(model):
             del gen_config["stop"]
@@ -2026,7 +2461,9 @@ class Model:
             gen_config["tools"] = list(self.tools)
             gen_config["tool_choice"] = "auto"
 
-        if self.is_remote_model():
+        if name:
+            gen_config["model"] = f"{self.get_provider(name)}/{name}"
+        elif self.is_remote_model():
             gen_config["model"] = f"{self.loaded_provider}/{model}"
         else:
             gen_config["model"] = model
@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+# Standard
+import threading
+from pathlib import Path
+from typing import Any
+from dataclasses import dataclass
+from collections import OrderedDict
+from collections.abc import Callable
+
+# Modules
+from .args import args
+from .config import config
+from .files import files
+from .utils import utils
+
+
+Key = tuple[Any, ...]
+
+
+@dataclass
+class PoolItem:
+    name: str
+    model: Any
+    size: int
+
+
+class ModelPool:
+    def __init__(self) -> None:
+        self.lock = threading.RLock()
+        self.items: OrderedDict[Key, PoolItem] = OrderedDict()
+        self.current: Key | None = None
+        self.preload_thread = threading.Thread()
+        self.preload_name = ""
+
+    def enabled(self) -> bool:
+        return args.model_pool > 1
+
+    def get_key(self, name: str, llama_args: dict[str, Any]) -> Key:
+        # A resident model is only reused if it was loaded with the same settings
+        values = tuple(sorted((k, repr(v)) for k, v in llama_args.items()))
+        return (name, config.mode, values)
+
+    def get_size(self, name: str) -> int:
+        # The weights dominate, so the file size is a good estimate
+        try:
+            return Path(name).stat().st_size
+        except BaseException:
+            return 0
+
+    def get(self, key: Key) -> Any:
+        if not self.enabled():
+            return None
+
+        self.wait(key[0])
+
+        with self.lock:
+            item = self.items.get(key)
+
+            if not item:
+                return None
+
+            self.items.move_to_end(key)
+            self.current = key
+            return item.model
+
+    def add(self, key: Key, model: Any, current: bool = True) -> None:
+        if not self.enabled():
+            return
+
+        with self.lock:
+            self.items[key] = PoolItem(key[0], model, self.get_size(key[0]))
+            self.items.move_to_end(key)
+
+            if current:
+                self.current = key
+
+            self.evict()
+
+    def evict(self) -> None:
+        budget = args.model_pool_ram * 1024 * 1024
+
+        def over() -> bool:
+            if len(self.items) > args.model_pool:
+                return True
+
+            if budget <= 0:
+                return False
+
+            return sum(item.size for item in self.items.values()) > budget
+
+        while over():
+            key = next((k for k in self.items if k != self.current), None)
+
+            if key is None:
+                break
+
+            self.close(self.items.pop(key))
+
+    def close(self, item: PoolItem) -> None:
+        close = getattr(item.model, "close", None)
+
+        if close:
+            try:
+                close()
+            except BaseException as e:
+                utils.error(e)
+
+    def clear(self) -> None:
+        with self.lock:
+            items = list(self.items.values())
+            self.items.clear()
+            self.current = None
+
+        for item in items:
+            self.close(item)
+
+    def has(self, key: Key) -> bool:
+        with self.lock:
+            return key in self.items
+
+    def wait(self, name: str) -> None:
+        # Don't load a model twice if it's already being preloaded
+        if self.preload_name != name:
+            return
+
+        if self.preload_thread.is_alive():
+            self.preload_thread.join()
+
+    def get_next(self, current: str) -> str:
+        for name in files.get_list("models"):
+            if name == current:
+                continue
+
+            path = Path(name)
+
+            if path.suffix.lower() != ".gguf":
+                continue
+
+            if path.is_file():
+                return name
+
+        return ""
+
+    def preload(
+        self,
+        current: str,
+        make_args: Callable[[str], dict[str, Any]],
+        create: Callable[[dict[str, Any]], Any],
+    ) -> None:
+        if not self.enabled():
+            return
+
+        if (not args.model_preload) or (config.mode == "image"):
+            return
+
+        if self.preload_thread.is_alive():
+            return
+
+        name = self.get_next(current)
+
+        if not name:
+            return
+
+        llama_args = make_args(name)
+        key = self.get_key(name, llama_args)
+
+        if self.has(key):
+            return
+
+        def run() -> None:
+            try:
+                model = create(llama_args)
+            except BaseException as e:
+                utils.error(e)
+                return
+
+            self.add(key, model, current=False)
+
+        self.preload_name = name
+        self.preload_thread = threading.Thread(target=lambda: run())
+        self.preload_thread.daemon = True
+        self.preload_thread.start()
+
+
+modelpool = ModelPool()
@@ -3,7 +3,7 @@ from __future__ import annotations
 # Standard
 import tkinter as tk
 from tkinter import ttk
-from typing import Any
+from typing import Any, TYPE_CHECKING
 
 # Modules
 from .app import app
@@ -17,6 +17,10 @@ from .itemops import itemops
 from .dialogs import Dialog
 
 
+if TYPE_CHECKING:
+    from .render import Part
+
+
 class Output(tk.Text):
     clicked_number = 0
     marker_user = "\u200b\u200b\u200b"
@@ -391,6 +395,7 @@ class Output(tk.Text):
         self.update_size_after = ""
         self.checked_markers_user: list[int] = []
         self.checked_markers_ai: list[int] = []
+        self.num_markers = {"user": 0, "ai": 0}
         self.last_scroll_args: tuple[str, str] | None = None
 
         self.word_tags = (
@@ -583,6 +588,7 @@ class Output(tk.Text):
         self.snippets = []
         self.checked_markers_user = []
         self.checked_markers_ai = []
+        self.num_markers = {"user": 0, "ai": 0}
 
     def to_top(self) -> None:
         self.auto_bottom = False
@@ -730,6 +736,9 @@ class Output(tk.Text):
 
         prompt = display.get_prompt(who)
         self.print(prompt)
+        self.num_markers[who] += 1
+        self.mark_set(f"prompt_{who}", "end - 1c")
+        self.mark_gravity(f"prompt_{who}", "left")
         start_index = self.index(f"end - {len(prompt) + 1}c")
         d = utils.delimiter()
         n = len(d) + 2
@@ -764,6 +773,35 @@ class Output(tk.Text):
         self.insert_text(text)
         self.to_bottom(True)
 
+    def insert_render(self, parts: list[Part], who: str) -> None:
+        from .snippet import Snippet
+        from .widgets import widgets
+
+        self.enable()
+
+        for part in parts:
+            if part.snippet:
+                line = int(self.index("end - 1c").split(".")[0])
+                snippet = Snippet(self, *part.snippet)
+                widgets.window(self, line, snippet)
+                self.snippets.append(snippet)
+                continue
+
+            chunks: list[Any] = []
+
+            for text, tags in part.segments:
+                if text:
+                    chunks.extend([text, tags])
+
+            if chunks:
+                self.insert(tk.END, *chunks)
+
+        self.disable()
+
+        # The markdown pass can skip what is already formatted
+        getattr(self, f"checked_markers_{who}").append(self.num_markers[who])
+        self.to_bottom(True)
+
     def get_tagwords(self, tag: str, event: Any) -> str:
         current_index = event.widget.index(tk.CURRENT)
         char = event.widget.get(current_index)
@@ -1358,6 +1396,7 @@ class Output(tk.Text):
         for i, line in enumerate(lines):
             if line.startswith(Output.marker_ai):
                 self.delete_line(len(lines) - i)
+                self.num_markers["ai"] -= 1
                 break
 
     def filter_text(self, text: str) -> None:
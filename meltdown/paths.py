@@ -18,6 +18,7 @@ class Paths:
         self.systems: Path
         self.files: Path
         self.session: Path
+        self.session_other: Path
         self.commands: Path
         self.autocomplete: Path
         self.memory: Path
@@ -30,6 +31,10 @@ class Paths:
         self.errors: Path
         self.nouns: Path
         self.memories: Path
+        self.metrics: Path
+        self.llama_cache: Path
+        self.loads: Path
+        self.responses: Path
 
     def error(self, what: str) -> None:
         utils.msg(f"Error: Can't find or create the '{what}' directory.")
@@ -71,13 +76,26 @@ class Paths:
         self.sessions = Path(self.data_dir, "sessions")
         self.inputs = Path(self.data_dir, "inputs.json")
         self.files = Path(self.data_dir, "files.json")
-        self.session = Path(self.data_dir, "session.json")
+        session_json = Path(self.data_dir, "session.json")
+        session_records = Path(self.data_dir, "session.mlt")
+
+        if args.session_format == "json":
+            self.session = session_json
+            self.session_other = session_records
+        else:
+            self.session = session_records
+            self.session_other = session_json
+
         self.autocomplete = Path(self.data_dir, "autocomplete.json")
         self.commands = Path(self.data_dir, "commands.json")
         self.models = Path(self.data_dir, "models.json")
         self.systems = Path(self.data_dir, "systems.json")
         self.memory = Path(self.data_dir, "memory.json")
         self.memories = Path(self.data_dir, "memories")
+        self.metrics = Path(self.data_dir, "metrics.jsonl")
+        self.llama_cache = Path(self.data_dir, "llama_cache")
+        self.loads = Path(self.data_dir, "loads.jsonl")
+        self.responses = Path(self.data_dir, "responses")
 
         if args.logs_dir:
             self.logs = Path(args.logs_dir)
@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+# Standard
+import time
+import queue
+import threading
+from collections.abc import Callable
+
+# Modules
+from .app import app
+from .display import display
+from .utils import utils
+
+
+Action = Callable[[], None]
+Chunk = tuple[str, str | Action, bool, threading.Event | None]
+
+
+class Pump:
+    def __init__(self) -> None:
+        self.queue: queue.SimpleQueue[Chunk] = queue.SimpleQueue()
+        self.cond = threading.Condition()
+        self.pending: dict[str, int] = {}
+        self.started = False
+        self.frame = 16
+        self.budget = 0.008
+        self.batch = 32
+        self.min_batch = 4
+        self.max_batch = 1024
+        self.cost = 0.0
+        self.wait_timeout = 5
+
+    def start(self) -> None:
+        self.started = True
+        app.root.after(self.frame, self.drain)
+
+    def push(
+        self,
+        text: str,
+        tab_id: str,
+        to_bottom: bool = True,
+        stop_event: threading.Event | None = None,
+    ) -> None:
+        if not self.started:
+            display.insert(text, tab_id=tab_id, to_bottom=to_bottom)
+            return
+
+        with self.cond:
+            self.pending[tab_id] = self.pending.get(tab_id, 0) + 1
+
+        self.queue.put((tab_id, text, to_bottom, stop_event))
+
+    def call(self, action: Action, tab_id: str = "") -> None:
+        # Runs on the main loop after the chunks queued before it
+        if not self.started:
+            self.run(action)
+            return
+
+        with self.cond:
+            self.pending[tab_id] = self.pending.get(tab_id, 0) + 1
+
+        self.queue.put((tab_id, action, False, None))
+
+    def drain(self) -> None:
+        try:
+            self.process()
+        except BaseException as e:
+            utils.error(e)
+
+        app.root.after(self.frame, self.drain)
+
+    def process(self) -> None:
+        chunks: list[Chunk] = []
+
+        # Single consumer so empty() can't race with get_nowait()
+        while (len(chunks) < self.batch) and (not self.queue.empty()):
+            chunks.append(self.queue.get_nowait())
+
+        if not chunks:
+            return
+
+        start = time.perf_counter()
+
+        try:
+            self.insert(chunks)
+        finally:
+            self.adapt(time.perf_counter() - start, len(chunks))
+            self.done(chunks)
+
+    def insert(self, chunks: list[Chunk]) -> None:
+        # Join consecutive chunks of the same tab into a single insert
+        # Actions run in between, in the order they were queued
+        groups: list[tuple[str, list[str], bool]] = []
+
+        for tab_id, text, to_bottom, stop_event in chunks:
+            if callable(text):
+                self.flush(groups)
+                self.run(text)
+                continue
+
+            if stop_event and stop_event.is_set():
+                continue
+
+            if groups and (groups[-1][0] == tab_id):
+                groups[-1][1].append(text)
+                groups[-1] = (tab_id, groups[-1][1], to_bottom)
+            else:
+                groups.append((tab_id, [text], to_bottom))
+
+        self.flush(groups)
+
+    def flush(self, groups: list[tuple[str, list[str], bool]]) -> None:
+        for tab_id, texts, to_bottom in groups:
+            display.insert("".join(texts), tab_id=tab_id, to_bottom=to_bottom)
+
+        groups.clear()
+
+    def run(self, action: Action) -> None:
+        try:
+            action()
+        except BaseException as e:
+            utils.error(e)
+
+    def adapt(self, cost: float, num: int) -> None:
+        # Fit the batch to the render cost so each frame stays within budget
+        per_chunk = cost / num
+
+        if self.cost:
+            self.cost = (self.cost * 0.8) + (per_chunk * 0.2)
+        else:
+            self.cost = per_chunk
+
+        if self.cost <= 0:
+            return
+
+        batch = int(self.budget / self.cost)
+        self.batch = max(self.min_batch, min(self.max_batch, batch))
+
+    def done(self, chunks: list[Chunk]) -> None:
+        with self.cond:
+            for tab_id, _, _, _ in chunks:
+                num = self.pending.get(tab_id, 0) - 1
+
+                if num > 0:
+                    self.pending[tab_id] = num
+                else:
+                    self.pending.pop(tab_id, None)
+
+            self.cond.notify_all()
+
+    def wait(self, tab_id: str, stop_event: threading.Event | None = None) -> None:
+        # Called from the stream thread before it touches the tab again
+        deadline = time.monotonic() + self.wait_timeout
+
+        with self.cond:
+            while self.pending.get(tab_id):
+                if stop_event and stop_event.is_set():
+                    return
+
+                if time.monotonic() >= deadline:
+                    return
+
+                self.cond.wait(timeout=0.05)
+
+
+pump = Pump()
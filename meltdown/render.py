@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+# Standard
+from typing import Any
+from dataclasses import dataclass, field
+from collections import OrderedDict
+
+# Modules
+from .args import args
+from .config import config
+from .markdown import Markdown
+from .spans import spans
+
+
+Segment = tuple[str, tuple[str, ...]]
+
+
+@dataclass
+class Part:
+    segments: list[Segment] = field(default_factory=list)
+    snippet: tuple[str, str] | None = None
+
+
+class Render:
+    # Builds the formatted body of an item straight from its text
+    # so printing a conversation doesn't have to re-parse the widget
+    def __init__(self) -> None:
+        self.gap = "\n\n"
+        self.cache: OrderedDict[tuple[Any, ...], list[Part]] = OrderedDict()
+        self.cache_size = 200
+
+    def active(self, who: str) -> bool:
+        if args.markdown == "none":
+            return False
+
+        if args.markdown == "both":
+            return True
+
+        return args.markdown == who
+
+    def get_key(self, who: str, text: str, file: str) -> tuple[Any, ...]:
+        settings = [
+            (name, value)
+            for name, value in vars(args).items()
+            if name.startswith(("markdown", "role_"))
+        ]
+
+        return (
+            who,
+            text,
+            file,
+            tuple(settings),
+            args.join_lines_char,
+            args.ordered_char,
+            args.unordered_char,
+            args.ordered_spacing,
+            args.unordered_spacing,
+            config.font_family,
+            config.think_token_start,
+            config.think_token_end,
+            config.role_user_token,
+            config.role_assistant_token,
+            config.role_system_token,
+        )
+
+    def get(self, who: str, text: str, file: str = "") -> list[Part]:
+        # The key holds the text and the settings, so it doesn't need the item
+        # Only the most recently printed bodies are kept
+        key = self.get_key(who, text, file)
+        parts = self.cache.get(key)
+
+        if parts is not None:
+            self.cache.move_to_end(key)
+            return parts
+
+        parts = self.render(who, text, file)
+        self.cache[key] = parts
+
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+        return parts
+
+    def render(self, who: str, text: str, file: str = "") -> list[Part]:
+        text = self.transform(who, text)
+        rules = Markdown.get_rules(who)
+        parts: list[Part] = []
+        segments: list[Segment] = []
+
+        # Laid out like the widget pass does, a snippet is a line of its own
+        for i, line in enumerate(Markdown.get_layout(who, text)):
+            if i > 0:
+                segments.append(("\n", ()))
+
+            if isinstance(line, tuple):
+                parts.append(Part(segments))
+                parts.append(Part(snippet=line))
+                segments = []
+                continue
+
+            segments.extend(self.format_line(line, rules))
+
+        parts.append(Part(segments))
+
+        if file:
+            file_text = f"File:\u00a0{file}"
+            parts.append(Part([(self.gap, ()), *spans.segments(file_text, rules)]))
+
+        return parts
+
+    def transform(self, who: str, text: str) -> str:
+        # The same line cleanups the widget formatter does, in the same order
+        lines = text.split("\n")
+        lines[0] = lines[0].lstrip()
+
+        for what, get_text in Markdown.get_text_steps():
+            if Markdown.enabled(who, what):
+                new_text = get_text(lines)
+
+                if new_text is not None:
+                    lines = new_text.split("\n")
+
+        return "\n".join(lines).strip()
+
+    def format_line(self, line: str, rules: list[Any]) -> list[Segment]:
+        items = spans.segments(line, rules)
+        indent = Markdown.get_indent("".join(text for text, _ in items))
+
+        if indent:
+            items = self.indent(items, *indent)
+
+        return items
+
+    def indent(self, items: list[Segment], name: str, space: int) -> list[Segment]:
+        # Same tags that Markdown.indent_lines adds to list items
+        result: list[Segment] = []
+        col = 0
+
+        for text, tags in items:
+            cut = min(max(space - col, 0), len(text))
+
+            if cut:
+                result.append((text[:cut], (*tags, name, "list")))
+
+            if cut < len(text):
+                result.append((text[cut:], (*tags, name)))
+
+            col += len(text)
+
+        return result
+
+
+render = Render()
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+# Standard
+import json
+import hashlib
+import threading
+from typing import Any
+from pathlib import Path
+
+# Modules
+from .args import args
+from .config import config
+from .paths import paths
+from .utils import utils
+from .writer import writer
+
+
+class ResponseCache:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def cacheable(self, gen_config: dict[str, Any]) -> bool:
+        if not args.response_cache:
+            return False
+
+        # Only deterministic requests give the same answer twice
+        if (config.temperature != 0) or (config.seed < 0):
+            return False
+
+        # Tool results depend on live data and tools have side effects
+        return not gen_config.get("tools")
+
+    def get_key(self, gen_config: dict[str, Any]) -> str:
+        data = {k: v for k, v in gen_config.items() if k not in ["stream", "api_key"]}
+        text = json.dumps(data, sort_keys=True, default=str)
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get_path(self, key: str) -> Path:
+        return Path(paths.responses, f"{key}.json")
+
+    def get(self, gen_config: dict[str, Any]) -> str | None:
+        if not self.cacheable(gen_config):
+            return None
+
+        text = self.read(self.get_path(self.get_key(gen_config)))
+
+        with self.lock:
+            if text is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        return text
+
+    def read(self, path: Path) -> str | None:
+        if not path.exists():
+            return None
+
+        try:
+            age = utils.now() - path.stat().st_mtime
+
+            if age > (args.response_cache_ttl * 60):
+                path.unlink(missing_ok=True)
+                return None
+
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except BaseException as e:
+            utils.error(e)
+            return None
+
+        return data.get("text") or None
+
+    def add(self, gen_config: dict[str, Any], text: str) -> None:
+        if not text:
+            return
+
+        if not self.cacheable(gen_config):
+            return
+
+        data = {
+            "date": utils.now(),
+            "model": gen_config.get("model", ""),
+            "text": text,
+        }
+
+        try:
+            path = self.get_path(self.get_key(gen_config))
+            writer.write_atomic(path, json.dumps(data))
+            self.prune()
+        except BaseException as e:
+            utils.error(e)
+
+    def get_files(self) -> list[Path]:
+        if not paths.responses.exists():
+            return []
+
+        return list(paths.responses.glob("*.json"))
+
+    def prune(self) -> None:
+        files = self.get_files()
+        excess = len(files) - max(0, args.response_cache_size)
+
+        if excess <= 0:
+            return
+
+        files.sort(key=lambda p: p.stat().st_mtime)
+
+        for path in files[:excess]:
+            path.unlink(missing_ok=True)
+
+    def clear(self) -> None:
+        for path in self.get_files():
+            path.unlink(missing_ok=True)
+
+        with self.lock:
+            self.hits = 0
+            self.misses = 0
+
+    def show(self) -> None:
+        from .dialogs import Dialog
+
+        with self.lock:
+            hits = self.hits
+            misses = self.misses
+
+        total = hits + misses
+        rate = round((hits / total) * 100, 1) if total else 0.0
+        state = "Enabled" if args.response_cache else "Disabled"
+
+        lines = [f"Response Cache: {state}"]
+        lines.append(f"Hits: {hits}")
+        lines.append(f"Misses: {misses}")
+        lines.append(f"Hit Rate: {rate}%")
+        lines.append(f"Entries: {len(self.get_files())}")
+
+        Dialog.show_message("\n".join(lines))
+
+
+responsecache = ResponseCache()
@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+# Standard
+import time
+import random
+import threading
+from typing import Any
+from collections.abc import Callable
+from email.utils import parsedate_to_datetime
+
+# Libraries
+from litellm.exceptions import Timeout
+from litellm.exceptions import InternalServerError
+from litellm.exceptions import RateLimitError
+from litellm.exceptions import APIConnectionError
+from litellm.exceptions import ServiceUnavailableError
+
+# Modules
+from .args import args
+from .utils import utils
+from .streams import Stream
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, provider: str, seconds: float) -> None:
+        self.provider = provider
+        self.seconds = seconds
+        self.message = f"Requests to {provider} are paused for {int(seconds)}s"
+
+    def __str__(self) -> str:
+        return self.message
+
+
+class Breaker:
+    def __init__(self) -> None:
+        self.failures = 0
+        self.opened = 0.0
+        self.probing = False
+
+
+class Retries:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.breakers: dict[str, Breaker] = {}
+        self.base_delay = 1.0
+        self.max_delay = 30.0
+
+        self.retryable = (
+            RateLimitError,
+            InternalServerError,
+            Timeout,
+            APIConnectionError,
+            ServiceUnavailableError,
+        )
+
+    def get_provider(self, gen_config: dict[str, Any]) -> str:
+        return str(gen_config.get("model", "")).split("/")[0]
+
+    def get_breaker(self, provider: str) -> Breaker:
+        if provider not in self.breakers:
+            self.breakers[provider] = Breaker()
+
+        return self.breakers[provider]
+
+    def is_open(self, provider: str) -> bool:
+        with self.lock:
+            breaker = self.get_breaker(provider)
+            return breaker.failures >= max(1, args.breaker_threshold)
+
+    def get_wait(self, provider: str) -> tuple[float, bool]:
+        # Seconds until an open breaker lets a trial request through
+        # Only one request is let through as the probe, the rest keep waiting
+        with self.lock:
+            breaker = self.get_breaker(provider)
+
+            if breaker.failures < max(1, args.breaker_threshold):
+                return 0.0, False
+
+            elapsed = time.monotonic() - breaker.opened
+            wait = max(0.0, args.breaker_cooldown - elapsed)
+
+            if wait:
+                return wait, False
+
+            if breaker.probing:
+                return float(max(1, args.breaker_cooldown)), False
+
+            breaker.probing = True
+            return 0.0, True
+
+    def end_probe(self, provider: str) -> None:
+        # A probe that ended without a verdict lets the next request try
+        with self.lock:
+            self.get_breaker(provider).probing = False
+
+    def success(self, provider: str) -> None:
+        with self.lock:
+            breaker = self.get_breaker(provider)
+            breaker.failures = 0
+            breaker.opened = 0.0
+            breaker.probing = False
+
+    def failure(self, provider: str) -> None:
+        with self.lock:
+            breaker = self.get_breaker(provider)
+            breaker.failures += 1
+            breaker.probing = False
+
+            if breaker.failures >= max(1, args.breaker_threshold):
+                breaker.opened = time.monotonic()
+
+    def get_retry_after(self, error: BaseException) -> float | None:
+        response = getattr(error, "response", None)
+        headers = getattr(response, "headers", None)
+
+        if not headers:
+            return None
+
+        value = headers.get("retry-after")
+
+        if not value:
+            return None
+
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+
+        try:
+            date = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+
+        return max(0.0, date.timestamp() - utils.now())
+
+    def get_delay(self, attempt: int, error: BaseException) -> float:
+        retry_after = self.get_retry_after(error)
+
+        if retry_after is not None:
+            return min(self.max_delay, retry_after)
+
+        # Exponential backoff with full jitter
+        delay = min(self.max_delay, self.base_delay * (2**attempt))
+        return random.uniform(0, delay)
+
+    def try_call(
+        self, call: Callable[[dict[str, Any]], Any], gen_config: dict[str, Any]
+    ) -> tuple[Any, BaseException | None]:
+        try:
+            return call(gen_config), None
+        except Exception as e:
+            return None, e
+
+    def attempt(
+        self,
+        call: Callable[[dict[str, Any]], Any],
+        gen_config: dict[str, Any],
+        stream: Stream,
+    ) -> tuple[Any, BaseException | None]:
+        provider = self.get_provider(gen_config)
+        metrics = stream.metrics
+        error: BaseException | None = None
+
+        for num in range(max(0, args.max_retries) + 1):
+            start = time.perf_counter()
+            output, error = self.try_call(call, gen_config)
+            metrics.attempts.append(time.perf_counter() - start)
+
+            if error is None:
+                self.success(provider)
+                return output, None
+
+            if not isinstance(error, self.retryable):
+                return None, error
+
+            utils.error(error)
+            self.failure(provider)
+
+            if (num >= args.max_retries) or self.is_open(provider):
+                break
+
+            metrics.retries += 1
+
+            if stream.stop_event.wait(self.get_delay(num, error)):
+                break
+
+        return None, error
+
+    def run(
+        self,
+        call: Callable[[dict[str, Any]], Any],
+        configs: list[dict[str, Any]],
+        stream: Stream,
+    ) -> tuple[Any, dict[str, Any] | None]:
+        # The first config is the main model, the rest are fallbacks
+        # Returns the output and the config that produced it
+        error: BaseException | None = None
+
+        for gen_config in configs:
+            provider = self.get_provider(gen_config)
+            wait, probe = self.get_wait(provider)
+
+            if wait:
+                error = error or CircuitOpenError(provider, wait)
+                continue
+
+            try:
+                output, error = self.attempt(call, gen_config, stream)
+            finally:
+                if probe:
+                    self.end_probe(provider)
+
+            if error is None:
+                if gen_config is not configs[0]:
+                    stream.metrics.fallback = gen_config["model"]
+
+                return output, gen_config
+
+            if stream.stop_event.is_set():
+                return None, None
+
+        if error:
+            raise error
+
+        return None, None
+
+
+retries = Retries()
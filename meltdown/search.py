@@ -1,27 +1,165 @@
 from __future__ import annotations
 
 # Standard
+import time
+import threading
+import importlib.util
+from typing import Any
+from concurrent import futures
+from collections import OrderedDict
+from collections.abc import Callable
+
+# Libraries
 import requests  # type: ignore
+from requests.adapters import HTTPAdapter  # type: ignore
 from bs4 import BeautifulSoup
 
+# Modules
+from .args import args
+
 
 class Search:
+    def __init__(self) -> None:
+        self.timeout = 10
+        self.race_timeout = 15
+        self.cache_size = 100
+        self.cache_ttl = 600
+        self.lock = threading.Lock()
+        self.cache: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self.executor = futures.ThreadPoolExecutor(max_workers=8)
+        self.no_details = "Search completed for"
+        self.local = threading.local()
+
+        if importlib.util.find_spec("lxml"):
+            self.parser = "lxml"
+        else:
+            self.parser = "html.parser"
+
+    def get_session(self) -> requests.Session:
+        # Sessions aren't thread safe so each thread keeps its own
+        # Its connections stay alive across the searches of that thread
+        session = getattr(self.local, "session", None)
+
+        if not session:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=4)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            self.local.session = session
+
+        return session
+
+    def get(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.get_session().get(url, timeout=self.timeout, **kwargs)
+
+    def parse(self, html: str) -> BeautifulSoup:
+        return BeautifulSoup(html, self.parser)
+
     def web_search(self, query: str) -> str:
-        try:
-            # First try DuckDuckGo instant answer API (no rate limiting)
-            ddg_result = self.duckduckgo_search(query)
+        key = " ".join(query.lower().split())
+        cached = self.get_cached(key)
 
-            if ddg_result and "Error" not in ddg_result:
-                return ddg_result
-        except:
-            pass
+        if cached:
+            return cached
 
         try:
-            return self.google_scrape_search(query)
+            if args.search_race:
+                result = self.race(query)
+            else:
+                result = self.search(query)
         except Exception as e:
             return f"Error performing web search: {e}"
 
+        if self.is_good(result):
+            self.add_cached(key, result)
+
+        return result
+
+    def search(self, query: str) -> str:
+        # The providers are tried one after the other
+        result = self.duckduckgo_search(query)
+
+        if self.is_good(result):
+            return result
+
+        result = self.google_scrape_search(query)
+
+        if result:
+            return result
+
+        return f"Error performing web search: No results for '{query}'"
+
+    def race(self, query: str) -> str:
+        # Every provider runs at the same time and the first good answer wins
+        providers: list[Callable[[str], str]] = [
+            self.duckduckgo_instant,
+            self.ddg_search,
+            self.wikipedia_search,
+            self.google_search,
+        ]
+
+        jobs = [self.executor.submit(provider, query) for provider in providers]
+        fallback = ""
+
+        try:
+            for job in futures.as_completed(jobs, timeout=self.race_timeout):
+                result = job.result()
+
+                if self.is_good(result):
+                    return result
+
+                if result and (not fallback):
+                    fallback = result
+        except futures.TimeoutError:
+            pass
+
+        for job in jobs:
+            job.cancel()
+
+        if fallback:
+            return fallback
+
+        return f"Error performing web search: No results for '{query}'"
+
+    def is_good(self, result: str) -> bool:
+        if not result:
+            return False
+
+        return not result.startswith(("Error", self.no_details))
+
+    def get_cached(self, key: str) -> str:
+        with self.lock:
+            item = self.cache.get(key)
+
+            if not item:
+                return ""
+
+            date, result = item
+
+            if (time.monotonic() - date) > self.cache_ttl:
+                del self.cache[key]
+                return ""
+
+            self.cache.move_to_end(key)
+            return result
+
+    def add_cached(self, key: str, result: str) -> None:
+        with self.lock:
+            self.cache[key] = (time.monotonic(), result)
+            self.cache.move_to_end(key)
+
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
     def duckduckgo_search(self, query: str) -> str:
+        result = self.duckduckgo_instant(query)
+
+        if result:
+            return result
+
+        return self.ddg_search(query)
+
+    def duckduckgo_instant(self, query: str) -> str:
         try:
             # DuckDuckGo instant answer API
             ddg_url = "https://api.duckduckgo.com/"
@@ -33,7 +171,7 @@ class Search:
                 "skip_disambig": "1",
             }
 
-            response = requests.get(ddg_url, params=params, timeout=10)
+            response = self.get(ddg_url, params=params)
             response.raise_for_status()
             data = response.json()
 
@@ -89,7 +227,7 @@ class Search:
             if result_parts:
                 return f"Search results for '{query}':\n\n" + "\n".join(result_parts)
 
-            return self.ddg_search(query)
+            return ""
         except Exception:
             return ""  # Will trigger fallback
 
@@ -105,12 +243,10 @@ class Search:
                 "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
             }
 
-            response = requests.get(
-                search_url, params=params, headers=headers, timeout=10
-            )
+            response = self.get(search_url, params=params, headers=headers)
             response.raise_for_status()
 
-            soup = BeautifulSoup(response.text, "html.parser")
+            soup = self.parse(response.text)
             results = []
 
             # Find result snippets in DuckDuckGo HTML
@@ -153,14 +289,25 @@ class Search:
             return ""  # Will trigger Google fallback
 
     def google_scrape_search(self, query: str) -> str:
-        try:
-            # Try Wikipedia first for factual queries
-            wikipedia_result = self.search_wikipedia(query)
+        # Try Wikipedia first for factual queries
+        wikipedia_result = self.wikipedia_search(query)
+
+        if wikipedia_result:
+            return wikipedia_result
+
+        return self.google_search(query)
+
+    def wikipedia_search(self, query: str) -> str:
+        result = self.search_wikipedia(query)
 
-            if wikipedia_result and len(wikipedia_result) > 100:
-                return wikipedia_result
+        # Short extracts are usually stubs or disambiguations
+        if len(result) > 100:
+            return result
 
-            # Fallback to Google search
+        return ""
+
+    def google_search(self, query: str) -> str:
+        try:
             search_url = "https://www.google.com/search"
 
             params = {
@@ -180,12 +327,10 @@ class Search:
                 "Upgrade-Insecure-Requests": "1",
             }
 
-            response = requests.get(
-                search_url, params=params, headers=headers, timeout=10
-            )
+            response = self.get(search_url, params=params, headers=headers)
             response.raise_for_status()
 
-            soup = BeautifulSoup(response.text, "html.parser")
+            soup = self.parse(response.text)
             extracted_info = []
 
             # Try to find knowledge panel information
@@ -285,7 +430,7 @@ class Search:
                 return result.strip()
 
             # Absolute final fallback
-            return f"Search completed for '{query}'. Found general information but unable to extract specific details from the search results. The query was processed successfully and relevant web pages were found, but the content structure made it difficult to parse specific facts."
+            return f"{self.no_details} '{query}'. Found general information but unable to extract specific details from the search results. The query was processed successfully and relevant web pages were found, but the content structure made it difficult to parse specific facts."
         except requests.exceptions.RequestException as e:
             return f"Error performing web search: Network error - {e}"
         except Exception as e:
@@ -304,7 +449,7 @@ class Search:
                 "User-Agent": "Meltdown/1.0 (https://github.com/Merkoba/meltdown)"
             }
 
-            response = requests.get(search_url, headers=headers, timeout=10)
+            response = self.get(search_url, headers=headers)
 
             if response.status_code == 200:
                 data = response.json()
@@ -330,9 +475,7 @@ class Search:
                 "srlimit": 3,  # Get top 3 results
             }
 
-            response = requests.get(
-                search_api_url, params=params, headers=headers, timeout=10
-            )
+            response = self.get(search_api_url, params=params, headers=headers)
 
             if response.status_code == 200:
                 data = response.json()
@@ -345,9 +488,7 @@ class Search:
 
                     # Get the full page summary
                     summary_url = f"https://en.wikipedia.org/api/rest_v1/page/summary/{page_title.replace(' ', '_')}"
-                    summary_response = requests.get(
-                        summary_url, headers=headers, timeout=10
-                    )
+                    summary_response = self.get(summary_url, headers=headers)
 
                     if summary_response.status_code == 200:
                         summary_data = summary_response.json()
@@ -369,7 +510,7 @@ class Search:
                     snippet = best_match.get("snippet", "")
                     if snippet:
                         # Clean HTML from snippet using BeautifulSoup
-                        soup = BeautifulSoup(snippet, "html.parser")
+                        soup = self.parse(snippet)
                         clean_snippet = soup.get_text(strip=True)
 
                         if clean_snippet:
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 # Standard
 import json
+import threading
 from typing import Any
 from pathlib import Path
 from collections import OrderedDict
@@ -19,76 +20,29 @@ from .close import close
 from .tests import tests
 from .memory import memory
 from .filepicker import FilePicker
-
-
-class Item:
-    @staticmethod
-    def from_dict(data: dict[str, Any]) -> Item:
-        return Item(
-            model=data.get("model", ""),
-            user=data.get("user", ""),
-            ai=data.get("ai", ""),
-            file=data.get("file", ""),
-            date=data.get("date", None),
-            duration=data.get("duration", None),
-            seed=data.get("seed", None),
-            history=data.get("history", None),
-            max_tokens=data.get("max_tokens", None),
-            temperature=data.get("temperature", None),
-            format_=data.get("format", None),
-            internal=data.get("internal", None),
-            tokens_per_second=data.get("tokens_per_second", None),
-        )
-
-    def __init__(
-        self,
-        model: str,
-        user: str,
-        ai: str,
-        file: str,
-        date: float | None,
-        duration: float | None,
-        seed: int | None,
-        history: int | None,
-        max_tokens: int | None,
-        temperature: float | None,
-        format_: str | None,
-        internal: str | None,
-        tokens_per_second: float | None,
-    ) -> None:
-        self.date = date
-        self.duration = duration
-        self.user = user
-        self.ai = ai
-        self.file = file
-        self.model = model
-        self.seed = seed
-        self.history = history
-        self.max_tokens = max_tokens
-        self.temperature = temperature
-        self.format = format_
-        self.internal = internal
-        self.tokens_per_second = tokens_per_second
-
-    def to_dict(self) -> dict[str, Any]:
-        return {
-            "date": self.date,
-            "duration": self.duration,
-            "user": self.user,
-            "ai": self.ai,
-            "file": self.file,
-            "model": self.model,
-            "seed": self.seed,
-            "history": self.history,
-            "max_tokens": self.max_tokens,
-            "temperature": self.temperature,
-            "format": self.format,
-            "internal": self.internal,
-            "tokens_per_second": self.tokens_per_second,
-        }
+from .journal import journal
+from .writer import writer
+from .sessionfile import sessionfile
+from .item import Item
 
 
 class Conversation:
+    __slots__ = (
+        "created",
+        "id",
+        "item_list",
+        "last_modified",
+        "length",
+        "loaded",
+        "name",
+        "num_items",
+        "offset",
+        "pin",
+        "preview",
+        "source",
+        "source_header",
+    )
+
     def __init__(
         self,
         _id: str,
@@ -99,26 +53,107 @@ class Conversation:
     ) -> None:
         self.id = _id
         self.name = name
-        self.items: list[Item] = []
+        self.item_list: list[Item] = []
         self.last_modified = last_modified
         self.pin = pin
+        self.loaded = True
+        self.source: Path | None = None
+        self.source_header: dict[str, Any] = {}
+        self.offset = 0
+        self.length = 0
+        self.num_items = 0
+        self.preview = ""
 
         if created <= 0.0:
             self.created = utils.now()
         else:
             self.created = created
 
+    @property
+    def items(self) -> list[Item]:
+        if not self.loaded:
+            self.load()
+
+        return self.item_list
+
+    @items.setter
+    def items(self, items: list[Item]) -> None:
+        self.loaded = True
+        self.item_list = items
+
+    def set_source(self, source: Path, entry: dict[str, Any]) -> None:
+        self.loaded = False
+        self.source = source
+        self.source_header = {key: entry.get(key) for key in self.header()}
+        self.offset = entry["offset"]
+        self.length = entry["length"]
+        self.num_items = entry.get("count", 0)
+        self.preview = entry.get("preview", "")
+
+    def read_source(self) -> bytes:
+        if not self.source:
+            return b""
+
+        with journal.lock, self.source.open("rb") as file:
+            file.seek(self.offset)
+            return file.read(self.length)
+
+    def load(self) -> None:
+        # Held so a snapshot can't move the file before the items are read
+        with journal.lock:
+            if self.loaded:
+                return
+
+            if self.source:
+                self.item_list = self.read_items(self.source)
+                self.source = None
+
+            self.loaded = True
+
+    def read_items(self, source: Path) -> list[Item]:
+        data: dict[str, Any] = {}
+
+        try:
+            data = sessionfile.decode(self.read_source())
+        except BaseException as e:
+            utils.error(e)
+
+        if data.get("id") != self.id:
+            data = session.find_in_file(source, self.id)
+
+        return [Item.from_dict(it) for it in data.get("items", [])]
+
+    def get_preview(self) -> str:
+        if not self.loaded:
+            return self.preview
+
+        if not self.item_list:
+            return ""
+
+        return self.item_list[0].ai
+
     def add(self, data: dict[str, Any]) -> Item:
         item = Item.from_dict(data)
         self.last_modified = utils.now()
         self.items.append(item)
         self.limit()
-        session.do_save()
+
+        if not journal.add(self.id, self.header(), item.to_dict()):
+            session.do_save()
+
         return item
 
-    def update(self) -> None:
+    def update(self, items: list[Item]) -> None:
         self.last_modified = utils.now()
-        session.do_save()
+
+        if not items:
+            session.do_save()
+            return
+
+        for item in items:
+            if not journal.update(self.id, self.last_modified, item.to_dict()):
+                session.do_save()
+                return
 
     def limit(self) -> None:
         self.items = self.items[-config.max_log :]
@@ -129,7 +164,7 @@ class Conversation:
         session.save()
 
     def is_empty(self) -> bool:
-        return len(self.items) == 0
+        return self.count() == 0
 
     def set_name(self, name: str) -> None:
         self.name = name
@@ -151,19 +186,28 @@ class Conversation:
         if not args.auto_bottom:
             display.disable_auto_bottom(tab.tab_id)
 
+        # Items are rendered as they are printed, this formats the header
+        if not replay:
+            display.format_text(tab.tab_id, mode="all", force=True, to_bottom=False)
+
         for item in self.items:
+            rendered = None if replay else item
+
             display.prompt(
                 "user",
                 item.user,
                 tab_id=tab.tab_id,
                 to_bottom=False,
                 file=item.file,
+                item=rendered,
             )
 
             if replay:
                 display.format_text(tab.tab_id)
 
-            display.prompt("ai", item.ai, tab_id=tab.tab_id, to_bottom=False)
+            display.prompt(
+                "ai", item.ai, tab_id=tab.tab_id, to_bottom=False, item=rendered
+            )
 
             if replay:
                 display.format_text(tab.tab_id)
@@ -174,20 +218,52 @@ class Conversation:
         display.enable_auto_bottom(tab.tab_id)
         display.check_scroll_buttons(tab.tab_id)
 
-    def to_dict(self) -> dict[str, Any]:
-        item_list = [item.to_dict() for item in self.items]
-
+    def header(self) -> dict[str, Any]:
         return {
-            "id": self.id,
             "name": self.name,
             "created": self.created,
             "last_modified": self.last_modified,
             "pin": self.pin,
-            "items": item_list,
         }
 
+    def to_dict(self) -> dict[str, Any]:
+        item_list = [item.to_dict() for item in self.items]
+        return {"id": self.id, **self.header(), "items": item_list}
+
+    def to_chunk(self, fmt: str) -> bytes:
+        if not self.loaded:
+            try:
+                chunk = self.reuse_chunk(fmt)
+
+                if chunk:
+                    return chunk
+            except BaseException as e:
+                utils.error(e)
+
+        return sessionfile.encode(self.to_dict(), fmt)
+
+    def reuse_chunk(self, fmt: str) -> bytes:
+        # Unloaded bodies are copied as-is from the previous snapshot
+        # Unless the header changed since, then only the items are kept
+        chunk = self.read_source()
+        same = self.header() == self.source_header
+
+        if same and (sessionfile.chunk_format(chunk) == fmt):
+            return chunk
+
+        data = sessionfile.decode(chunk)
+
+        if data.get("id") != self.id:
+            return b""
+
+        items = data.get("items", [])
+        return sessionfile.encode({"id": self.id, **self.header(), "items": items}, fmt)
+
     def count(self) -> int:
-        return len(self.items)
+        if not self.loaded:
+            return self.num_items
+
+        return len(self.item_list)
 
 
 class Session:
@@ -239,15 +315,101 @@ class Session:
         self.save_after = app.root.after(config.save_delay, lambda: self.do_save())
 
     def do_save(self) -> None:
+        from .pump import pump
+
+        # The conversations are only read on the main loop
+        if threading.current_thread() is not threading.main_thread():
+            pump.call(lambda: self.do_save())
+            return
+
         self.clear_save()
 
         if args.temporary:
             return
 
-        if not paths.session.exists():
-            paths.session.parent.mkdir(parents=True, exist_ok=True)
+        if not journal.enabled():
+            # Without a journal every save is a full rewrite
+            with journal.lock:
+                data, index = self.build(args.session_format)
 
-        files.write(paths.session, self.to_json())
+            writer.submit("session", lambda: self.write(data, index))
+            return
+
+        with journal.lock:
+            data, index = self.build(args.session_format)
+            generation = journal.rotate()
+
+        writer.submit("session", lambda: self.write(data, index, generation))
+
+    def write(
+        self, data: bytes, index: list[dict[str, Any]], generation: int = 0
+    ) -> None:
+        tmp = writer.write_temp(paths.session, data)
+
+        # Unloaded conversations read from the file so they move with it
+        with journal.lock:
+            tmp.replace(paths.session)
+            self.write_index(index)
+
+        if generation:
+            journal.clear(generation)
+
+    def get_index_path(self) -> Path:
+        return paths.session.with_suffix(".index")
+
+    def write_index(self, index: list[dict[str, Any]]) -> None:
+        stat = paths.session.stat()
+
+        data = {
+            "format": args.session_format,
+            "size": stat.st_size,
+            "mtime": stat.st_mtime_ns,
+            "conversations": index,
+        }
+
+        writer.write_atomic(self.get_index_path(), json.dumps(data))
+
+        for entry in index:
+            convo = self.get_conversation(entry["id"])
+
+            if convo and (not convo.loaded):
+                convo.set_source(paths.session, entry)
+
+    def read_index(self) -> list[dict[str, Any]] | None:
+        path = self.get_index_path()
+
+        if (not path.exists()) or (not paths.session.exists()):
+            return None
+
+        try:
+            data = files.load(path)
+        except BaseException:
+            return None
+
+        if data.get("format", "json") != args.session_format:
+            return None
+
+        stat = paths.session.stat()
+
+        if data.get("size") != stat.st_size:
+            return None
+
+        if data.get("mtime") != stat.st_mtime_ns:
+            return None
+
+        index: list[dict[str, Any]] = data.get("conversations", [])
+        return index
+
+    def find_in_file(self, path: Path, conversation_id: str) -> dict[str, Any]:
+        for data in self.read_file(path):
+            if data.get("id") == conversation_id:
+                return data
+
+        return {}
+
+    def read_file(self, path: Path) -> list[dict[str, Any]]:
+        with path.open("rb") as file:
+            return sessionfile.loads(file.read())
 
     def load_arg(self) -> None:
         try:
@@ -282,11 +444,18 @@ class Session:
 
         path = paths.session
 
+        if (not path.exists()) and paths.session_other.exists():
+            # The session will be converted to the current format on save
+            path = paths.session_other
+        elif self.load_lazy():
+            return
+
         if not path.exists():
             path.parent.mkdir(parents=True, exist_ok=True)
             path.touch(exist_ok=True)
+
         try:
-            self.load_items(path)
+            self.load_items(path, replay=True)
         except BaseException as e:
             utils.error(e)
             self.reset()
@@ -295,17 +464,20 @@ class Session:
         self.conversations = OrderedDict()
         close.close_all(force=True)
 
-    def load_items(self, path: Path) -> None:
+    def load_items(self, path: Path, replay: bool = False) -> None:
         close.close_all(force=True, make_empty=False)
 
         try:
-            items = files.load(path)
+            items = self.read_file(path)
         except BaseException:
             if not args.quiet:
-                utils.msg("Creating empty session.json")
+                utils.msg(f"Creating empty {paths.session.name}")
 
             items = []
 
+        if replay:
+            items = journal.replay(items)
+
         if args.test:
             test = tests.get(args.test)
 
@@ -341,6 +513,55 @@ class Session:
             if not tab_id:
                 break
 
+        if journal.records or (replay and (path != paths.session)):
+            journal.compact()
+
+    def load_lazy(self) -> bool:
+        if (not args.lazy_session) or args.test:
+            return False
+
+        try:
+            if journal.has_records():
+                return False
+
+            index = self.read_index()
+
+            if index is None:
+                return False
+
+            self.load_index(index)
+            return True
+        except BaseException as e:
+            utils.error(e)
+            self.reset()
+            return False
+
+    def load_index(self, index: list[dict[str, Any]]) -> None:
+        close.close_all(force=True, make_empty=False)
+
+        for i, entry in enumerate(index):
+            if args.max_tabs > 0:
+                if i >= args.max_tabs:
+                    break
+
+            convo = Conversation(
+                entry["id"],
+                name=entry["name"],
+                created=entry.get("created", 0.0),
+                last_modified=entry.get("last_modified", 0.0),
+                pin=entry.get("pin", False),
+            )
+
+            convo.set_source(paths.session, entry)
+            self.conversations[convo.id] = convo
+
+            tab_id = display.make_tab(
+                convo.name, convo.id, select_tab=False, save=False
+            )
+
+            if not tab_id:
+                break
+
     def save_state(self, name: str | None = None) -> None:
         if name == "last":
             self.save_last()
@@ -421,23 +642,48 @@ class Session:
         self.save()
 
     def to_json(self) -> str:
+        return self.build("json")[0].decode("utf-8")
+
+    def build(self, fmt: str) -> tuple[bytes, list[dict[str, Any]]]:
         def check(conversation: Conversation) -> bool:
             if conversation.id.startswith("ignore"):
                 return False
 
             if not args.allow_empty:
-                if not conversation.items:
+                if conversation.is_empty():
                     return False
 
             return True
 
-        sessions_list = [
-            conversation.to_dict()
-            for conversation in self.conversations.values()
-            if check(conversation)
-        ]
+        chunks = []
+        index = []
+
+        for conversation in list(self.conversations.values()):
+            if not check(conversation):
+                continue
+
+            chunk = conversation.to_chunk(fmt)
+
+            index.append(
+                {
+                    "id": conversation.id,
+                    **conversation.header(),
+                    "count": conversation.count(),
+                    "preview": utils.compact_text(
+                        conversation.get_preview(), args.tab_tooltip_length
+                    ),
+                    "length": len(chunk),
+                }
+            )
+
+            chunks.append(chunk)
+
+        data, offsets = sessionfile.join(chunks, fmt)
+
+        for entry, offset in zip(index, offsets):
+            entry["offset"] = offset
 
-        return json.dumps(sessions_list, indent=4)
+        return data, index
 
     def menu(self) -> None:
         cmds = Commands()
@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+# Standard
+import gzip
+import json
+import struct
+import textwrap
+from typing import Any
+
+# This module only uses the standard library
+# So the scripts can import it without the rest of the program
+
+
+class SessionFile:
+    def __init__(self) -> None:
+        self.formats = ["json", "records", "gzip"]
+        self.magic = b"MLTSESSION1\n"
+        self.gzip_magic = b"\x1f\x8b"
+        self.prefix = struct.Struct(">I")
+        self.compress_level = 6
+
+    def encode(self, convo: dict[str, Any], fmt: str) -> bytes:
+        if fmt == "json":
+            return textwrap.indent(json.dumps(convo, indent=4), "    ").encode("utf-8")
+
+        data = json.dumps(self.to_columns(convo), separators=(",", ":"))
+        payload = data.encode("utf-8")
+
+        if fmt == "gzip":
+            return gzip.compress(payload, compresslevel=self.compress_level, mtime=0)
+
+        return payload
+
+    def decode(self, chunk: bytes) -> dict[str, Any]:
+        if chunk.startswith(self.gzip_magic):
+            chunk = gzip.decompress(chunk)
+
+        convo: dict[str, Any] = json.loads(chunk)
+
+        if "columns" in convo:
+            return self.from_columns(convo)
+
+        return convo
+
+    def chunk_format(self, chunk: bytes) -> str:
+        if chunk.startswith(self.gzip_magic):
+            return "gzip"
+
+        if chunk.startswith(b"    {"):
+            return "json"
+
+        if chunk.startswith(b"{"):
+            return "records"
+
+        return ""
+
+    def to_columns(self, convo: dict[str, Any]) -> dict[str, Any]:
+        # Store each item field once per conversation instead of once per item
+        items = convo.get("items", [])
+        keys: list[str] = []
+
+        for item in items:
+            for key in item:
+                if key not in keys:
+                    keys.append(key)
+
+        columns = {key: [item.get(key) for item in items] for key in keys}
+        header = {key: value for key, value in convo.items() if key != "items"}
+        return {**header, "count": len(items), "columns": columns}
+
+    def from_columns(self, convo: dict[str, Any]) -> dict[str, Any]:
+        columns = convo.pop("columns")
+        count = convo.pop("count", 0)
+        items = []
+
+        for i in range(count):
+            item = {}
+
+            for key, values in columns.items():
+                if values[i] is not None:
+                    item[key] = values[i]
+
+            items.append(item)
+
+        convo["items"] = items
+        return convo
+
+    def join(self, chunks: list[bytes], fmt: str) -> tuple[bytes, list[int]]:
+        offsets = []
+
+        if fmt == "json":
+            if not chunks:
+                return b"[]", []
+
+            # Same layout as json.dumps(list, indent=4)
+            offset = 2
+
+            for chunk in chunks:
+                offsets.append(offset)
+                offset += len(chunk) + 2
+
+            return b"[\n" + b",\n".join(chunks) + b"\n]", offsets
+
+        parts = [self.magic]
+        offset = len(self.magic)
+
+        for chunk in chunks:
+            parts.append(self.prefix.pack(len(chunk)))
+            parts.append(chunk)
+            offset += self.prefix.size
+            offsets.append(offset)
+            offset += len(chunk)
+
+        return b"".join(parts), offsets
+
+    def loads(self, data: bytes) -> list[dict[str, Any]]:
+        if not data.startswith(self.magic):
+            if not data.strip():
+                return []
+
+            convos: list[dict[str, Any]] = json.loads(data)
+            return convos
+
+        convos = []
+        offset = len(self.magic)
+        size = len(data)
+
+        while offset + self.prefix.size <= size:
+            (length,) = self.prefix.unpack_from(data, offset)
+            offset += self.prefix.size
+            chunk = data[offset : offset + length]
+
+            # A crash mid-write leaves a partial last record
+            if len(chunk) < length:
+                break
+
+            convos.append(self.decode(chunk))
+            offset += length
+
+        return convos
+
+    def dumps(self, convos: list[dict[str, Any]], fmt: str) -> bytes:
+        chunks = [self.encode(convo, fmt) for convo in convos]
+        return self.join(chunks, fmt)[0]
+
+
+sessionfile = SessionFile()
@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+# Standard
+import re
+from typing import Any
+from dataclasses import dataclass
+from collections.abc import Callable
+
+
+@dataclass
+class Rule:
+    pattern: re.Pattern[str]
+    tag: str
+    no_replace: bool = False
+    replace: str = ""
+    get_tag: Callable[[re.Match[Any]], str] | None = None
+
+
+@dataclass
+class Span:
+    line: int
+    col: int
+    length: int
+    tags: tuple[str, ...]
+    replacement: str
+    changed: bool = True
+
+
+class Spans:
+    # Runs every inline rule over plain text lines and returns the edits
+    # Rules see the text left by the previous rules, like separate passes would
+    # A match drops the tags inside it, like deleting and inserting the text did
+    def tokenize(self, lines: list[str], rules: list[Rule]) -> list[Span]:
+        spans: list[Span] = []
+
+        for i, line in enumerate(lines):
+            if not line.strip():
+                continue
+
+            spans.extend(self.tokenize_line(i, line, rules))
+
+        return spans
+
+    def tokenize_line(self, num: int, line: str, rules: list[Rule]) -> list[Span]:
+        text, origin, marks, regions = self.run(line, rules)
+
+        if not regions:
+            return []
+
+        return self.get_spans(num, line, text, origin, marks, regions)
+
+    def segments(
+        self, line: str, rules: list[Rule]
+    ) -> list[tuple[str, tuple[str, ...]]]:
+        # The formatted line as runs of text that share the same tags
+        if not line.strip():
+            return [(line, ())]
+
+        text, _, marks, regions = self.run(line, rules)
+
+        if not regions:
+            return [(line, ())]
+
+        items: list[tuple[str, tuple[str, ...]]] = []
+        start = 0
+
+        for i in range(1, len(text) + 1):
+            if (i == len(text)) or (marks[i] != marks[start]):
+                items.append((text[start:i], marks[start]))
+                start = i
+
+        return items
+
+    def marks(self, line: str, rules: list[Rule]) -> list[tuple[str, int, int]]:
+        # Tag ranges on the raw line, the markup is left in place
+        text, origin, marks, regions = self.run(line, rules)
+
+        if not regions:
+            return []
+
+        items: list[tuple[str, int, int]] = []
+        open_: dict[str, int] = {}
+
+        for i in range(len(text)):
+            col = origin[i]
+
+            for tag in marks[i]:
+                index = open_.get(tag)
+
+                if (index is not None) and (items[index][2] == col):
+                    items[index] = (tag, items[index][1], col + 1)
+                else:
+                    open_[tag] = len(items)
+                    items.append((tag, col, col + 1))
+
+        return items
+
+    def run(
+        self, line: str, rules: list[Rule]
+    ) -> tuple[str, list[int], list[tuple[str, ...]], list[tuple[int, int]]]:
+        text = line
+        origin: list[int] = []
+        marks: list[tuple[str, ...]] = []
+        regions: list[tuple[int, int]] = []
+
+        for rule in rules:
+            matches = list(rule.pattern.finditer(text))
+
+            if not matches:
+                continue
+
+            if not origin:
+                # Original column of each char that is still there
+                origin = list(range(len(line)))
+                marks = [()] * len(line)
+
+            for match in reversed(matches):
+                text = self.apply(match, rule, text, origin, marks, regions)
+
+        return text, origin, marks, regions
+
+    def apply(
+        self,
+        match: re.Match[Any],
+        rule: Rule,
+        text: str,
+        origin: list[int],
+        marks: list[tuple[str, ...]],
+        regions: list[tuple[int, int]],
+    ) -> str:
+        tags = (rule.tag,)
+
+        if rule.get_tag:
+            tags += (rule.get_tag(match),)
+
+        if rule.replace:
+            start, end = match.span(0)
+            tags = self.get_kept(marks, start, end) + tags
+            low = origin[start]
+            regions.append((low, origin[end - 1] + 1))
+            origin[start:end] = [low] * len(rule.replace)
+            marks[start:end] = [tags] * len(rule.replace)
+            return text[:start] + rule.replace + text[end:]
+
+        start, end = match.span("all")
+
+        if rule.no_replace:
+            c_start, c_end = start, end
+        else:
+            c_start, c_end = match.span("content")
+
+        regions.append((origin[start], origin[end - 1] + 1))
+        tags = self.get_kept(marks, start, end) + tags
+
+        for i in range(c_start, c_end):
+            marks[i] = tags
+
+        # Remove the closing part first so the opening indices stay valid
+        del origin[c_end:end]
+        del marks[c_end:end]
+        del origin[start:c_start]
+        del marks[start:c_start]
+
+        return text[:start] + text[c_start:c_end] + text[end:]
+
+    def get_kept(
+        self, marks: list[tuple[str, ...]], start: int, end: int
+    ) -> tuple[str, ...]:
+        # Text inserted in Tk gets the tags found on both sides of it
+        if (start <= 0) or (end >= len(marks)):
+            return ()
+
+        after = marks[end]
+        return tuple(tag for tag in marks[start - 1] if tag in after)
+
+    def get_spans(
+        self,
+        num: int,
+        line: str,
+        text: str,
+        origin: list[int],
+        marks: list[tuple[str, ...]],
+        regions: list[tuple[int, int]],
+    ) -> list[Span]:
+        spans: list[Span] = []
+
+        for low, high in self.merge(regions):
+            # Chars are grouped into runs that share the same tags
+            runs: list[tuple[int, int, tuple[str, ...]]] = []
+
+            for i, col in enumerate(origin):
+                if not (low <= col < high):
+                    continue
+
+                if runs and (runs[-1][1] == i) and (runs[-1][2] == marks[i]):
+                    runs[-1] = (runs[-1][0], i + 1, marks[i])
+                else:
+                    runs.append((i, i + 1, marks[i]))
+
+            if not runs:
+                spans.append(Span(num, low, high - low, (), ""))
+                continue
+
+            for j, (start, end, tags) in enumerate(runs):
+                col = low if (j == 0) else origin[start]
+
+                if j < (len(runs) - 1):
+                    col_end = origin[runs[j + 1][0]]
+                else:
+                    col_end = high
+
+                replacement = text[start:end]
+                changed = line[col:col_end] != replacement
+                spans.append(Span(num, col, col_end - col, tags, replacement, changed))
+
+        return spans
+
+    def merge(self, regions: list[tuple[int, int]]) -> list[tuple[int, int]]:
+        merged: list[tuple[int, int]] = []
+
+        for low, high in sorted(regions):
+            if merged and (low < merged[-1][1]):
+                merged[-1] = (merged[-1][0], max(high, merged[-1][1]))
+            else:
+                merged.append((low, high))
+
+        return merged
+
+
+spans = Spans()
@@ -0,0 +1,213 @@
+from __future__ import annotations
+
+# Standard
+import threading
+from typing import Any
+from collections.abc import Callable
+
+# Modules
+from .args import args
+from .utils import utils
+from .metrics import StreamMetrics
+
+
+class Stream:
+    def __init__(self, tab_id: str, provider: str) -> None:
+        self.tab_id = tab_id
+        self.provider = provider
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread()
+        self.metrics = StreamMetrics()
+        self.loading = False
+        self.locked = False
+        self.date = utils.now()
+        self.response = ""
+        self.gen_config: dict[str, Any] | None = None
+
+    def is_alive(self) -> bool:
+        return self.thread.is_alive()
+
+    def stop(self, timeout: float) -> bool:
+        if self.stop_event.is_set():
+            return False
+
+        if not self.is_alive():
+            return False
+
+        self.stop_event.set()
+
+        if self.thread is not threading.current_thread():
+            self.thread.join(timeout=timeout)
+
+        return True
+
+
+class Streams:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.items: dict[str, Stream] = {}
+        self.last: dict[str, Stream] = {}
+        self.slots: threading.BoundedSemaphore | None = None
+        self.providers: dict[str, threading.BoundedSemaphore] = {}
+        self.poll_delay = 0.1
+
+    def get_slots(self) -> threading.BoundedSemaphore:
+        if not self.slots:
+            self.slots = threading.BoundedSemaphore(max(1, args.max_streams))
+
+        return self.slots
+
+    def get_provider(self, provider: str) -> threading.BoundedSemaphore:
+        # Local models share a single llama.cpp instance
+        if provider == "local":
+            limit = 1
+        else:
+            limit = max(1, args.provider_streams)
+
+        with self.lock:
+            if provider not in self.providers:
+                self.providers[provider] = threading.BoundedSemaphore(limit)
+
+            return self.providers[provider]
+
+    def acquire(self, sem: threading.BoundedSemaphore, stream: Stream) -> bool:
+        # Poll so a stopped stream doesn't stay queued behind others
+        while not sem.acquire(timeout=self.poll_delay):
+            if stream.stop_event.is_set():
+                return False
+
+        return True
+
+    def start(
+        self,
+        tab_id: str,
+        provider: str,
+        target: Callable[[Stream], None],
+    ) -> Stream:
+        stream = Stream(tab_id, provider)
+
+        # The tab counts as busy from here until the first token
+        # Not only once the worker gets a slot and starts the request
+        stream.loading = True
+
+        def run() -> None:
+            try:
+                self.run(stream, target)
+            finally:
+                self.end(stream)
+
+        stream.thread = threading.Thread(target=lambda: run())
+        stream.thread.daemon = True
+
+        with self.lock:
+            self.items[tab_id] = stream
+
+        stream.thread.start()
+        return stream
+
+    def run(self, stream: Stream, target: Callable[[Stream], None]) -> None:
+        slots = self.get_slots()
+        provider = self.get_provider(stream.provider)
+
+        if not self.acquire(slots, stream):
+            return
+
+        try:
+            if not self.acquire(provider, stream):
+                return
+
+            try:
+                target(stream)
+            finally:
+                provider.release()
+        finally:
+            slots.release()
+
+    def end(self, stream: Stream) -> None:
+        from .pump import pump
+        from .display import display
+
+        tab_id = stream.tab_id
+
+        with self.lock:
+            if self.items.get(tab_id) is stream:
+                del self.items[tab_id]
+
+            self.last[tab_id] = stream
+
+        def action() -> None:
+            # A newer stream on the same tab ends the tab itself
+            if not self.get(tab_id):
+                display.stream_ended(tab_id)
+
+        # Queued after the stream's chunks so the tab is formatted last
+        pump.call(action, tab_id)
+
+    def get(self, tab_id: str) -> Stream | None:
+        with self.lock:
+            return self.items.get(tab_id)
+
+    def get_all(self) -> list[Stream]:
+        with self.lock:
+            return list(self.items.values())
+
+    def is_running(self) -> bool:
+        with self.lock:
+            return bool(self.items)
+
+    def is_active(self, tab_id: str | None = None) -> bool:
+        if tab_id:
+            stream = self.get(tab_id)
+            return bool(stream and stream.is_alive())
+
+        return any(stream.is_alive() for stream in self.get_all())
+
+    def is_loading(self, tab_id: str | None = None) -> bool:
+        if tab_id:
+            stream = self.get(tab_id)
+            return bool(stream and stream.loading)
+
+        return any(stream.loading for stream in self.get_all())
+
+    def stop(self, tab_id: str | None, timeout: float) -> bool:
+        if tab_id:
+            stream = self.get(tab_id)
+            targets = [stream] if stream else []
+        else:
+            targets = self.get_all()
+
+        stopped = False
+
+        for stream in targets:
+            if stream.stop(timeout):
+                stopped = True
+
+        return stopped
+
+    def get_date(self, tab_id: str | None = None) -> float:
+        # When a stream of the tab, or of any tab, last started or ended
+        with self.lock:
+            items = [*self.items.values(), *self.last.values()]
+
+        dates = [s.date for s in items if (not tab_id) or (s.tab_id == tab_id)]
+        return max(dates, default=0.0)
+
+    def get_response(self, tab_id: str | None = None) -> str:
+        with self.lock:
+            items = list(self.last.values())
+
+        items = [
+            s for s in items if s.response and ((not tab_id) or (s.tab_id == tab_id))
+        ]
+
+        if not items:
+            return ""
+
+        return max(items, key=lambda s: s.date).response
+
+    def remove(self, tab_id: str) -> None:
+        with self.lock:
+            self.last.pop(tab_id, None)
+
+
+streams = Streams()
@@ -181,7 +181,7 @@ class System:
                 check = True
 
                 if (args.system_suspend >= 1) and (not model.streaming):
-                    date = model.stream_date
+                    date = model.last_used()
 
                     if not date:
                         check = False
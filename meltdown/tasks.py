@@ -7,7 +7,7 @@ from .args import args
 from .commands import commands
 from .utils import utils
 from .display import display
-from .model import model
+from .jobs import jobs
 
 
 class Task:
@@ -41,31 +41,25 @@ class Task:
 
             if not self.first:
                 if self.now:
-                    self.run()
+                    self.queue()
 
                 self.first = True
 
-            slept = 0
-
-            while slept < self.seconds:
-                if not Tasks.enabled.is_set():
-                    break
-
-                utils.sleep(1)
-                slept += 1
+            # Returns early when tasks get paused
+            if Tasks.paused.wait(timeout=self.seconds):
+                continue
 
-            if Tasks.enabled.is_set():
-                if args.task_debounce:
-                    if model.streaming:
-                        utils.sleep(args.task_debounce_delay)
-                        continue
+            self.queue()
 
-                self.run()
+    def queue(self) -> None:
+        # The queue runs it once the model is idle
+        jobs.add(self.run, jobs.task, key=f"task:{id(self)}")
 
 
 class Tasks:
     enabled = threading.Event()
     enabled.set()
+    paused = threading.Event()
 
     @staticmethod
     def enable(feedback: bool = True) -> None:
@@ -75,6 +69,7 @@ class Tasks:
         if feedback:
             display.print("On: Automatic tasks resumed.")
 
+        Tasks.paused.clear()
         Tasks.enabled.set()
 
     @staticmethod
@@ -86,6 +81,8 @@ class Tasks:
             display.print("Off: Automatic tasks paused.")
 
         Tasks.enabled.clear()
+        Tasks.paused.set()
+        jobs.clear(jobs.task)
 
     def start_all(self) -> None:
         if not args.start_tasks:
@@ -46,6 +46,7 @@ tips = {
         "\nInternet connection is required"
     ),
     "model_local": "You are using a local model.\nInternet is not required",
+    "model_loading": "The local model is loading.\nThis shows how much of it has been read",
     # Config
     "model": (
         "Path to a model file. This should be a file that works with"
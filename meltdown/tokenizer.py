@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+# Standard
+import threading
+from typing import Any
+
+# Libraries
+import tiktoken
+
+# Modules
+from .utils import utils
+
+
+class Tokenizer:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.encoders: dict[str, Any] = {}
+        self.default_model = "gpt-3.5-turbo"
+        self.fallback_encoding = "cl100k_base"
+
+    def get_encoder(self, name: str) -> Any:
+        if not name:
+            name = self.default_model
+
+        encoder = self.encoders.get(name)
+
+        if encoder is not None:
+            return encoder
+
+        with self.lock:
+            if name not in self.encoders:
+                self.encoders[name] = self.resolve(name)
+
+            return self.encoders[name]
+
+    def resolve(self, name: str) -> Any:
+        # Remote names look like "provider/model", local ones are paths
+        for candidate in [name, utils.last_slash(name)]:
+            encoder = self.for_model(candidate)
+
+            if encoder:
+                return encoder
+
+        try:
+            return tiktoken.get_encoding(self.fallback_encoding)
+        except BaseException:
+            return False
+
+    def for_model(self, name: str) -> Any:
+        try:
+            return tiktoken.encoding_for_model(name)
+        except BaseException:
+            return None
+
+    def count_llama(self, text: str, model: Any) -> int | None:
+        if not text:
+            return None
+
+        data = text.encode("utf-8")
+
+        try:
+            return len(model.tokenize(data, add_bos=False, special=True))
+        except BaseException as e:
+            utils.error(e)
+
+        # Tokens are at least a byte so this never undercounts the window
+        return len(data)
+
+    def count(self, text: str, name: str) -> int | None:
+        if not text:
+            return None
+
+        encoder = self.get_encoder(name)
+
+        if encoder:
+            try:
+                return len(encoder.encode(text))
+            except BaseException:
+                pass
+
+        return len(text.split())
+
+
+tokenizer = Tokenizer()
@@ -274,6 +274,9 @@ class Utils:
         if not args.use_keywords:
             return content
 
+        if "((" not in content:
+            return content
+
         c1 = re.escape("((")
         c2 = re.escape("))")
 
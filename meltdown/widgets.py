@@ -26,6 +26,7 @@ from .files import files
 from .logs import logs
 from .utils import utils
 from .model import model
+from .streams import streams
 from .autoscroll import autoscroll
 from .close import close
 from .scrollers import scrollers
@@ -581,8 +582,14 @@ class Widgets:
     def stop_stream(self) -> None:
         from .display import display
 
+        tab_id: str | None = display.current_tab
+
+        # Stop the current tab's stream, or every stream if it's idle
+        if not streams.is_active(tab_id):
+            tab_id = None
+
         display.to_bottom()
-        model.stop_stream()
+        model.stop_stream(tab_id)
 
     def load_or_unload(self) -> None:
         model.load_or_unload()
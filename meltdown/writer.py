@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+# Standard
+import os
+import json
+import threading
+from typing import Any
+from pathlib import Path
+from collections.abc import Callable
+
+# Modules
+from .utils import utils
+
+
+class Writer:
+    def __init__(self) -> None:
+        self.cond = threading.Condition()
+        self.pending: dict[str, Callable[..., Any]] = {}
+        self.running: set[str] = set()
+        self.thread: threading.Thread | None = None
+        self.flush_timeout = 10
+
+    def start(self) -> None:
+        if self.thread:
+            return
+
+        self.thread = threading.Thread(target=lambda: self.loop())
+        self.thread.daemon = True
+        self.thread.start()
+
+    def submit(self, key: str, job: Callable[..., Any]) -> None:
+        # Jobs with the same key are coalesced, only the newest one runs
+        with self.cond:
+            self.pending[key] = job
+            self.cond.notify_all()
+
+        self.start()
+
+    def save(self, path: Path, data: Any) -> None:
+        # Serialized here so later changes to nested values can't race the write
+        text = json.dumps(data, indent=4)
+        self.submit(str(path), lambda: self.write_atomic(path, text))
+
+    def loop(self) -> None:
+        while True:
+            with self.cond:
+                while not self.pending:
+                    self.cond.wait()
+
+                jobs = self.pending
+                self.pending = {}
+                self.running = set(jobs)
+
+            for job in jobs.values():
+                self.run_job(job)
+
+            with self.cond:
+                self.running = set()
+                self.cond.notify_all()
+
+    def run_job(self, job: Callable[..., Any]) -> None:
+        try:
+            job()
+        except BaseException as e:
+            utils.error(e)
+
+    def is_pending(self, path: Path) -> bool:
+        with self.cond:
+            return self.has_key(str(path))
+
+    def has_key(self, key: str) -> bool:
+        return (key in self.pending) or (key in self.running)
+
+    def flush(self, path: Path | None = None) -> None:
+        # Waits for every job, or only for the one that writes the path
+        if not self.thread:
+            return
+
+        def done() -> bool:
+            if path:
+                return not self.has_key(str(path))
+
+            return (not self.pending) and (not self.running)
+
+        with self.cond:
+            self.cond.wait_for(done, timeout=self.flush_timeout)
+
+    def write_atomic(self, path: Path, data: str | bytes) -> None:
+        self.write_temp(path, data).replace(path)
+
+    def write_temp(self, path: Path, data: str | bytes) -> Path:
+        tmp = path.with_name(f"{path.name}.tmp")
+
+        if not path.parent.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+
+        # Written as bytes so the session index offsets stay exact
+        with tmp.open("wb") as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+
+        return tmp
+
+
+writer = Writer()
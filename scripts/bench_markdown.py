@@ -0,0 +1,245 @@
+#!/usr/bin/env python
+
+# Compare Tk calls and time of the per pass and the single pass inline markdown
+# "search per pass" is a copy of the old loop that found each match with widget.search
+# "offset per pass" is the current do_format run once per rule
+# Then check that lines with many repeated spans cost the same per span
+# The old search loop is run on the same lines to show its cost per span growing
+# Usage (needs a display, it formats a real Text widget):
+# bench_markdown.py [--test format] [--repeat 20] [--rounds 5] [--spans 50]
+
+from __future__ import annotations
+
+import argparse
+import re
+import sys
+import time
+import tkinter as tk
+from pathlib import Path
+from typing import Any
+
+here = Path(__file__).resolve()
+sys.path.insert(0, str(here.parent.parent))
+
+from meltdown.markdown import Markdown
+from meltdown.tests import Tests
+
+counted = ["get", "search", "index", "insert", "delete", "tag_add"]
+
+
+class CountingText(tk.Text):
+    def __init__(self, parent: tk.Tk) -> None:
+        super().__init__(parent)
+        self.calls = 0
+
+    def count(self) -> None:
+        self.calls += 1
+
+
+def counted_method(name: str) -> Any:
+    method = getattr(tk.Text, name)
+
+    def wrapper(self: CountingText, *args: Any, **kwargs: Any) -> Any:
+        self.count()
+        return method(self, *args, **kwargs)
+
+    return wrapper
+
+
+for name in counted:
+    setattr(CountingText, name, counted_method(name))
+
+
+def get_text(test: str, repeat: int) -> str:
+    obj = Tests.get(test)
+
+    if not obj:
+        sys.exit(f"Unknown test: {test}")
+
+    answers = [item["ai"] for item in obj["items"]]
+    return "\n\n".join(answers * repeat)
+
+
+def get_repeated(spans: int, lines: int) -> str:
+    # The same text many times in a line, which used to be searched again each time
+    line = " ".join(["**bold** `code`"] * spans)
+    return "\n".join([line] * lines)
+
+
+def search_format(
+    markdown: Markdown,
+    end_ln: int,
+    pattern: re.Pattern[str],
+    tag: str,
+    no_replace: bool = False,
+) -> None:
+    # The old do_format, kept here to measure against
+    # Every match is searched again in the widget by its text
+    widget = markdown.widget
+    lines = markdown.get_lines(1, end_ln, "nobody")
+    matches = []
+
+    for i, line in enumerate(lines):
+        if line.strip():
+            items = list(pattern.finditer(line))
+
+            if items:
+                matches.append((1 + i, items))
+
+    for ln, items in reversed(matches):
+        indices: list[tuple[str, str, str]] = []
+        url = ""
+
+        for item in reversed(items):
+            all_ = item.group("all")
+            content = all_ if no_replace else item.group("content")
+
+            if tag == "link":
+                url = item.group("url")
+
+            search_col = 0
+
+            for _ in range(999):
+                start = widget.search(all_, f"{ln}.{search_col}", stopindex=f"{ln}.end")
+
+                if not start:
+                    break
+
+                repeated = False
+
+                for index in indices:
+                    if (index[0] == start) and (index[2] == content):
+                        search_col = int(start.split(".")[1]) + len(all_)
+                        repeated = True
+
+                if repeated:
+                    continue
+
+                end = widget.index(f"{start} + {len(all_)}c")
+
+                if not end:
+                    break
+
+                indices.append((start, end, content))
+
+        indices.sort(key=lambda x: int(x[0].split(".")[1]), reverse=True)
+        tag2 = ""
+
+        if tag == "link":
+            url_id = Markdown.get_url_id(url) or f"url_{len(Markdown.urls)}"
+            Markdown.urls[url_id] = url
+            tag2 = f"{tag}_{url_id}"
+
+        for start, end, content in indices:
+            widget.delete(start, end)
+            widget.insert(start, content)
+            widget.tag_add(tag, start, f"{start} + {len(content)}c")
+
+            if tag2:
+                widget.tag_add(tag2, start, f"{start} + {len(content)}c")
+
+
+def search_pass(markdown: Markdown, end_ln: int) -> None:
+    for rule in markdown.get_rules("nobody"):
+        if rule.replace:
+            continue
+
+        search_format(markdown, end_ln, rule.pattern, rule.tag, rule.no_replace)
+
+
+def per_pass(markdown: Markdown, end_ln: int) -> None:
+    for rule in markdown.get_rules("nobody"):
+        if rule.replace:
+            continue
+
+        markdown.do_format(1, end_ln, "nobody", rule.pattern, rule.tag, rule.no_replace)
+
+
+def single_pass(markdown: Markdown, end_ln: int) -> None:
+    markdown.format_inline(1, end_ln, "nobody")
+
+
+def repeated_search(markdown: Markdown, end_ln: int) -> None:
+    pattern = Markdown.get_highlight_pattern("code", False, True)
+    search_format(markdown, end_ln, Markdown.pattern_bold_aster, "bold")
+    search_format(markdown, end_ln, Markdown.pattern_highlight, "highlight")
+    search_format(markdown, end_ln, pattern, "highlight_2", no_replace=True)
+
+
+def repeated_pass(markdown: Markdown, end_ln: int) -> None:
+    markdown.do_format(1, end_ln, "nobody", Markdown.pattern_bold_aster, "bold")
+    markdown.do_format(1, end_ln, "nobody", Markdown.pattern_highlight, "highlight")
+    markdown.highlight_text("code")
+
+
+def measure(root: tk.Tk, text: str, func: Any, rounds: int) -> tuple[float, int]:
+    best = float("inf")
+    calls = 0
+
+    for _ in range(rounds):
+        widget = CountingText(root)
+        tk.Text.insert(widget, "1.0", text)
+        markdown = Markdown(widget)  # type: ignore[arg-type]
+        end_ln = int(tk.Text.index(widget, "end").split(".")[0])
+
+        start = time.perf_counter()
+        func(markdown, end_ln)
+        best = min(best, time.perf_counter() - start)
+        calls = widget.calls
+        widget.destroy()
+
+    return best, calls
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the markdown passes (needs a display)"
+    )
+    parser.add_argument("--test", type=str, default="format", help="Test corpus")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--spans", type=int, default=50, help="Spans per line")
+    args = parser.parse_args()
+
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        sys.exit(f"A display is needed to create the Text widget: {e}")
+
+    root.withdraw()
+    text = get_text(args.test, args.repeat)
+    print(f"{len(text.splitlines())} lines | {len(text)} chars\n")
+    print(f"{'mode':<18}{'tk calls':>12}{'time (ms)':>12}")
+
+    modes = [
+        ("search per pass", search_pass),
+        ("offset per pass", per_pass),
+        ("single pass", single_pass),
+    ]
+
+    for name, func in modes:
+        seconds, calls = measure(root, text, func, args.rounds)
+        print(f"{name:<18}{calls:>12}{seconds * 1000:>12.1f}")
+
+    print(
+        f"\n{'mode':<18}{'spans/line':>12}{'tk calls':>12}"
+        f"{'time (ms)':>12}{'us/span':>12}"
+    )
+
+    for name, func in [("search", repeated_search), ("offsets", repeated_pass)]:
+        for spans in [args.spans, args.spans * 2, args.spans * 4]:
+            lines = 20
+            text = get_repeated(spans, lines)
+            seconds, calls = measure(root, text, func, args.rounds)
+            per_span = seconds * 1_000_000 / (spans * lines * 3)
+
+            print(
+                f"{name:<18}{spans:>12}{calls:>12}"
+                f"{seconds * 1000:>12.1f}{per_span:>12.1f}"
+            )
+
+    root.destroy()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+
+# Measure the memory kept per session item
+# Compares the slotted and interned Item against the old dict based one
+# Only the item module is imported, not the rest of the program
+# Usage: bench_memory.py [--items 50000]
+
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import random
+import sys
+import tracemalloc
+from pathlib import Path
+from typing import Any
+
+here = Path(__file__).resolve()
+sys.path.insert(0, str(here.parent.parent))
+
+from meltdown.item import Item
+
+models = ["gpt-4o-mini", "claude-3-5-sonnet", "/models/llama-3-8b.Q4_K_M.gguf"]
+
+
+class LegacyItem:
+    def __init__(self, data: dict[str, Any]) -> None:
+        self.date = data.get("date", None)
+        self.duration = data.get("duration", None)
+        self.user = data.get("user", "")
+        self.ai = data.get("ai", "")
+        self.file = data.get("file", "")
+        self.model = data.get("model", "")
+        self.seed = data.get("seed", None)
+        self.history = data.get("history", None)
+        self.max_tokens = data.get("max_tokens", None)
+        self.temperature = data.get("temperature", None)
+        self.format = data.get("format", None)
+        self.internal = data.get("internal", None)
+        self.tokens_per_second = data.get("tokens_per_second", None)
+
+
+def make_json(num: int) -> str:
+    items = [
+        {
+            "date": 1700000000.0 + i,
+            "duration": random.random() * 10,
+            "user": f"Question {i}",
+            "ai": f"Answer {i}",
+            "file": "",
+            "model": random.choice(models),
+            "seed": None,
+            "history": 3,
+            "max_tokens": 2048,
+            "temperature": 0.8,
+            "format": "markdown",
+            "internal": None,
+            "tokens_per_second": random.random() * 50,
+        }
+        for i in range(num)
+    ]
+
+    return json.dumps(items)
+
+
+def measure(text: str, make: Any) -> int:
+    # The parsed dicts are freed before counting like after a session load
+    # So only what the items keep alive is measured
+    tracemalloc.start()
+    dicts = json.loads(text)
+    items = [make(data) for data in dicts]
+    del dicts
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del items
+    return size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the item memory usage")
+    parser.add_argument("--items", type=int, default=50000)
+    args = parser.parse_args()
+
+    random.seed(0)
+    text = make_json(args.items)
+    before = measure(text, LegacyItem)
+    after = measure(text, Item.from_dict)
+
+    print(f"{args.items} items\n")
+    print(f"Before: {before / args.items:.1f} bytes per item")
+    print(f"After: {after / args.items:.1f} bytes per item")
+    print(f"Saved: {(1 - after / before) * 100:.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+
+# Time every markdown pattern over synthetic large answers
+# A time that grows much faster than the input points to backtracking
+# Usage: bench_patterns.py [--size 5000] [--rounds 3] [--limit 50]
+
+from __future__ import annotations
+
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+
+here = Path(__file__).resolve()
+sys.path.insert(0, str(here.parent.parent))
+
+from meltdown.markdown import Markdown
+from meltdown.tests import Tests
+
+
+def get_answer(size: int) -> str:
+    answers = []
+
+    for name, obj in vars(Tests).items():
+        if name.endswith("_test"):
+            answers.extend(item["ai"] for item in obj["items"])
+
+    text = "\n\n".join(answers)
+    return "\n\n".join([text] * (size // len(text) + 1))[:size]
+
+
+# Unclosed or repeated markers make the regex engine retry from every position
+def get_inputs(size: int) -> dict[str, str]:
+    def fill(unit: str) -> str:
+        return (unit * (size // len(unit) + 1))[:size]
+
+    return {
+        "answer": get_answer(size),
+        "words": fill("word "),
+        "no_spaces": fill("a"),
+        "asterisks": fill("*a "),
+        "asterisks_2": fill("**a "),
+        "asterisks_tight": fill("*a"),
+        "underscores": fill("_a "),
+        "underscores_2": fill("__a "),
+        "underscores_tight": fill("_a"),
+        "backticks": fill("`a "),
+        "backticks_open": "`" + fill("a "),
+        "quotes": fill('"a '),
+        "slashes": fill("/a "),
+        "brackets": fill("[a]("),
+        "fences": fill("```\na\n"),
+        "list_items": fill("1. a\n- b\n"),
+    }
+
+
+def get_patterns() -> list[tuple[str, re.Pattern[str]]]:
+    return [
+        (name.removeprefix("pattern_"), value)
+        for name, value in sorted(vars(Markdown).items())
+        if name.startswith("pattern_") and isinstance(value, re.Pattern)
+    ]
+
+
+def run(pattern: re.Pattern[str], text: str) -> None:
+    # Inline patterns see one line at a time like the formatter does
+    if pattern.flags & re.MULTILINE:
+        for _ in pattern.finditer(text):
+            pass
+
+        return
+
+    for line in text.split("\n"):
+        for _ in pattern.finditer(line):
+            pass
+
+
+def measure(pattern: re.Pattern[str], text: str, rounds: int) -> float:
+    best = float("inf")
+
+    for _ in range(rounds):
+        start = time.perf_counter()
+        run(pattern, text)
+        best = min(best, time.perf_counter() - start)
+
+    return best * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the markdown patterns")
+    parser.add_argument("--size", type=int, default=5000, help="Chars per input")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--limit", type=float, default=50, help="Max ms per input")
+    args = parser.parse_args()
+
+    small = get_inputs(args.size)
+    large = get_inputs(args.size * 2)
+    slow = []
+
+    print(f"{args.size} chars per input | growth is the time at 2x the size\n")
+    print(f"{'pattern':<18}{'worst input':<20}{'time (ms)':>12}{'growth':>10}")
+
+    for name, pattern in get_patterns():
+        results = []
+
+        for key, text in small.items():
+            ms = measure(pattern, text, args.rounds)
+            ms_2 = measure(pattern, large[key], args.rounds)
+            results.append((ms, ms_2 / max(ms, 0.001), key))
+
+        ms, growth, key = max(results)
+        flag = " !" if ms > args.limit else ""
+        print(f"{name:<18}{key:<20}{ms:>12.2f}{growth:>10.1f}{flag}")
+
+        if flag:
+            slow.append(name)
+
+    if slow:
+        print(f"\nOver {args.limit} ms: {', '.join(slow)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+
+# Compare save time, load time and size of the session formats
+# Usage: bench_session.py [session.json] [--conversations 200] [--items 50]
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Any
+
+here = Path(__file__).resolve()
+sys.path.insert(0, str(here.parent.parent))
+
+from meltdown.sessionfile import sessionfile
+
+words = ["model", "token", "stream", "session", "python", "widget", "markdown"]
+models = ["gpt-4o-mini", "claude-3-5-sonnet", "/models/llama-3-8b.Q4_K_M.gguf"]
+
+
+def make_text(num: int) -> str:
+    return " ".join(random.choice(words) for _ in range(num))
+
+
+def make_session(num_convos: int, num_items: int) -> list[dict[str, Any]]:
+    convos = []
+
+    for i in range(num_convos):
+        items = []
+
+        for _ in range(num_items):
+            items.append(
+                {
+                    "date": time.time(),
+                    "duration": random.random() * 10,
+                    "user": make_text(20),
+                    "ai": make_text(300),
+                    "file": "",
+                    "model": random.choice(models),
+                    "seed": None,
+                    "history": 3,
+                    "max_tokens": 2048,
+                    "temperature": 0.8,
+                    "format": None,
+                    "internal": None,
+                    "tokens_per_second": random.random() * 50,
+                }
+            )
+
+        convos.append(
+            {
+                "id": str(i),
+                "name": f"Tab {i}",
+                "created": time.time(),
+                "last_modified": time.time(),
+                "pin": False,
+                "items": items,
+            }
+        )
+
+    return convos
+
+
+def measure(func: Any, rounds: int) -> float:
+    best = float("inf")
+
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the session formats")
+    parser.add_argument("path", type=str, nargs="?", default="", help="Session file")
+    parser.add_argument("--conversations", type=int, default=200)
+    parser.add_argument("--items", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.path:
+        convos = sessionfile.loads(Path(args.path).read_bytes())
+    else:
+        random.seed(0)
+        convos = make_session(args.conversations, args.items)
+
+    num_items = sum(len(convo["items"]) for convo in convos)
+    print(f"{len(convos)} conversations | {num_items} items\n")
+    print(f"{'format':<10}{'size (KB)':>12}{'save (ms)':>12}{'load (ms)':>12}")
+
+    for fmt in sessionfile.formats:
+        data = sessionfile.dumps(convos, fmt)
+        save = measure(lambda f=fmt: sessionfile.dumps(convos, f), args.rounds)
+        load = measure(lambda d=data: sessionfile.loads(d), args.rounds)
+        size = len(data) / 1024
+        print(f"{fmt:<10}{size:>12.1f}{save * 1000:>12.1f}{load * 1000:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
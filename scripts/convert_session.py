@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+
+# Convert a session file between the json, records and gzip formats
+# Usage: convert_session.py session.json session.mlt --format gzip
+
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+here = Path(__file__).resolve()
+sys.path.insert(0, str(here.parent.parent))
+
+from meltdown.sessionfile import sessionfile
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Convert a session file")
+    parser.add_argument("source", type=str, help="Path to the session file to read")
+    parser.add_argument("target", type=str, help="Path to the session file to write")
+
+    parser.add_argument(
+        "--format",
+        type=str,
+        default="gzip",
+        choices=sessionfile.formats,
+        help="Format of the target file",
+    )
+
+    args = parser.parse_args()
+    source = Path(args.source)
+    target = Path(args.target)
+
+    convos = sessionfile.loads(source.read_bytes())
+    data = sessionfile.dumps(convos, args.format)
+    target.write_bytes(data)
+
+    size_1 = source.stat().st_size
+    size_2 = len(data)
+    print(f"{len(convos)} conversations")
+    print(f"{size_1} bytes -> {size_2} bytes ({args.format})")
+
+
+if __name__ == "__main__":
+    main()